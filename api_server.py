@@ -3,13 +3,28 @@ Flask API Server for IdeaFlow React Frontend
 Provides REST endpoints for session management with PostgreSQL backend
 """
 
-from flask import Flask, request, jsonify, send_from_directory, send_file
+# Monkey patching (ASYNC_MODE=eventlet/gevent) has to happen before any other import
+from utils.async_runtime import patch_runtime, async_mode, server_options
+patch_runtime()
+
+from flask import Flask, request, jsonify, send_from_directory, send_file, g, has_app_context
 from flask_cors import CORS
 from flask_socketio import SocketIO, emit, join_room, leave_room
 from utils.postgres_db_manager import PostgresDBManager
 from utils.jwt_manager import create_access_token, create_refresh_token, verify_access_token, get_user_from_token
+from utils.processor_registry import processor_registry, cluster_ideas, warm_worker
+from utils.job_manager import JobManager
+from utils.incremental_themes import IncrementalThemeAssigner
+from utils.duplicate_index import DuplicateIndexManager
+from utils.socket_cluster import socketio_queue_options, build_connection_registry
+from utils.participant_feed import ParticipantFeed
+from utils.broadcast_scheduler import BroadcastScheduler
+from utils.timer_service import TimerService
 from stripe_config import StripeManager
 from sqlalchemy import text
+import io
+import csv
+import json
 import uuid
 from datetime import datetime
 import os
@@ -33,20 +48,29 @@ redis_client = None
 # Initialize database manager
 db_manager = PostgresDBManager()
 
+# One pooled connection per request (or Socket.IO event), shared by every db_manager call
+db_manager.use_request_scope(lambda: g if has_app_context() else None)
+
+@app.teardown_appcontext
+def release_db_connection(error):
+    """Return the request's shared connection to the pool"""
+    db_manager.release_request_connection(g, error)
+
 # Display database connection info
 if 'sqlite' in str(db_manager.database_url):
     print("Using SQLite database for local development")
 else:
     print(f"Using database: {db_manager.database_url}")
 
-# Initialize SocketIO without Redis (single server setup)
+# Initialize SocketIO; SOCKETIO_MESSAGE_QUEUE fans room emits out across worker processes
 socketio = SocketIO(
     app,
     cors_allowed_origins="*",
-    async_mode='threading',
+    async_mode=async_mode(),
     ping_interval=10,  # Send ping every 10 seconds
     ping_timeout=5,     # Wait 5 seconds for pong before considering disconnected
-    disconnect_timeout=10  # Wait 10 seconds before disconnecting
+    disconnect_timeout=10,  # Wait 10 seconds before disconnecting
+    **socketio_queue_options()
 )
 
 # Use local PostgreSQL database
@@ -56,7 +80,16 @@ socketio = SocketIO(
 stripe_manager = StripeManager()
 
 # Track active connections: {socket_id: {'session_id': str, 'user_id': str, 'is_facilitator': bool}}
-active_connections = {}
+active_connections = build_connection_registry()
+
+def connection_registry_heartbeat():
+    """Keep this worker's connections visible in a shared registry"""
+    while True:
+        socketio.sleep(30)
+        try:
+            active_connections.heartbeat()
+        except Exception as e:
+            print(f"Connection registry heartbeat failed: {e}")
 
 # JWT Authentication Middleware
 def require_auth(f):
@@ -121,6 +154,76 @@ if os.getenv('REPLIT_DEPLOYMENT'):
     setup_thread = threading.Thread(target=setup_demo_users, daemon=True)
     setup_thread.start()
 
+# Preprocessed ideas are persisted so regenerating themes skips unchanged ideas across restarts.
+# The NLP pipeline itself is warmed up by start_background_services().
+if os.getenv('AI_CACHE_PERSIST', 'true').lower() == 'true':
+    processor_registry.set_cache_store(db_manager)
+
+def emit_theme_delta(session_id, delta):
+    """Push incremental theme assignments to the session room"""
+    socketio.emit('themes_generated', {
+        'session_id': session_id,
+        'incremental': True,
+        'delta': delta
+    }, room=f'session_{session_id}')
+
+def recluster_session(session_id):
+    """Full re-cluster requested by the incremental assigner once drift is too high"""
+    try:
+        job_manager.submit('themes', session_id)
+    except Exception as e:
+        print(f"[Themes] Re-cluster failed for session {session_id}: {e}")
+
+# Live theme assignment for ideas submitted after themes were generated
+incremental_themes_enabled = os.getenv('INCREMENTAL_THEMES', 'true').lower() == 'true'
+incremental_themer = IncrementalThemeAssigner(
+    db_manager,
+    processor_registry.get_processor,
+    on_delta=emit_theme_delta,
+    on_recluster=recluster_session
+)
+
+# In-memory near-duplicate index per session, rebuilt from the database on demand
+duplicate_index = DuplicateIndexManager(db_manager)
+
+# Hot room events are coalesced into one frame per room per tick (BROADCAST_TICK_MS)
+broadcasts = BroadcastScheduler(socketio.emit, socketio.start_background_task, socketio.sleep)
+
+# Sequence-numbered participant deltas; clients request a snapshot on a gap
+participant_feed = ParticipantFeed(broadcasts.emit)
+
+def emit_participant_stats(session_id, user_ids):
+    """Send updated idea/vote totals for the given participants"""
+    for user_id, stats in db_manager.get_participant_stats(session_id, user_ids).items():
+        participant_feed.updated(session_id, user_id, **stats)
+
+def advance_phase_on_timer(session_id):
+    """Move a session to its next phase when an auto-advance timer expires"""
+    session = db_manager.get_session(session_id)
+    if not session:
+        return
+    current_phase = session.get('current_phase')
+    if current_phase is None:
+        current_phase = 1
+    new_phase = min(current_phase + 1, 6)
+    if new_phase == current_phase:
+        return
+    if not db_manager.update_session_phase(session_id, new_phase):
+        return
+    broadcasts.flush(f'session_{session_id}')
+    socketio.emit('phase_changed', {'phase': new_phase, 'reason': 'timer_expired'}, room=f'session_{session_id}')
+
+# Server-side countdowns: timer_update every TIMER_TICK_SECONDS and one timer_expired per timer
+timer_service = TimerService(db_manager, socketio.emit, socketio.start_background_task, on_expire=advance_phase_on_timer)
+
+def emit_job_completed(job_event):
+    """Notify the session room that a background job finished"""
+    socketio.emit('job_completed', job_event, room=f"session_{job_event['session_id']}")
+
+# Background jobs for theme generation and flowcharts (handlers registered below).
+# Identical pending jobs are coalesced within this worker only.
+job_manager = JobManager(db_manager, process_initializer=warm_worker, on_complete=emit_job_completed)
+
 @app.route('/api/sessions', methods=['POST'])
 @require_auth
 @require_facilitator
@@ -135,7 +238,7 @@ def create_session():
         
         # Check subscription limits BEFORE creating session
         # Get user's subscription details from database
-        with db_manager.engine.connect() as conn:
+        with db_manager.connection() as conn:
             query = text("""
                 SELECT sessions_used_this_month, max_sessions_per_month, max_participants_per_session
                 FROM users 
@@ -177,7 +280,7 @@ def create_session():
         session_data['id'] = session_id
         
         # INCREMENT session usage counter after successful creation
-        with db_manager.engine.connect() as conn:
+        with db_manager.write_connection() as conn:
             increment_query = text("""
                 UPDATE users 
                 SET sessions_used_this_month = sessions_used_this_month + 1
@@ -242,12 +345,11 @@ def join_session(session_id):
             return jsonify({'error': 'Participant joining is disabled for this session'}), 403
         
         # Check if session is full - enforcing subscription-based participant limits
-        participants = db_manager.get_participants(session_id)
-        current_participant_count = len(participants)
+        current_participant_count = db_manager.count_participants(session_id)
         
         # Get facilitator's subscription limits
         facilitator_id = session['facilitator_id']
-        with db_manager.engine.connect() as conn:
+        with db_manager.connection() as conn:
             query = text("""
                 SELECT max_participants_per_session
                 FROM users 
@@ -281,24 +383,21 @@ def join_session(session_id):
             print(f"DEBUG: Failed to add participant to session")
             return jsonify({'error': 'Failed to add participant to session'}), 500
         
+        # A rejoining participant keeps the ideas and votes from earlier
+        stats = db_manager.get_participant_stats(session_id, [user_id]).get(user_id, {})
         participant_data = {
             'id': user_id,
             'name': actual_name,
             'session_id': session_id,
             'user_id': user_id,
             'joined_at': datetime.now().isoformat(),
-            'status': 'active'
+            'status': 'active',
+            'ideas': stats.get('ideas', 0),
+            'votes_cast': stats.get('votes_cast', 0)
         }
         
-        # Emit real-time update to all users in the session room
-        socketio.emit('participant_joined', participant_data, room=f'session_{session_id}')
-        
-        # Also emit full participant list for consistency
-        participants_list = db_manager.get_participants(session_id)
-        socketio.emit('participants_updated', {
-            'session_id': session_id,
-            'participants': participants_list
-        }, room=f'session_{session_id}')
+        # Emit a sequenced delta to all users in the session room (no full list broadcast)
+        participant_data['seq'] = participant_feed.joined(session_id, participant_data)
         
         return jsonify(participant_data), 201
     except Exception as e:
@@ -306,10 +405,10 @@ def join_session(session_id):
 
 @app.route('/api/sessions/<session_id>/participants', methods=['GET'])
 def get_participants(session_id):
-    """Get all participants for a session"""
+    """Get all participants for a session, with the delta sequence number they are current as of"""
     try:
-        participants = db_manager.get_participants(session_id)
-        return jsonify({'participants': participants})
+        snapshot = participant_feed.snapshot(session_id, db_manager.get_participants)
+        return jsonify({'participants': snapshot['participants'], 'seq': snapshot['seq']})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -325,7 +424,7 @@ def update_session_phase(session_id):
         if not db_manager.engine:
             return jsonify({'error': 'Database connection failed'}), 500
             
-        with db_manager.engine.connect() as conn:
+        with db_manager.connection() as conn:
             # Get current phase
             current_query = text("SELECT current_phase FROM sessions WHERE id = :session_id")
             current_result = conn.execute(current_query, {'session_id': session_id})
@@ -337,7 +436,11 @@ def update_session_phase(session_id):
             # This allows facilitators to go back and forth without losing voting data
             # Votes will only be cleared when starting a new iterative round
         
-        db_manager.update_session_phase(session_id, new_phase)
+        if not db_manager.update_session_phase(session_id, new_phase):
+            return jsonify({'error': 'Failed to update session phase'}), 500
+        
+        # Deliver queued votes/ideas before the phase moves on
+        broadcasts.flush(f'session_{session_id}')
         
         # Emit phase change to all participants
         socketio.emit('phase_changed', {'phase': new_phase}, room=f'session_{session_id}')
@@ -355,22 +458,17 @@ def start_timer(session_id):
         duration = data.get('duration', 300)  # Default 5 minutes
         action = data.get('action', 'start')  # start, pause, stop
         
-        timer_data = {
-            'duration': duration,
-            'remaining': duration,
-            'is_running': action == 'start',
-            'started_at': datetime.now().isoformat() if action == 'start' else None
-        }
-        
-        # Store timer state in database
-        db_manager.save_timer_state(session_id, timer_data)
+        # The timer service persists the timer and schedules ticks and expiry
+        if action == 'start':
+            timer_data = timer_service.start_timer(session_id, duration, data.get('auto_advance'))
+        else:
+            timer_data = timer_service.set_timer(session_id, duration)
+        if not timer_data:
+            return jsonify({'error': 'Failed to save timer'}), 500
         
-        # Emit timer_started event for clients to run their own countdown
+        # Clients count down locally between the server's timer_update ticks
         if action == 'start':
-            socketio.emit('timer_started', {
-                'duration': duration,
-                'started_at': datetime.now().isoformat()
-            }, room=f'session_{session_id}')
+            socketio.emit('timer_started', timer_data, room=f'session_{session_id}')
         else:
             # For pause/stop, send timer_update
             socketio.emit('timer_update', timer_data, room=f'session_{session_id}')
@@ -385,25 +483,17 @@ def update_timer(session_id):
     """Update timer state (pause, resume, stop)"""
     try:
         data = request.get_json()
-        remaining = data.get('remaining')
         is_running = data.get('is_running', False)
+        # Pausing keeps the server's remaining time; an explicit 0 resets the timer
+        remaining = 0 if data.get('remaining') == 0 else None
         
-        # Get current timer state
-        current_timer = db_manager.get_timer_state(session_id)
-        if not current_timer:
+        if is_running:
+            timer_data = timer_service.resume(session_id, remaining)
+        else:
+            timer_data = timer_service.pause(session_id, remaining)
+        if not timer_data:
             return jsonify({'error': 'Timer not found'}), 404
         
-        timer_data = {
-            'duration': current_timer['duration'],
-            'remaining': remaining,
-            'is_running': is_running,
-            'started_at': current_timer['started_at'],
-            'updated_at': datetime.now().isoformat()
-        }
-        
-        # Update timer state in database
-        db_manager.save_timer_state(session_id, timer_data)
-        
         # Emit timer update to all participants
         socketio.emit('timer_update', timer_data, room=f'session_{session_id}')
         
@@ -413,24 +503,17 @@ def update_timer(session_id):
 
 @app.route('/api/sessions/<session_id>/timer-status', methods=['GET'])
 def get_timer_status(session_id):
-    """Get current timer status for synchronization"""
+    """Get current timer status for clients joining mid-countdown (remaining is computed on the server)"""
     try:
-        timer_data = db_manager.get_timer_state(session_id)
-        print(f"[API] Timer status requested for session {session_id}, returned: {timer_data}")
+        timer_data = timer_service.status(session_id)
         if not timer_data:
             timer_data = {
                 'remaining': 0,
                 'is_running': False,
                 'duration': 300,
-                'started_at': None
+                'started_at': None,
+                'server_time': datetime.now().isoformat()
             }
-        # Ensure started_at is included and properly formatted
-        if timer_data.get('started_at') and isinstance(timer_data['started_at'], str):
-            # Already a string (ISO format)
-            pass
-        elif timer_data.get('started_at'):
-            # Convert datetime to ISO string if needed
-            timer_data['started_at'] = timer_data['started_at'].isoformat()
         return jsonify(timer_data)
     except Exception as e:
         print(f"[API] Error getting timer status: {e}")
@@ -474,6 +557,7 @@ def finish_session(session_id):
                     WHERE id = :session_id
                 """), {"completed_at": datetime.now(), "session_id": session_id})
                 conn.commit()
+            db_manager.invalidate_session(session_id)
         
         return jsonify({'success': True, 'message': 'Session completed and archived'})
     except Exception as e:
@@ -532,21 +616,216 @@ def submit_idea(session_id):
         
         print(f"Processed idea data: {idea_data}")
         
+        # Look for near-duplicates before storing; merge_duplicates skips the insert
+        duplicates = duplicate_index.find_duplicates(session_id, actual_content)
+        if duplicates and data.get('merge_duplicates'):
+            return jsonify({
+                'merged': True,
+                'merged_into': duplicates[0]['id'],
+                'duplicates': duplicates
+            }), 200
+        
         idea_id = db_manager.add_idea(idea_data)
         if idea_id:
             idea_data['id'] = idea_id
             idea_data['created_at'] = datetime.now().isoformat()
             
             # Emit real-time update to all users in the session room
-            socketio.emit('idea_submitted', idea_data, room=f'session_{session_id}')
+            broadcasts.emit('idea_submitted', idea_data, room=f'session_{session_id}')
+            if author_id:
+                emit_participant_stats(session_id, [author_id])
+            
+            duplicate_index.add(session_id, idea_id, actual_content)
+            
+            # Place the idea into an existing theme in the background
+            if incremental_themes_enabled:
+                incremental_themer.submit(session_id, {'id': idea_id, 'content': actual_content})
             
-            return jsonify(idea_data), 201
+            return jsonify({**idea_data, 'duplicates': duplicates}), 201
         else:
             return jsonify({'error': 'Failed to create idea'}), 500
     except Exception as e:
         print(f"Error in submit_idea: {e}")
         return jsonify({'error': str(e)}), 500
 
+class BulkLimitExceeded(Exception):
+    """A bulk submission holds more ideas than the endpoint accepts"""
+
+def parse_bulk_ideas(req, max_items):
+    """
+    Read ideas from a bulk submission body
+    
+    Supports a JSON array (of strings or {content, author_id, author_name}
+    objects, optionally wrapped as {"ideas": [...]}), CSV with an optional
+    header containing a 'content' column, and NDJSON streamed line by line.
+    CSV and NDJSON stop reading as soon as the batch passes max_items.
+    
+    Returns:
+        Tuple of (list of idea dicts, request-level defaults dict)
+    
+    Raises:
+        BulkLimitExceeded: if the body holds more than max_items ideas
+    """
+    content_type = (req.content_type or '').split(';')[0].strip().lower()
+    defaults = {
+        'author_id': req.args.get('author_id'),
+        'author_name': req.args.get('author_name')
+    }
+    
+    def to_idea(entry):
+        if isinstance(entry, str):
+            return {'content': entry}
+        if isinstance(entry, dict):
+            return {
+                'content': entry.get('content'),
+                'author_id': entry.get('author_id'),
+                'author_name': entry.get('author_name')
+            }
+        raise ValueError('Each idea must be a string or an object')
+    
+    if content_type in ('application/x-ndjson', 'application/ndjson', 'application/jsonl'):
+        ideas = []
+        for line in req.stream:
+            line = line.strip()
+            if line:
+                if len(ideas) >= max_items:
+                    raise BulkLimitExceeded()
+                ideas.append(to_idea(json.loads(line)))
+        return ideas, defaults
+    
+    if content_type in ('text/csv', 'application/csv'):
+        reader = csv.reader(io.TextIOWrapper(req.stream, encoding='utf-8-sig', newline=''))
+        ideas = []
+        header = None
+        for i, row in enumerate(reader):
+            if not row:
+                continue
+            if i == 0 and 'content' in [cell.strip().lower() for cell in row]:
+                header = [cell.strip().lower() for cell in row]
+                continue
+            if len(ideas) >= max_items:
+                raise BulkLimitExceeded()
+            if header:
+                ideas.append(to_idea(dict(zip(header, row))))
+            else:
+                ideas.append({'content': row[0]})
+        return ideas, defaults
+    
+    data = req.get_json()
+    if isinstance(data, dict):
+        defaults = {
+            'author_id': data.get('author_id') or defaults['author_id'],
+            'author_name': data.get('author_name') or defaults['author_name']
+        }
+        data = data.get('ideas')
+    if not isinstance(data, list):
+        raise ValueError('Expected a JSON array of ideas')
+    if len(data) > max_items:
+        raise BulkLimitExceeded()
+    return [to_idea(entry) for entry in data], defaults
+
+@app.route('/api/sessions/<session_id>/ideas/bulk', methods=['POST'])
+def submit_ideas_bulk(session_id):
+    """Submit many ideas at once (JSON array, CSV or NDJSON)"""
+    try:
+        session = db_manager.get_session(session_id)
+        if not session:
+            return jsonify({'error': 'Session not found'}), 404
+        
+        # The session's facilitator may seed ideas in any phase; everyone else follows submit_idea's rules
+        token = request.headers.get('Authorization', '').replace('Bearer ', '')
+        user_info = get_user_from_token(token) if token else None
+        is_facilitator = bool(user_info) and user_info.get('user_id') == session.get('facilitator_id')
+        current_phase = session.get('current_phase', session.get('phase', 1))
+        if not is_facilitator and current_phase not in [2, 5, 6]:
+            return jsonify({'error': f'Ideas can only be submitted during idea generation phases. Current phase: {current_phase}'}), 400
+        # Non-facilitators can't name an author, so their own account is the only attribution
+        if not is_facilitator and not user_info:
+            return jsonify({'error': 'Authentication required for bulk submission'}), 401
+        
+        # Reject oversized bodies before reading them; a JSON array has to be parsed whole
+        max_items = int(os.getenv('BULK_IDEA_MAX_ITEMS', 5000))
+        max_bytes = int(os.getenv('BULK_IDEA_MAX_BYTES', 5 * 1024 * 1024))
+        if request.content_length is not None and request.content_length > max_bytes:
+            return jsonify({'error': f'Bulk idea payloads are limited to {max_bytes} bytes'}), 413
+        
+        try:
+            parsed, defaults = parse_bulk_ideas(request, max_items)
+        except BulkLimitExceeded:
+            return jsonify({'error': f'At most {max_items} ideas can be submitted at once'}), 413
+        except (ValueError, UnicodeDecodeError, csv.Error) as parse_error:
+            return jsonify({'error': f'Invalid bulk idea payload: {parse_error}'}), 400
+        
+        # Only the facilitator may attribute ideas to someone else; everyone else submits as themselves
+        if not is_facilitator:
+            defaults = {}
+            parsed = [{'content': idea.get('content')} for idea in parsed]
+        
+        # Resolve the submitter's display name once for the whole batch
+        default_author_id = defaults.get('author_id') or (user_info.get('user_id') if user_info else None)
+        default_author_name = defaults.get('author_name')
+        if (not default_author_name or default_author_name == 'Anonymous') and default_author_id:
+            user = db_manager.authenticate_user_by_id(default_author_id)
+            if user:
+                default_author_name = user.get('display_name') or user.get('username')
+        
+        ideas = []
+        for idea in parsed:
+            content = (idea.get('content') or '').strip()
+            if not content:
+                continue
+            ideas.append({
+                'content': content,
+                'author_id': idea.get('author_id') or default_author_id,
+                'author_name': idea.get('author_name') or default_author_name or 'Anonymous'
+            })
+        if not ideas:
+            return jsonify({'error': 'No ideas to submit'}), 400
+        
+        stored = db_manager.add_ideas_bulk(session_id, ideas, session.get('round_number', 1))
+        if not stored:
+            return jsonify({'error': 'Failed to create ideas'}), 500
+        
+        created_at = datetime.now().isoformat()
+        for idea in stored:
+            idea['created_at'] = created_at
+            duplicate_index.add(session_id, idea['id'], idea['content'])
+            if incremental_themes_enabled:
+                incremental_themer.submit(session_id, {'id': idea['id'], 'content': idea['content']})
+        
+        # One batched event instead of an idea_submitted per idea
+        broadcasts.emit('ideas_submitted', {
+            'session_id': session_id,
+            'ideas': stored,
+            'count': len(stored)
+        }, room=f'session_{session_id}')
+        emit_participant_stats(session_id, [idea['author_id'] for idea in stored])
+        
+        return jsonify({'ideas': stored, 'count': len(stored)}), 201
+    except Exception as e:
+        print(f"Error in submit_ideas_bulk: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/sessions/<session_id>/duplicates', methods=['GET'])
+@require_auth
+@require_facilitator
+def get_duplicate_groups(session_id):
+    """List groups of near-duplicate ideas in a session"""
+    try:
+        session = db_manager.get_session(session_id)
+        if not session:
+            return jsonify({'error': 'Session not found'}), 404
+        
+        # rebuild=true drops the in-memory index and reloads it from the database
+        if request.args.get('rebuild', 'false').lower() == 'true':
+            duplicate_index.invalidate(session_id)
+        
+        groups = duplicate_index.groups(session_id)
+        return jsonify({'groups': groups, 'count': len(groups)}), 200
+    except Exception as e:
+        print(f"Error in get_duplicate_groups: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/sessions/<session_id>/ideas', methods=['GET'])
 def get_ideas(session_id):
     """Get all ideas for a session"""
@@ -697,8 +976,8 @@ def handle_disconnect():
     print(f'[DISCONNECT] Active connections before cleanup: {len(active_connections)}')
     
     # Check if this connection was tracking a participant
-    if socket_id in active_connections:
-        connection_info = active_connections[socket_id]
+    connection_info = active_connections.remove(socket_id)
+    if connection_info:
         session_id = connection_info.get('session_id')
         user_id = connection_info.get('user_id')
         is_facilitator = connection_info.get('is_facilitator', False)
@@ -714,28 +993,14 @@ def handle_disconnect():
             print(f"[DISCONNECT] Database removal result: {removed}")
             
             if removed:
-                # Emit event to notify facilitator and other participants
-                participant_data = {
-                    'id': user_id,
-                    'session_id': session_id,
-                    'action': 'left'
-                }
-                socketio.emit('participant_left', participant_data, room=f'session_{session_id}')
+                # Emit a sequenced delta to notify facilitator and other participants
+                participant_feed.left(session_id, user_id)
                 print(f"[DISCONNECT] Emitted participant_left event for {user_id} in session {session_id}")
-                
-                # Emit full participant list for consistency
-                participants_list = db_manager.get_participants(session_id)
-                socketio.emit('participants_updated', {
-                    'session_id': session_id,
-                    'participants': participants_list
-                }, room=f'session_{session_id}')
             else:
                 print(f"[DISCONNECT] WARNING: Failed to remove participant {user_id} from database")
         else:
             print(f"[DISCONNECT] Skipping removal - facilitator={is_facilitator}, session_id={session_id}, user_id={user_id}")
         
-        # Remove from tracking
-        del active_connections[socket_id]
         print(f'[DISCONNECT] Active connections after cleanup: {len(active_connections)}')
     else:
         print(f'[DISCONNECT] Socket {socket_id} not found in active_connections')
@@ -752,15 +1017,22 @@ def handle_join_session(data):
         join_room(f'session_{session_id}')
         
         # Track this connection
-        active_connections[socket_id] = {
+        active_connections.add(socket_id, {
             'session_id': session_id,
             'user_id': user_id,
             'is_facilitator': is_facilitator
-        }
+        })
         
         emit('joined_session', {'session_id': session_id})
         print(f"Client {socket_id} joined session {session_id} (user: {user_id}, facilitator: {is_facilitator})")
 
+@socketio.on('request_participants')
+def handle_request_participants(data):
+    """Send the full participant list to a client that is new or missed a delta"""
+    session_id = data.get('session_id')
+    if session_id:
+        emit('participants_snapshot', participant_feed.snapshot(session_id, db_manager.get_participants))
+
 @socketio.on('leave_session')
 def handle_leave_session(data):
     """Leave a session room and remove participant if applicable"""
@@ -772,7 +1044,7 @@ def handle_leave_session(data):
         leave_room(f'session_{session_id}')
         
         # Check if this is a participant (not facilitator) and remove them
-        connection_info = active_connections.get(socket_id, {})
+        connection_info = active_connections.get(socket_id) or {}
         is_facilitator = connection_info.get('is_facilitator', False)
         
         if user_id and not is_facilitator:
@@ -780,25 +1052,12 @@ def handle_leave_session(data):
             removed = db_manager.remove_participant(session_id, user_id)
             
             if removed:
-                # Emit event to notify facilitator and other participants
-                participant_data = {
-                    'id': user_id,
-                    'session_id': session_id,
-                    'action': 'left'
-                }
-                socketio.emit('participant_left', participant_data, room=f'session_{session_id}')
+                # Emit a sequenced delta to notify facilitator and other participants
+                participant_feed.left(session_id, user_id)
                 print(f"Emitted participant_left event for {user_id} in session {session_id}")
-                
-                # Emit updated participant list
-                participants_list = db_manager.get_participants(session_id)
-                socketio.emit('participants_updated', {
-                    'session_id': session_id,
-                    'participants': participants_list
-                }, room=f'session_{session_id}')
         
         # Remove from tracking
-        if socket_id in active_connections:
-            del active_connections[socket_id]
+        active_connections.remove(socket_id)
         
         emit('left_session', {'session_id': session_id})
 
@@ -813,57 +1072,105 @@ def submit_vote(session_id):
         voter_name = data.get('voter_name')
         vote_count = data.get('votes', 1)  # Total votes for this idea
         
-        # Get session configuration
-        session = db_manager.get_session(session_id)
-        if not session:
-            return jsonify({'error': 'Session not found'}), 404
+        # Budgets are checked and the vote written in one atomic database operation
+        try:
+            outcome = db_manager.cast_vote(session_id, idea_id, voter_id, vote_count)
+            status = outcome['status']
             
-        max_votes_per_idea = session.get('max_votes_per_idea', 3)
-        votes_per_participant = session.get('votes_per_participant', 5)
-        
-        # Validate vote count for this idea
-        if vote_count > max_votes_per_idea:
-            return jsonify({'error': f'Maximum {max_votes_per_idea} votes allowed per idea'}), 400
+            if status == 'session_not_found':
+                return jsonify({'error': 'Session not found'}), 404
+            if status == 'idea_not_found':
+                return jsonify({'error': 'Idea not found'}), 404
+            if status == 'idea_limit':
+                return jsonify({'error': f"Maximum {outcome['max_votes_per_idea']} votes allowed per idea"}), 400
+            if status == 'budget_exceeded':
+                return jsonify({'error': f"You only have {outcome['remaining']} votes remaining"}), 400
+            if status != 'ok':
+                return jsonify({'error': 'Failed to submit vote'}), 500
             
-        # Get existing votes for this user to check total limits  
-        existing_votes = db_manager.get_votes(session_id, voter_id)
-        # Sum points field to get actual vote counts
-        current_idea_votes = sum(v.get('points', 0) for v in existing_votes if v.get('idea_id') == idea_id)
-        other_votes = sum(v.get('points', 0) for v in existing_votes if v.get('idea_id') != idea_id)
-        
-        # Check if new total would exceed participant limit
-        new_total = other_votes + vote_count
-        if new_total > votes_per_participant:
-            return jsonify({'error': f'You only have {votes_per_participant - other_votes} votes remaining'}), 400
-        
-        # Update or insert vote using upsert operation
-        try:
-            result = db_manager.upsert_vote({
+            # Emit real-time update to all users in the session room
+            # A newer vote by the same voter on the same idea replaces a queued one
+            broadcasts.emit('vote_updated', {
                 'session_id': session_id,
                 'idea_id': idea_id,
                 'voter_id': voter_id,
-                'voter_name': voter_name,
-                'votes': vote_count
-            })
+                'votes': outcome['votes'],
+                'idea_total': outcome['idea_total']
+            }, room=f'session_{session_id}', key=(idea_id, voter_id))
+            participant_feed.updated(session_id, voter_id, votes_cast=outcome['voter_total'])
             
-            if result:
-                # Emit real-time update to all users in the session room
-                socketio.emit('vote_updated', {
-                    'session_id': session_id,
-                    'idea_id': idea_id,
-                    'voter_id': voter_id,
-                    'votes': vote_count
-                }, room=f'session_{session_id}')
-                
-                return jsonify({'success': True, 'votes': vote_count}), 201
-            else:
-                return jsonify({'error': 'Failed to submit vote'}), 500
+            return jsonify({
+                'success': True,
+                'votes': outcome['votes'],
+                'idea_total': outcome['idea_total'],
+                'voter_total': outcome['voter_total'],
+                'remaining': outcome['remaining']
+            }), 201
         except Exception as db_error:
             print(f"Database error in vote submission: {db_error}")
             return jsonify({'error': f'Database error: {str(db_error)}'}), 500
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/sessions/<session_id>/votes', methods=['PUT'])
+def submit_ballot(session_id):
+    """Replace a participant's whole vote allocation in one request"""
+    try:
+        data = request.get_json() or {}
+        voter_id = data.get('voter_id')
+        if not voter_id:
+            return jsonify({'error': 'voter_id is required'}), 400
+        
+        # Accept {idea_id: votes} or [{'idea_id': ..., 'votes': ...}]
+        ballot = data.get('votes', {})
+        if isinstance(ballot, list):
+            allocation = {}
+            for entry in ballot:
+                allocation[entry.get('idea_id')] = allocation.get(entry.get('idea_id'), 0) + int(entry.get('votes', 0))
+        elif isinstance(ballot, dict):
+            allocation = {idea_id: int(votes) for idea_id, votes in ballot.items()}
+        else:
+            return jsonify({'error': 'votes must be an object or a list'}), 400
+        if None in allocation:
+            return jsonify({'error': 'Every vote needs an idea_id'}), 400
+        
+        outcome = db_manager.replace_ballot(session_id, voter_id, allocation)
+        status = outcome['status']
+        
+        if status == 'session_not_found':
+            return jsonify({'error': 'Session not found'}), 404
+        if status == 'idea_not_found':
+            return jsonify({'error': 'Ideas not found', 'idea_ids': outcome['idea_ids']}), 404
+        if status == 'idea_limit':
+            return jsonify({'error': f"Maximum {outcome['max_votes_per_idea']} votes allowed per idea",
+                            'idea_ids': outcome['idea_ids']}), 400
+        if status == 'budget_exceeded':
+            return jsonify({'error': f"You only have {outcome['remaining']} votes to allocate"}), 400
+        if status != 'ok':
+            return jsonify({'error': 'Failed to submit ballot'}), 500
+        
+        # One coalesced update for the whole ballot
+        broadcasts.emit('vote_updated', {
+            'session_id': session_id,
+            'voter_id': voter_id,
+            'ballot': True,
+            'allocation': outcome['allocation'],
+            'idea_totals': outcome['idea_totals']
+        }, room=f'session_{session_id}', key=('ballot', voter_id))
+        participant_feed.updated(session_id, voter_id, votes_cast=outcome['voter_total'])
+        
+        return jsonify({
+            'success': True,
+            'allocation': outcome['allocation'],
+            'idea_totals': outcome['idea_totals'],
+            'voter_total': outcome['voter_total'],
+            'remaining': outcome['remaining']
+        }), 200
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Vote counts must be integers'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/sessions/<session_id>/votes', methods=['GET'])
 def get_votes(session_id):
     """Get vote results for a session or specific user votes"""
@@ -915,7 +1222,7 @@ def create_iterative_prompt(session_id):
         # Get the selected ideas content
         if not db_manager.engine:
             return jsonify({'error': 'Database connection failed'}), 500
-        with db_manager.engine.connect() as conn:
+        with db_manager.connection() as conn:
             # Build IN clause for SQLite compatibility
             placeholders = ','.join([f':id{i}' for i in range(len(selected_idea_ids))])
             query_str = f"""
@@ -942,18 +1249,9 @@ def create_iterative_prompt(session_id):
         
         if not db_manager.engine:
             return jsonify({'error': 'Database connection failed'}), 500
-        with db_manager.engine.connect() as conn:
-            # First ensure the columns exist
-            try:
-                conn.execute(text("ALTER TABLE sessions ADD COLUMN IF NOT EXISTS iterative_prompt TEXT"))
-                conn.execute(text("ALTER TABLE sessions ADD COLUMN IF NOT EXISTS round_number INTEGER DEFAULT 1"))
-                conn.commit()
-            except:
-                pass  # Columns already exist
-            
+        with db_manager.write_connection() as conn:
             # Clear all votes when starting new iterative round
-            delete_votes_query = text("DELETE FROM votes WHERE idea_id IN (SELECT id FROM ideas WHERE session_id = :session_id)")
-            conn.execute(delete_votes_query, {'session_id': session_id})
+            db_manager.clear_session_votes(conn, session_id)
             
             # Store iterative prompt data in session
             update_query = text("""
@@ -969,6 +1267,9 @@ def create_iterative_prompt(session_id):
                 'session_id': session_id
             })
             conn.commit()
+        db_manager.invalidate_session(session_id)
+        # Every participant's votes were cleared with the new round
+        participant_feed.updated_all(session_id, votes_cast=0)
             
         return jsonify({
             'success': True,
@@ -1008,80 +1309,94 @@ def get_iterative_prompt(session_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/sessions/<session_id>/themes', methods=['POST'])
-def generate_themes(session_id):
-    """Generate AI themes for a session"""
-    try:
-        # Get all ideas for the session using db_manager
-        if not db_manager.engine:
-            return jsonify({'error': 'Database connection failed'}), 500
-            
-        with db_manager.engine.connect() as conn:
-            # Get ALL ideas from ALL rounds for comprehensive theme analysis
+def store_theme_data(session_id, theme_data):
+    """Upsert generated themes and point each idea at its theme in one transaction"""
+    with db_manager.write_connection() as conn:
+        for theme in theme_data.get('themes', []):
             query = text("""
-                SELECT id, content, author_name, round_number 
-                FROM ideas 
-                WHERE session_id = :session_id
-                ORDER BY round_number ASC, created_at ASC
+                INSERT INTO themes (id, session_id, name, description)
+                VALUES (:id, :session_id, :name, :description)
+                ON CONFLICT (id) DO UPDATE SET
+                name = EXCLUDED.name,
+                description = EXCLUDED.description
             """)
-            result = conn.execute(query, {'session_id': session_id})
-            ideas_data = [dict(row._mapping) for row in result]
-        
-        if not ideas_data:
-            return jsonify({'themes': [], 'idea_theme_mapping': {}})
-        
-        # Convert to format expected by AI processor
-        ideas = [{'id': str(row['id']), 'content': row['content']} for row in ideas_data]
-        
-        # Import and use AI processor
-        from utils.ai_processor import AIProcessor
-        ai_processor = AIProcessor()
-        
-        # Generate themes
-        theme_data = ai_processor.get_themes_from_ideas(ideas)
-        
-        # Store themes in database
-        with db_manager.engine.connect() as conn:
-            for theme in theme_data.get('themes', []):
-                query = text("""
-                    INSERT INTO themes (id, session_id, name, description)
-                    VALUES (:id, :session_id, :name, :description)
-                    ON CONFLICT (id) DO UPDATE SET
-                    name = EXCLUDED.name,
-                    description = EXCLUDED.description
-                """)
-                conn.execute(query, {
-                    'id': theme['id'],
-                    'session_id': session_id,
-                    'name': theme['name'],
-                    'description': theme['description']
-                })
-            
-            # Update idea-theme mapping
-            for idea_id, theme_id in theme_data.get('idea_theme_mapping', {}).items():
-                query = text("""
-                    UPDATE ideas SET theme_id = :theme_id WHERE id = :idea_id
-                """)
-                # Convert numpy types to Python types for PostgreSQL compatibility
-                theme_id_str = str(theme_id) if hasattr(theme_id, 'item') else str(theme_id)
-                conn.execute(query, {'theme_id': theme_id_str, 'idea_id': str(idea_id)})
-            
-            conn.commit()
-        
-        # Get themes and ideas_by_theme for WebSocket event
-        themes = db_manager.get_themes(session_id)
-        ideas_by_theme = db_manager.get_ideas_by_theme(session_id)
+            conn.execute(query, {
+                'id': theme['id'],
+                'session_id': session_id,
+                'name': theme['name'],
+                'description': theme['description']
+            })
         
-        # Emit themes_generated event to all users in the session room
-        socketio.emit('themes_generated', {
-            'session_id': session_id,
-            'themes': themes,
-            'ideas_by_theme': ideas_by_theme
-        }, room=f'session_{session_id}')
+        # Update idea-theme mapping
+        for idea_id, theme_id in theme_data.get('idea_theme_mapping', {}).items():
+            query = text("""
+                UPDATE ideas SET theme_id = :theme_id WHERE id = :idea_id
+            """)
+            # Convert numpy types to Python types for PostgreSQL compatibility
+            theme_id_str = str(theme_id) if hasattr(theme_id, 'item') else str(theme_id)
+            conn.execute(query, {'theme_id': theme_id_str, 'idea_id': str(idea_id)})
         
-        print(f"[Themes] Emitted themes_generated event for session {session_id} with {len(themes)} themes")
+        conn.commit()
+
+def run_theme_generation(session_id):
+    """Cluster all session ideas into themes, store them and notify the session room"""
+    # Get all ideas for the session using db_manager
+    if not db_manager.engine:
+        raise RuntimeError('Database connection failed')
+        
+    with db_manager.connection() as conn:
+        # Get ALL ideas from ALL rounds for comprehensive theme analysis
+        query = text("""
+            SELECT id, content, author_name, round_number 
+            FROM ideas 
+            WHERE session_id = :session_id
+            ORDER BY round_number ASC, created_at ASC
+        """)
+        result = conn.execute(query, {'session_id': session_id})
+        ideas_data = [dict(row._mapping) for row in result]
+    
+    if not ideas_data:
+        return {'themes': [], 'idea_theme_mapping': {}}
+    
+    # Convert to format expected by AI processor
+    ideas = [{'id': str(row['id']), 'content': row['content']} for row in ideas_data]
+    
+    # Generate themes with the shared AI processor (in a worker process if configured)
+    theme_data = job_manager.run_cpu(cluster_ideas, ideas)
+    
+    # Pause incremental assignment so it can't write old theme ids over the new ones
+    incremental_themer.begin_rebuild(session_id)
+    try:
+        store_theme_data(session_id, theme_data)
+    finally:
+        # Incremental assignment rebuilds its centroids from the new themes
+        incremental_themer.end_rebuild(session_id)
+    
+    # Get themes and ideas_by_theme for WebSocket event
+    themes = db_manager.get_themes(session_id)
+    ideas_by_theme = db_manager.get_ideas_by_theme(session_id)
+    
+    # Emit themes_generated event to all users in the session room
+    socketio.emit('themes_generated', {
+        'session_id': session_id,
+        'themes': themes,
+        'ideas_by_theme': ideas_by_theme
+    }, room=f'session_{session_id}')
+    
+    print(f"[Themes] Emitted themes_generated event for session {session_id} with {len(themes)} themes "
+          f"(stats: {theme_data.get('stats')})")
+    
+    return theme_data
+
+@app.route('/api/sessions/<session_id>/themes', methods=['POST'])
+def generate_themes(session_id):
+    """Queue AI theme generation for a session"""
+    try:
+        if not db_manager.get_session(session_id):
+            return jsonify({'error': 'Session not found'}), 404
         
-        return jsonify(theme_data)
+        job, created = job_manager.submit('themes', session_id)
+        return job_accepted_response(job, created)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1093,15 +1408,14 @@ def get_themes(session_id):
         if not db_manager.engine:
             return jsonify({'error': 'Database connection failed'}), 500
             
-        with db_manager.engine.connect() as conn:
+        with db_manager.connection() as conn:
             # Get themes with counts
             query = text("""
                 SELECT t.id, t.name, t.description,
                        COUNT(i.id) as idea_count,
-                       COALESCE(SUM(COALESCE(v.points, 0)), 0) as total_votes
+                       COALESCE(SUM(COALESCE(i.vote_total, 0)), 0) as total_votes
                 FROM themes t
                 LEFT JOIN ideas i ON t.id = i.theme_id
-                LEFT JOIN votes v ON i.id = v.idea_id
                 WHERE t.session_id = :session_id
                 GROUP BY t.id, t.name, t.description
                 ORDER BY total_votes DESC
@@ -1121,11 +1435,9 @@ def get_themes(session_id):
             # Get ideas by theme
             query = text("""
                 SELECT i.id, i.content, i.author_name, i.theme_id,
-                       COALESCE(SUM(v.points), 0) as votes
+                       COALESCE(i.vote_total, 0) as votes
                 FROM ideas i
-                LEFT JOIN votes v ON i.id = v.idea_id
                 WHERE i.session_id = :session_id AND i.theme_id IS NOT NULL
-                GROUP BY i.id, i.content, i.author_name, i.theme_id
                 ORDER BY i.theme_id, votes DESC
             """)
             result = conn.execute(query, {'session_id': session_id})
@@ -1150,122 +1462,158 @@ def get_themes(session_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/sessions/<session_id>/flowchart', methods=['POST'])
-def generate_flowchart(session_id):
-    """Generate a flowchart showing the ideation journey from initial ideas to final selection"""
-    try:
-        if not db_manager.engine:
-            return jsonify({'error': 'Database connection failed'}), 500
-            
-        with db_manager.engine.connect() as conn:
-            # Get session info
-            session_query = text("SELECT name, iterative_prompt, round_number FROM sessions WHERE id = :session_id")
-            session_result = conn.execute(session_query, {'session_id': session_id})
-            session_row = session_result.fetchone()
-            
-            if not session_row:
-                return jsonify({'error': 'Session not found'}), 404
-                
-            session_name = session_row[0]
-            iterative_prompt = session_row[1] 
-            current_round = session_row[2] or 1
+def build_flowchart(session_id):
+    """Build the ideation journey from initial ideas to final selection"""
+    if not db_manager.engine:
+        raise RuntimeError('Database connection failed')
+        
+    with db_manager.connection() as conn:
+        # Get session info
+        session_query = text("SELECT name, iterative_prompt, round_number FROM sessions WHERE id = :session_id")
+        session_result = conn.execute(session_query, {'session_id': session_id})
+        session_row = session_result.fetchone()
+        
+        if not session_row:
+            raise ValueError('Session not found')
             
-            # Get initial ideas (Round 1)
-            initial_ideas_query = text("""
-                SELECT content, author_name, COALESCE(SUM(v.points), 0) as votes
+        session_name = session_row[0]
+        iterative_prompt = session_row[1] 
+        current_round = session_row[2] or 1
+        
+        # Get initial ideas (Round 1)
+        initial_ideas_query = text("""
+            SELECT content, author_name, COALESCE(i.vote_total, 0) as votes
+            FROM ideas i
+            WHERE i.session_id = :session_id AND i.round_number = 1
+            ORDER BY votes DESC
+            LIMIT 8
+        """)
+        initial_ideas_result = conn.execute(initial_ideas_query, {'session_id': session_id})
+        initial_ideas = [{'content': row[0], 'author': row[1], 'votes': row[2]} for row in initial_ideas_result]
+        
+        # Get iterative ideas (Round 2+) if they exist
+        iterative_ideas = []
+        if current_round > 1:
+            iterative_ideas_query = text("""
+                SELECT content, author_name, round_number, COALESCE(i.vote_total, 0) as votes
                 FROM ideas i
-                LEFT JOIN votes v ON i.id = v.idea_id
-                WHERE i.session_id = :session_id AND i.round_number = 1
-                GROUP BY i.id, i.content, i.author_name
-                ORDER BY votes DESC
-                LIMIT 8
+                WHERE i.session_id = :session_id AND i.round_number > 1
+                ORDER BY i.round_number, votes DESC
             """)
-            initial_ideas_result = conn.execute(initial_ideas_query, {'session_id': session_id})
-            initial_ideas = [{'content': row[0], 'author': row[1], 'votes': row[2]} for row in initial_ideas_result]
-            
-            # Get iterative ideas (Round 2+) if they exist
-            iterative_ideas = []
-            if current_round > 1:
-                iterative_ideas_query = text("""
-                    SELECT content, author_name, round_number, COALESCE(SUM(v.points), 0) as votes
-                    FROM ideas i
-                    LEFT JOIN votes v ON i.id = v.idea_id
-                    WHERE i.session_id = :session_id AND i.round_number > 1
-                    GROUP BY i.id, i.content, i.author_name, i.round_number
-                    ORDER BY i.round_number, votes DESC
-                """)
-                iterative_result = conn.execute(iterative_ideas_query, {'session_id': session_id})
-                iterative_ideas = [{'content': row[0], 'author': row[1], 'round': row[2], 'votes': row[3]} for row in iterative_result]
-            
-            # Get themes and their top ideas
-            themes_query = text("""
-                SELECT t.name, t.description,
-                       i.content, i.author_name, COALESCE(SUM(v.points), 0) as votes
-                FROM themes t
-                LEFT JOIN ideas i ON t.id = i.theme_id
-                LEFT JOIN votes v ON i.id = v.idea_id
-                WHERE t.session_id = :session_id
-                GROUP BY t.id, t.name, t.description, i.id, i.content, i.author_name
-                ORDER BY t.name, votes DESC
-            """)
-            themes_result = conn.execute(themes_query, {'session_id': session_id})
-            
-            themes_data = {}
-            for row in themes_result:
-                theme_name = row[0]
-                if theme_name not in themes_data:
-                    themes_data[theme_name] = {
-                        'description': row[1],
-                        'ideas': []
-                    }
-                if row[2]:  # If there's an idea content
-                    themes_data[theme_name]['ideas'].append({
-                        'content': row[2],
-                        'author': row[3],
-                        'votes': row[4]
-                    })
-            
-            # Determine final selection (highest voted idea overall)
-            final_idea_query = text("""
-                SELECT i.content, i.author_name, COALESCE(SUM(v.points), 0) as votes
-                FROM ideas i
-                LEFT JOIN votes v ON i.id = v.idea_id
-                WHERE i.session_id = :session_id
-                GROUP BY i.id, i.content, i.author_name
-                ORDER BY votes DESC
-                LIMIT 1
-            """)
-            final_result = conn.execute(final_idea_query, {'session_id': session_id})
-            final_idea_row = final_result.fetchone()
-            final_idea = None
-            if final_idea_row:
-                final_idea = {
-                    'content': final_idea_row[0],
-                    'author': final_idea_row[1],
-                    'votes': final_idea_row[2]
+            iterative_result = conn.execute(iterative_ideas_query, {'session_id': session_id})
+            iterative_ideas = [{'content': row[0], 'author': row[1], 'round': row[2], 'votes': row[3]} for row in iterative_result]
+        
+        # Get themes and their top ideas
+        themes_query = text("""
+            SELECT t.name, t.description,
+                   i.content, i.author_name, COALESCE(i.vote_total, 0) as votes
+            FROM themes t
+            LEFT JOIN ideas i ON t.id = i.theme_id
+            WHERE t.session_id = :session_id
+            ORDER BY t.name, votes DESC
+        """)
+        themes_result = conn.execute(themes_query, {'session_id': session_id})
+        
+        themes_data = {}
+        for row in themes_result:
+            theme_name = row[0]
+            if theme_name not in themes_data:
+                themes_data[theme_name] = {
+                    'description': row[1],
+                    'ideas': []
                 }
+            if row[2]:  # If there's an idea content
+                themes_data[theme_name]['ideas'].append({
+                    'content': row[2],
+                    'author': row[3],
+                    'votes': row[4]
+                })
         
-        # Create flowchart data structure
-        flowchart_data = {
-            'session_name': session_name,
-            'iterative_prompt': iterative_prompt,
-            'current_round': current_round,
-            'initial_ideas': initial_ideas,
-            'iterative_ideas': iterative_ideas,
-            'themes': themes_data,
-            'final_idea': final_idea,
-            'total_ideas': len(initial_ideas) + len(iterative_ideas),
-            'generated_at': datetime.utcnow().isoformat()
-        }
+        # Determine final selection (highest voted idea overall)
+        final_idea_query = text("""
+            SELECT i.content, i.author_name, COALESCE(i.vote_total, 0) as votes
+            FROM ideas i
+            WHERE i.session_id = :session_id
+            ORDER BY votes DESC
+            LIMIT 1
+        """)
+        final_result = conn.execute(final_idea_query, {'session_id': session_id})
+        final_idea_row = final_result.fetchone()
+        final_idea = None
+        if final_idea_row:
+            final_idea = {
+                'content': final_idea_row[0],
+                'author': final_idea_row[1],
+                'votes': final_idea_row[2]
+            }
+    
+    # Create flowchart data structure
+    flowchart_data = {
+        'session_name': session_name,
+        'iterative_prompt': iterative_prompt,
+        'current_round': current_round,
+        'initial_ideas': initial_ideas,
+        'iterative_ideas': iterative_ideas,
+        'themes': themes_data,
+        'final_idea': final_idea,
+        'total_ideas': len(initial_ideas) + len(iterative_ideas),
+        'generated_at': datetime.utcnow().isoformat()
+    }
+    
+    return {
+        'success': True,
+        'flowchart': flowchart_data
+    }
+
+def run_theme_job(session_id, jobs):
+    """Job handler for theme generation"""
+    return run_theme_generation(session_id)
+
+def run_flowchart_job(session_id, jobs):
+    """Job handler for flowchart building"""
+    return build_flowchart(session_id)
+
+job_manager.register('themes', run_theme_job)
+job_manager.register('flowchart', run_flowchart_job)
+
+def job_accepted_response(job, created):
+    """202 response pointing clients at the job status endpoint"""
+    response = jsonify({
+        'job_id': job['id'],
+        'kind': job['kind'],
+        'session_id': job['session_id'],
+        'status': job['status'],
+        'coalesced': not created,
+        'status_url': f"/api/jobs/{job['id']}"
+    })
+    response.status_code = 202
+    response.headers['Location'] = f"/api/jobs/{job['id']}"
+    return response
+
+@app.route('/api/sessions/<session_id>/flowchart', methods=['POST'])
+def generate_flowchart(session_id):
+    """Queue a flowchart showing the ideation journey from initial ideas to final selection"""
+    try:
+        if not db_manager.get_session(session_id):
+            return jsonify({'error': 'Session not found'}), 404
         
-        return jsonify({
-            'success': True,
-            'flowchart': flowchart_data
-        })
+        job, created = job_manager.submit('flowchart', session_id)
+        return job_accepted_response(job, created)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    """Get the status and result of a background job"""
+    try:
+        job = job_manager.get(job_id)
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify(job)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # ========================
 # SUBSCRIPTION MANAGEMENT API ENDPOINTS (Phase 1)
 # ========================
@@ -1280,7 +1628,7 @@ def get_subscription_status():
             return jsonify({'error': 'User ID required'}), 401
         
         # Get subscription data directly from users table
-        with db_manager.engine.connect() as conn:
+        with db_manager.connection() as conn:
             query = text("""
                 SELECT subscription_tier, subscription_status, max_sessions_per_month, 
                        max_participants_per_session, sessions_used_this_month,
@@ -1594,7 +1942,7 @@ def handle_payment_success():
         )
         
         # Also update the users table with session limits
-        with db_manager.engine.connect() as conn:
+        with db_manager.write_connection() as conn:
             query = text("""
                 UPDATE users SET 
                     subscription_tier = :tier,
@@ -1618,7 +1966,7 @@ def handle_payment_success():
             conn.commit()
         
         # Also update user_subscriptions table (create if doesn't exist)
-        with db_manager.engine.connect() as conn:
+        with db_manager.write_connection() as conn:
             # Check if record exists
             check_query = text("SELECT user_id FROM user_subscriptions WHERE user_id = :user_id")
             exists = conn.execute(check_query, {'user_id': user_id}).fetchone()
@@ -1708,7 +2056,7 @@ def simulate_payment_success():
             return jsonify({'error': 'Invalid tier'}), 400
         
         # Update user subscription directly
-        with db_manager.engine.connect() as conn:
+        with db_manager.write_connection() as conn:
             # Set subscription details based on tier
             if tier_id == 'basic':
                 max_sessions = 4
@@ -1883,6 +2231,25 @@ def health_check():
     return jsonify({
         'status': 'ok', 
         'database': db_status,
+        'ai_ready': processor_registry.is_ready(),
+        'ai_processor': processor_registry.status(),
+        'timestamp': datetime.now().isoformat()
+    })
+
+@app.route('/api/metrics')
+def get_metrics():
+    """Connection pool, background job and socket metrics for capacity planning"""
+    return jsonify({
+        'database': db_manager.pool_status(),
+        'jobs': job_manager.stats(),
+        'sockets': {
+            'connections': active_connections.count(),
+            'shared_registry': active_connections.shared,
+            'message_queue': socketio.server.manager.__class__.__name__,
+            'participant_feed': participant_feed.stats(),
+            'broadcasts': broadcasts.stats()
+        },
+        'timers': timer_service.stats(),
         'timestamp': datetime.now().isoformat()
     })
 
@@ -1908,6 +2275,10 @@ def delete_session(session_id):
         success = db_manager.delete_session(session_id, facilitator_id)
         
         if success:
+            duplicate_index.invalidate(session_id)
+            participant_feed.reset(session_id)
+            timer_service.cancel(session_id)
+            
             # Emit real-time update to all users
             socketio.emit('session_deleted', {'session_id': session_id}, namespace='/')
             return jsonify({'message': 'Session deleted successfully'}), 200
@@ -1959,7 +2330,22 @@ def serve_static_files(path):
         except:
             return jsonify({'error': 'React build not found'}), 404
 
+def start_background_services():
+    """
+    Start the serving process's background work
+    
+    Called by the server entry points only. Importing this module (as spawned
+    job pool workers do) must not warm models, recover jobs or start loops.
+    """
+    processor_registry.start_warmup()
+    job_manager.start()
+    timer_service.load()
+    if active_connections.shared:
+        socketio.start_background_task(connection_registry_heartbeat)
+
 if __name__ == '__main__':
+    start_background_services()
+    
     # Auto-detect deployment vs development
     port = int(os.environ.get('PORT', 5000))  # Default to 5000 for deployment
     debug_mode = os.environ.get('FLASK_ENV') != 'production'
@@ -1968,4 +2354,5 @@ if __name__ == '__main__':
     if debug_mode and port == 5000:
         port = 8000
     
-    socketio.run(app, host='0.0.0.0', port=port, debug=debug_mode, use_reloader=False, log_output=True)
\ No newline at end of file
+    socketio.run(app, host='0.0.0.0', port=port, debug=debug_mode, use_reloader=False, log_output=True,
+                 **server_options())
\ No newline at end of file
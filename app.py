@@ -5,6 +5,10 @@ Serves the React frontend with Flask backend
 Works with both direct execution and streamlit command
 """
 
+# Monkey patching (ASYNC_MODE=eventlet/gevent) has to happen before any other import
+from utils.async_runtime import patch_runtime, server_options
+patch_runtime()
+
 import os
 import sys
 import subprocess
@@ -17,7 +21,8 @@ def main():
     os.environ['PORT'] = str(os.environ.get('PORT', 5000))
     
     # Import and start the Flask server immediately
-    from api_server import app, socketio
+    from api_server import app, socketio, start_background_services
+    start_background_services()
     
     print("Starting IdeaFlow Application...")
     port = int(os.environ.get('PORT', 5000))
@@ -25,7 +30,7 @@ def main():
     # Start Flask app immediately to open port quickly for deployment
     print(f"Server binding to 0.0.0.0:{port}")
     socketio.run(app, host='0.0.0.0', port=port, debug=False, use_reloader=False, 
-                 allow_unsafe_werkzeug=True)
+                 **server_options())
 
 # Handle both direct execution and streamlit execution
 if __name__ == '__main__':
@@ -7,6 +7,8 @@ import { resolveApiBasePath, resolveSocketOrigin } from '../utils/apiBase';
 import { Play, Pause, SkipForward, Users, Clock, BarChart3, MessageSquare, Lightbulb, GitBranch } from 'lucide-react';
 import IdeaFlowChart from '../components/IdeaFlowChart';
 import { io, Socket } from 'socket.io-client';
+import { subscribeToParticipantFeed } from '../utils/participantFeed';
+import { unpackEventFrames } from '../utils/eventFrames';
 
 const FacilitatorDashboard: React.FC = () => {
   const { sessionId } = useParams();
@@ -81,6 +83,8 @@ const FacilitatorDashboard: React.FC = () => {
       transports: ['websocket', 'polling'],
       withCredentials: true
     });
+    // Busy rooms send coalesced frames; dispatch their events to the handlers below
+    unpackEventFrames(socket);
 
     socket.on('connect', () => {
       console.log('[FacilitatorDashboard] WebSocket connected:', socket.id);
@@ -96,62 +100,13 @@ const FacilitatorDashboard: React.FC = () => {
       });
     });
       
-      // Listen for new participants joining
-      socket.on('participant_joined', (participantData: any) => {
-        console.log('Participant joined:', participantData);
-        setParticipants(prev => {
-          // Check if participant already exists
-          if (prev.some(p => p.id === participantData.id)) {
-            return prev;
-          }
-          console.log('[WebSocket] Existing participants before join:', prev);
-          const updatedList = [...prev, participantData];
-          console.log('[WebSocket] Participant list after join:', updatedList.length);
-          return updatedList;
-        });
-
-        // Fetch authoritative participant list to avoid drift
-        if (sessionId) {
-          apiService.getParticipants(sessionId).then(updatedParticipants => {
-            console.log('[WebSocket] Refreshed participants after join event:', updatedParticipants.length, updatedParticipants);
-            setParticipants(updatedParticipants);
-          }).catch(err => console.error('[WebSocket] Error refreshing participants after join:', err));
-        }
-      });
-      
-      // Listen for full participant list updates
-      socket.on('participants_updated', (data: any) => {
-        console.log('[WebSocket] Participants updated broadcast:', data?.participants?.length, data);
-        if (data?.participants) {
-          setParticipants(data.participants);
-        }
-      });
-      
-      // Listen for participants leaving
-      socket.on('participant_left', (participantData: any) => {
-        console.log('Participant left event received:', participantData);
-        setParticipants(prev => {
-          const filtered = prev.filter(p => p.id !== participantData.id);
-          console.log(`Participant ${participantData.id} removed. Count: ${prev.length} -> ${filtered.length}`);
-          return filtered;
-        });
-        // Force immediate refresh from API to ensure consistency
-        if (sessionId) {
-          apiService.getParticipants(sessionId).then(updatedParticipants => {
-            console.log('Refreshed participants after leave event:', updatedParticipants.length);
-            setParticipants(updatedParticipants);
-          }).catch(err => console.error('Error refreshing participants:', err));
-        }
-      });
+      // Participant joins, leaves and stat changes arrive as sequenced deltas
+      subscribeToParticipantFeed(socket, sessionId!, setParticipants, '[FacilitatorDashboard]');
       
       // Listen for timer_started event (synchronized timer start)
       socket.on('timer_started', (timerData: any) => {
         console.log('Timer started:', timerData);
-        const duration = timerData.duration || 300;
-        const startedAt = new Date(timerData.started_at).getTime();
-        const elapsed = (Date.now() - startedAt) / 1000;
-        const remaining = Math.max(0, Math.floor(duration - elapsed));
-        setTimeRemaining(remaining);
+        setTimeRemaining(timerData.remaining ?? timerData.duration ?? 300);
         setIsTimerRunning(true);
       });
 
@@ -161,6 +116,13 @@ const FacilitatorDashboard: React.FC = () => {
         setTimeRemaining(timerData.remaining || 0);
         setIsTimerRunning(timerData.is_running || false);
       });
+
+      // Listen for timer_expired event (sent once by the server at the deadline)
+      socket.on('timer_expired', (timerData: any) => {
+        console.log('Timer expired:', timerData);
+        setTimeRemaining(0);
+        setIsTimerRunning(false);
+      });
       
       // Listen for idea_submitted events (replace polling)
       socket.on('idea_submitted', (ideaData: any) => {
@@ -195,27 +157,97 @@ const FacilitatorDashboard: React.FC = () => {
         });
       });
       
+      // Listen for ideas_submitted events (one batch per bulk import)
+      socket.on('ideas_submitted', (batch: any) => {
+        console.log(`[WebSocket] ${batch.count} ideas submitted`);
+        const incoming: any[] = batch.ideas || [];
+        setSubmittedIdeas(prev => {
+          const known = new Set(prev.map(i => i.id));
+          const added = incoming
+            .filter((ideaData: any) => !known.has(ideaData.id))
+            .map((ideaData: any) => ({
+              id: ideaData.id,
+              content: ideaData.content,
+              sessionId: ideaData.session_id || batch.session_id || sessionId || '',
+              authorName: ideaData.author_name,
+              authorId: ideaData.author_id,
+              roundNumber: ideaData.round_number || 1,
+              createdAt: ideaData.created_at
+            }));
+          if (added.length === 0) {
+            return prev;
+          }
+          console.log(`[WebSocket] Ideas updated: ${prev.length} -> ${prev.length + added.length}`);
+          return [...prev, ...added];
+        });
+        
+        const roundNumber = Math.max(1, ...incoming.map((ideaData: any) => ideaData.round_number || 1));
+        setSession(prev => {
+          if (prev) {
+            const currentRound = prev.currentRound || 1;
+            return { ...prev, currentRound: Math.max(currentRound, roundNumber) };
+          }
+          return prev;
+        });
+      });
+      
       // Listen for vote_updated events (replace polling)
-      socket.on('vote_updated', async (voteData: any) => {
-        console.log('[WebSocket] Vote updated:', voteData);
-        // Fetch updated vote results from API
+      // A frame can carry many vote updates; run at most one refetch at a time plus one trailing refetch
+      let voteRefreshInFlight = false;
+      let voteRefreshQueued = false;
+      const refreshVotes = async () => {
+        if (voteRefreshInFlight) {
+          voteRefreshQueued = true;
+          return;
+        }
+        voteRefreshInFlight = true;
         try {
-          const voteResults = await apiService.getVotes(sessionId!);
-          const voteMap: Record<string, number> = {};
-          voteResults.forEach((result: any) => {
-            voteMap[result.id] = result.total_points || 0;
-          });
-          setVoteResults(voteMap);
-          setVotes(voteResults);
-          console.log('[WebSocket] Vote results updated');
+          do {
+            voteRefreshQueued = false;
+            // Fetch updated vote results from API
+            const voteResults = await apiService.getVotes(sessionId!);
+            const voteMap: Record<string, number> = {};
+            voteResults.forEach((result: any) => {
+              voteMap[result.id] = result.total_points || 0;
+            });
+            setVoteResults(voteMap);
+            setVotes(voteResults);
+            console.log('[WebSocket] Vote results updated');
+          } while (voteRefreshQueued);
         } catch (error) {
           console.error('[WebSocket] Error fetching vote results:', error);
+        } finally {
+          voteRefreshInFlight = false;
         }
+      };
+      socket.on('vote_updated', (voteData: any) => {
+        console.log('[WebSocket] Vote updated:', voteData);
+        refreshVotes();
       });
       
       // Listen for themes_generated events (replace polling)
       socket.on('themes_generated', (themesData: any) => {
         console.log('[WebSocket] Themes generated:', themesData);
+        if (themesData.incremental) {
+          // Newly submitted ideas placed into existing themes
+          const assigned: any[] = themesData.delta?.assigned || [];
+          if (assigned.length === 0) {
+            return;
+          }
+          setIdeasByTheme(prev => {
+            const next = { ...prev };
+            assigned.forEach(item => {
+              const existing = (next[item.theme_id] || []).filter((idea: any) => idea.id !== item.idea_id);
+              next[item.theme_id] = [...existing, { id: item.idea_id, content: item.content, votes: 0 }];
+            });
+            return next;
+          });
+          setThemes(prev => prev.map(theme => {
+            const added = assigned.filter(item => item.theme_id === theme.id).length;
+            return added ? { ...theme, idea_count: (theme.idea_count || 0) + added } : theme;
+          }));
+          return;
+        }
         setThemes(themesData.themes || []);
         setIdeasByTheme(themesData.ideas_by_theme || {});
         console.log(`[WebSocket] Themes updated: ${themesData.themes?.length || 0} themes`);
@@ -258,11 +290,11 @@ const FacilitatorDashboard: React.FC = () => {
 
     // Polling removed - all updates now come via WebSocket events
     // WebSocket listeners handle:
-    // - idea_submitted -> updates ideas list
+    // - idea_submitted / ideas_submitted -> updates ideas list
     // - vote_updated -> updates vote results
     // - themes_generated -> updates themes
     // - phase_changed -> updates session phase
-    // - participant_joined/left -> updates participants list
+    // - participant_joined/left/updated -> applies participant deltas (snapshot on gaps)
     console.log('[FacilitatorDashboard] WebSocket listeners initialized - polling disabled');
   }, [sessionId, navigate, user?.id]);
 
@@ -6,6 +6,8 @@ import type { ApiSession, ApiIdea, ApiParticipant } from '../services/api';
 import { useAuth } from '../contexts/AuthContext';
 import { io, Socket } from 'socket.io-client';
 import { resolveSocketOrigin } from '../utils/apiBase';
+import { subscribeToParticipantFeed } from '../utils/participantFeed';
+import { unpackEventFrames } from '../utils/eventFrames';
 
 const ParticipantView: React.FC = () => {
   const { sessionId } = useParams<{ sessionId: string }>();
@@ -46,6 +48,8 @@ const ParticipantView: React.FC = () => {
       transports: ['websocket', 'polling'],
       withCredentials: true
     });
+    // Busy rooms send coalesced frames; dispatch their events to the handlers below
+    unpackEventFrames(socket);
 
     socket.on('connect', () => {
       console.log('[ParticipantView] WebSocket connected:', socket.id);
@@ -68,12 +72,10 @@ const ParticipantView: React.FC = () => {
     // Listen for timer start from facilitator
       socket.on('timer_started', (timerData: any) => {
         console.log('Timer started event received:', timerData);
-        const duration = timerData.duration || 300;
-        const startedAt = timerData.started_at ? new Date(timerData.started_at).getTime() : Date.now();
-        const elapsed = (Date.now() - startedAt) / 1000;
-        const remaining = Math.max(0, Math.floor(duration - elapsed));
+        // remaining is computed by the server, so client clock skew doesn't matter
+        const remaining = timerData.remaining ?? timerData.duration ?? 300;
         
-        console.log('Timer initialized from event:', { duration, elapsed, remaining });
+        console.log('Timer initialized from event:', { remaining });
         
         if (remaining > 0) {
           setPhaseTimer(remaining);
@@ -98,6 +100,13 @@ const ParticipantView: React.FC = () => {
         }
       });
 
+      // The server announces expiry once; the local countdown may be a second off
+      socket.on('timer_expired', (timerData: any) => {
+        console.log('Timer expired:', timerData);
+        setTimerActive(false);
+        setPhaseTimer(0);
+      });
+
       // Listen for phase changes that affect timer
       socket.on('phase_changed', (phaseData: any) => {
         console.log('Phase changed:', phaseData);
@@ -106,46 +115,8 @@ const ParticipantView: React.FC = () => {
         setPhaseTimer(0);
       });
 
-      // Listen for new participants joining
-      socket.on('participant_joined', (participantData: any) => {
-        console.log('Participant joined:', participantData);
-        setParticipants(prev => {
-          // Check if participant already exists
-          if (prev.some(p => p.id === participantData.id)) {
-            return prev;
-          }
-          console.log('[ParticipantView] Existing participants before join:', prev);
-          const updatedList = [...prev, participantData];
-          console.log('[ParticipantView] Participant list after join:', updatedList.length);
-          return updatedList;
-        });
-
-        // Also refresh participants from API to ensure consistency
-        if (sessionId) {
-          apiService.getParticipants(sessionId).then(updatedParticipants => {
-            console.log('[ParticipantView] Refreshed participants after join event:', updatedParticipants.length, updatedParticipants);
-            setParticipants(updatedParticipants);
-          }).catch(err => console.error('[ParticipantView] Error refreshing participants after join:', err));
-        }
-      });
-      
-      // Listen for broadcast list updates
-      socket.on('participants_updated', (data: any) => {
-        console.log('[ParticipantView] Participants updated broadcast:', data?.participants?.length, data);
-        if (data?.participants) {
-          setParticipants(data.participants);
-        }
-      });
-      
-      // Listen for participants leaving
-      socket.on('participant_left', (participantData: any) => {
-        console.log('[ParticipantView] Participant left event received:', participantData);
-        setParticipants(prev => {
-          const filtered = prev.filter(p => p.id !== participantData.id);
-          console.log(`[ParticipantView] Participant ${participantData.id} removed. Count: ${prev.length} -> ${filtered.length}`);
-          return filtered;
-        });
-      });
+      // Participant joins, leaves and stat changes arrive as sequenced deltas
+      subscribeToParticipantFeed(socket, sessionId, setParticipants, '[ParticipantView]');
 
     // Cleanup function
     return () => {
@@ -173,12 +144,11 @@ const ParticipantView: React.FC = () => {
     
     const fetchData = async () => {
       try {
-        const [sessionData, participantsData, ideasData, promptsData, timerStatus] = await Promise.all([
+        const [sessionData, participantsData, ideasData, promptsData] = await Promise.all([
           apiService.getSession(sessionId),
           apiService.getParticipants(sessionId),
           apiService.getIdeas(sessionId, false), // Don't include author for participants
-          apiService.getIterativePrompts(sessionId),
-          apiService.getTimerStatus(sessionId) // Fetch current timer status
+          apiService.getIterativePrompts(sessionId)
         ]);
         
         setSession(sessionData);
@@ -186,44 +156,6 @@ const ParticipantView: React.FC = () => {
         setParticipants(participantsData);
         setIterativePrompts(promptsData?.prompts || [])
         
-        // Initialize timer state from fetched status
-        console.log('[fetchData] Timer status fetched:', timerStatus);
-        if (timerStatus && timerStatus.is_running) {
-          let remaining = timerStatus.remaining || 0;
-          
-          // If we have started_at, recalculate remaining based on elapsed time for accuracy
-          if (timerStatus.started_at) {
-            try {
-              const startedAt = new Date(timerStatus.started_at).getTime();
-              const now = Date.now();
-              const elapsed = (now - startedAt) / 1000;
-              const duration = timerStatus.duration || 300;
-              remaining = Math.max(0, Math.floor(duration - elapsed));
-              console.log('[fetchData] Timer calculation:', { startedAt, now, elapsed, duration, remaining });
-            } catch (e) {
-              console.error('[fetchData] Error parsing started_at:', e, timerStatus.started_at);
-            }
-          }
-          
-          console.log('[fetchData] Setting timer state:', { remaining, is_running: timerStatus.is_running });
-          if (remaining > 0) {
-            setPhaseTimer(remaining);
-            setTimerActive(true);
-            console.log('[fetchData] Timer activated:', { remaining });
-          } else {
-            console.log('[fetchData] Timer expired, deactivating');
-            setPhaseTimer(0);
-            setTimerActive(false);
-          }
-        } else {
-          // Timer not running or not set
-          console.log('[fetchData] Timer not running or not set:', timerStatus);
-          if (!timerStatus || !timerStatus.is_running) {
-            setPhaseTimer(0);
-            setTimerActive(false);
-          }
-        }
-        
         // Filter ideas to only show current round ideas
         if (sessionData?.phase === 3) {
           // Review phase - only show ideas from current round
@@ -261,6 +193,18 @@ const ParticipantView: React.FC = () => {
     return () => clearInterval(interval);
   }, [sessionId, currentUser.id]);
 
+  // Pick up a countdown already in progress; afterwards the server pushes timer events
+  useEffect(() => {
+    if (!sessionId) return;
+
+    apiService.getTimerStatus(sessionId).then(timerStatus => {
+      console.log('[Timer] Initial status:', timerStatus);
+      const remaining = timerStatus?.remaining || 0;
+      setPhaseTimer(remaining);
+      setTimerActive(!!timerStatus?.is_running && remaining > 0);
+    });
+  }, [sessionId]);
+
   // Timer countdown effect
   useEffect(() => {
     if (!timerActive || phaseTimer <= 0) {
@@ -350,16 +294,9 @@ const ParticipantView: React.FC = () => {
         return;
       }
       
-      // Submit vote with new total count
-      await apiService.submitVote(sessionId!, ideaId, currentUser.id, currentUser.displayName, votes);
-      
-      // Refresh vote data from server to ensure consistency
-      const updatedVotes = await apiService.getVotes(sessionId!, currentUser.id);
-      const voteMap: { [ideaId: string]: number } = {};
-      updatedVotes.forEach((vote: any) => {
-        voteMap[vote.idea_id] = vote.votes;
-      });
-      setUserVotes(voteMap);
+      // Replace the whole allocation in one request; the server checks the limits atomically
+      const result = await apiService.submitBallot(sessionId!, currentUser.id, { ...userVotes, [ideaId]: votes });
+      setUserVotes(result.allocation || {});
       
       // Close voting interface
       setExpandedVoting(null);
@@ -170,7 +170,9 @@ class ApiService {
         sessionId: p.session_id,
         userId: p.user_id,
         joinedAt: p.joined_at,
-        status: p.status || 'active'
+        status: p.status || 'active',
+        ideas: p.ideas || 0,
+        votes_cast: p.votes_cast || 0
       }));
     } catch (error) {
       console.error('API: Error getting participants:', error);
@@ -237,7 +239,7 @@ class ApiService {
     });
   }
 
-  async getTimerStatus(sessionId: string): Promise<{ remaining: number; is_running: boolean; duration: number; started_at?: string }> {
+  async getTimerStatus(sessionId: string): Promise<{ remaining: number; is_running: boolean; duration: number; started_at?: string; server_time?: string }> {
     try {
       const response = await this.fetchApi(`/sessions/${sessionId}/timer-status`);
       console.log('[API] Timer status response:', response);
@@ -266,6 +268,22 @@ class ApiService {
     }
   }
 
+  async submitBallot(sessionId: string, voterId: string, allocation: Record<string, number>): Promise<any> {
+    try {
+      const response = await this.fetchApi(`/sessions/${sessionId}/votes`, {
+        method: 'PUT',
+        body: JSON.stringify({
+          voter_id: voterId,
+          votes: allocation
+        })
+      });
+      return response;
+    } catch (error) {
+      console.error('Error submitting ballot:', error);
+      throw error;
+    }
+  }
+
   async getVotes(sessionId: string, userId?: string): Promise<any[]> {
     try {
       const endpoint = userId 
@@ -314,12 +332,28 @@ class ApiService {
     }
   }
 
+  // Poll a background job until it finishes and return its result
+  async waitForJob(jobId: string, intervalMs: number = 1000, timeoutMs: number = 300000): Promise<any> {
+    const deadline = Date.now() + timeoutMs;
+    while (Date.now() < deadline) {
+      const job = await this.fetchApi(`/jobs/${jobId}`);
+      if (job.status === 'completed') {
+        return job.result;
+      }
+      if (job.status === 'failed') {
+        throw new Error(job.error || 'Job failed');
+      }
+      await new Promise(resolve => setTimeout(resolve, intervalMs));
+    }
+    throw new Error('Timed out waiting for job');
+  }
+
   async generateThemes(sessionId: string): Promise<any> {
     try {
-      const response = await this.fetchApi(`/sessions/${sessionId}/themes`, {
+      const job = await this.fetchApi(`/sessions/${sessionId}/themes`, {
         method: 'POST'
       });
-      return response;
+      return await this.waitForJob(job.job_id);
     } catch (error) {
       console.error('Error generating themes:', error);
       throw error;
@@ -338,10 +372,10 @@ class ApiService {
 
   async generateFlowchart(sessionId: string): Promise<any> {
     try {
-      const response = await this.fetchApi(`/sessions/${sessionId}/flowchart`, {
+      const job = await this.fetchApi(`/sessions/${sessionId}/flowchart`, {
         method: 'POST'
       });
-      return response;
+      return await this.waitForJob(job.job_id);
     } catch (error) {
       console.error('Error generating flowchart:', error);
       throw error;
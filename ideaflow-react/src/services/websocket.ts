@@ -1,4 +1,5 @@
 import { io, Socket } from 'socket.io-client';
+import { unpackEventFrames } from '../utils/eventFrames';
 
 class WebSocketService {
   private socket: Socket | null = null;
@@ -9,6 +10,7 @@ class WebSocketService {
       this.socket = io(apiUrl, {
         transports: ['websocket', 'polling']
       });
+      unpackEventFrames(this.socket);
 
       this.socket.on('connect', () => {
         console.log('WebSocket connected');
@@ -0,0 +1,14 @@
+import type { Socket } from 'socket.io-client';
+
+/**
+ * The server coalesces busy rooms' events into one event_frame per tick
+ * ({ events: [[name, payload], ...]}). Re-dispatch each entry to the
+ * handlers registered for it, in order, so pages keep their usual listeners.
+ */
+export const unpackEventFrames = (socket: Socket) => {
+  socket.on('event_frame', (frame: any) => {
+    (frame?.events || []).forEach(([name, payload]: [string, any]) => {
+      socket.listeners(name).forEach(handler => handler(payload));
+    });
+  });
+};
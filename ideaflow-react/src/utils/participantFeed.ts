@@ -0,0 +1,108 @@
+import type { Socket } from 'socket.io-client';
+import type { ApiParticipant } from '../services/api';
+
+type ParticipantsUpdater = (prev: ApiParticipant[]) => ApiParticipant[];
+
+export const toParticipant = (raw: any): ApiParticipant => ({
+  id: raw.id,
+  name: raw.name,
+  sessionId: raw.session_id,
+  userId: raw.user_id || raw.id,
+  joinedAt: raw.joined_at,
+  status: raw.status || 'active',
+  ideas: raw.ideas || 0,
+  votes_cast: raw.votes_cast || 0
+});
+
+/**
+ * Keep a participant list in sync from sequence-numbered deltas
+ * (participant_joined / participant_left / participant_updated).
+ * A full snapshot is requested after joining the room and whenever a
+ * delta arrives out of sequence.
+ */
+export const subscribeToParticipantFeed = (
+  socket: Socket,
+  sessionId: string,
+  setParticipants: (update: ParticipantsUpdater) => void,
+  logPrefix = '[ParticipantFeed]'
+) => {
+  let lastSeq = -1;
+  let snapshotPending = false;
+  let buffered: { seq: number; apply: ParticipantsUpdater }[] = [];
+
+  const requestSnapshot = () => {
+    if (snapshotPending) {
+      return;
+    }
+    snapshotPending = true;
+    socket.emit('request_participants', { session_id: sessionId });
+  };
+
+  const handleDelta = (seq: number, apply: ParticipantsUpdater) => {
+    if (snapshotPending || lastSeq < 0) {
+      // Applied on top of the snapshot once it arrives
+      buffered.push({ seq, apply });
+      requestSnapshot();
+      return;
+    }
+    if (seq <= lastSeq) {
+      return;
+    }
+    if (seq !== lastSeq + 1) {
+      console.log(`${logPrefix} Gap in participant updates (${lastSeq} -> ${seq}), requesting snapshot`);
+      buffered.push({ seq, apply });
+      requestSnapshot();
+      return;
+    }
+    lastSeq = seq;
+    setParticipants(apply);
+  };
+
+  socket.on('joined_session', () => {
+    requestSnapshot();
+  });
+
+  socket.on('participants_snapshot', (data: any) => {
+    snapshotPending = false;
+    let seq = data?.seq || 0;
+    let list = (data?.participants || []).map(toParticipant);
+    const pending = buffered.filter(delta => delta.seq > seq).sort((a, b) => a.seq - b.seq);
+    buffered = [];
+
+    for (let i = 0; i < pending.length; i++) {
+      if (pending[i].seq !== seq + 1) {
+        // Still missing a delta; keep the rest and ask again
+        buffered = pending.slice(i);
+        break;
+      }
+      list = pending[i].apply(list);
+      seq = pending[i].seq;
+    }
+    lastSeq = seq;
+    console.log(`${logPrefix} Participant snapshot applied: ${list.length} participants at seq ${seq}`);
+    setParticipants(() => list);
+    if (buffered.length > 0) {
+      requestSnapshot();
+    }
+  });
+
+  socket.on('participant_joined', (data: any) => {
+    console.log(`${logPrefix} Participant joined:`, data);
+    const joined = toParticipant(data);
+    handleDelta(data.seq, prev => prev.some(p => p.userId === joined.userId)
+      ? prev.map(p => (p.userId === joined.userId ? { ...p, ...joined } : p))
+      : [...prev, joined]);
+  });
+
+  socket.on('participant_left', (data: any) => {
+    console.log(`${logPrefix} Participant left:`, data);
+    const userId = data.user_id || data.id;
+    handleDelta(data.seq, prev => prev.filter(p => p.userId !== userId));
+  });
+
+  socket.on('participant_updated', (data: any) => {
+    handleDelta(data.seq, prev => prev.map(p => (
+      data.all || p.userId === data.user_id ? { ...p, ...data.stats } : p
+    )));
+  });
+};
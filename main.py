@@ -4,6 +4,10 @@ Main entry point for IdeaFlow deployment
 This file ensures the deployment system recognizes this as a Flask application
 """
 
+# Monkey patching (ASYNC_MODE=eventlet/gevent) has to happen before any other import
+from utils.async_runtime import patch_runtime, server_options
+patch_runtime()
+
 import os
 import sys
 import subprocess
@@ -32,9 +36,10 @@ os.environ['PORT'] = str(os.environ.get('PORT', 5000))
 build_react_if_needed()
 
 # Import and run the Flask application
-from api_server import app, socketio
+from api_server import app, socketio, start_background_services
 
 if __name__ == '__main__':
+    start_background_services()
     port = int(os.environ.get('PORT', 5000))
     print(f"Starting IdeaFlow on port {port}")
     
@@ -45,5 +50,5 @@ if __name__ == '__main__':
         port=port, 
         debug=False, 
         use_reloader=False,
-        allow_unsafe_werkzeug=True
+        **server_options()
     )
\ No newline at end of file
@@ -0,0 +1,55 @@
+"""
+Shared fixtures: a PostgresDBManager backed by a temporary SQLite file.
+"""
+
+import uuid
+from datetime import datetime
+
+import pytest
+
+
+@pytest.fixture
+def db_manager(tmp_path, monkeypatch):
+    """Manager on a fresh file-backed SQLite database (with the writer thread)"""
+    pytest.importorskip('sqlalchemy')
+    from utils.postgres_db_manager import PostgresDBManager
+
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'ideaflow.db'}")
+    manager = PostgresDBManager()
+    assert manager.engine is not None
+    yield manager
+    manager.engine.dispose()
+
+
+@pytest.fixture
+def make_session(db_manager):
+    """Create a session with the given vote limits and return its id"""
+    def create(votes_per_participant=5, max_votes_per_idea=3):
+        session_id = str(uuid.uuid4())
+        db_manager.create_session({
+            'id': session_id,
+            'name': 'Test session',
+            'question': 'How might we test this?',
+            'facilitator_id': 'facilitator',
+            'current_phase': 1,
+            'created_at': datetime.now().isoformat(),
+            'max_participants': 50,
+            'votes_per_participant': votes_per_participant,
+            'max_votes_per_idea': max_votes_per_idea
+        })
+        return session_id
+    return create
+
+
+@pytest.fixture
+def make_idea(db_manager):
+    """Add an idea to a session and return its id"""
+    def create(session_id, content='An idea'):
+        return db_manager.add_idea({
+            'session_id': session_id,
+            'content': content,
+            'author_id': 'author',
+            'author_name': 'Author',
+            'round_number': 1
+        })
+    return create
@@ -0,0 +1,116 @@
+"""
+Near-duplicate detection: MinHash/LSH matching and the per-session index cache.
+"""
+
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('numpy')
+from utils.duplicate_index import DuplicateIndexManager, SessionDuplicateIndex
+
+
+class StoredIdeas:
+    """Stands in for the database manager: ideas per session, counting loads"""
+    def __init__(self, ideas=None):
+        self.ideas = ideas or {}
+        self.loads = 0
+
+    def get_ideas(self, session_id, include_author=False, round_number=None):
+        self.loads += 1
+        return list(self.ideas.get(session_id, []))
+
+
+def test_query_finds_near_duplicates_above_threshold():
+    index = SessionDuplicateIndex(threshold=0.6)
+    index.add('a', 'Offer free coffee in the office kitchen every morning')
+    index.add('b', 'Plant more trees along the river path')
+
+    matches = index.query('offer free coffee in the office kitchen each morning')
+
+    assert [match['id'] for match in matches] == ['a']
+    assert 0.6 <= matches[0]['similarity'] < 1
+
+
+def test_query_ignores_unrelated_and_empty_content():
+    index = SessionDuplicateIndex(threshold=0.6)
+    index.add('a', 'Offer free coffee in the office kitchen every morning')
+
+    assert index.query('Plant more trees along the river path') == []
+    assert index.query('  ') == []
+    assert index.query('Offer free coffee in the office kitchen every morning', exclude_id='a') == []
+
+
+def test_groups_joins_transitive_duplicates():
+    index = SessionDuplicateIndex(threshold=0.6)
+    index.add('a', 'weekly team lunch on friday afternoons')
+    index.add('b', 'weekly team lunch on friday afternoon')
+    index.add('c', 'a weekly team lunch on friday afternoon')
+    index.add('d', 'replace the broken printer on floor two')
+
+    groups = index.groups()
+
+    assert len(groups) == 1
+    assert sorted(idea['id'] for idea in groups[0]) == ['a', 'b', 'c']
+
+
+def test_manager_loads_each_session_once():
+    stored = StoredIdeas({'s1': [{'id': 'a', 'content': 'offer free coffee every morning'}]})
+    manager = DuplicateIndexManager(stored, threshold=0.6)
+
+    manager.add('s1', 'b', 'plant more trees')
+    duplicates = manager.find_duplicates('s1', 'offer free coffee every morning')
+
+    assert [idea['id'] for idea in duplicates] == ['a']
+    assert stored.loads == 1
+
+
+def test_manager_evicts_least_recently_used_sessions():
+    stored = StoredIdeas()
+    manager = DuplicateIndexManager(stored, threshold=0.6, max_sessions=2)
+
+    for session_id in ('s1', 's2', 's1', 's3'):
+        manager.groups(session_id)
+    manager.groups('s1')
+    manager.groups('s2')
+
+    # s2 was evicted by s3; s1 stayed cached because it was used more recently
+    assert stored.loads == 4
+
+
+def test_manager_drops_idle_sessions():
+    stored = StoredIdeas()
+    manager = DuplicateIndexManager(stored, threshold=0.6, idle_seconds=0.01)
+
+    manager.groups('s1')
+    time.sleep(0.05)
+    manager.groups('s1')
+
+    assert stored.loads == 2
+
+
+def test_invalidate_during_load_is_not_cached():
+    loading = threading.Event()
+    release = threading.Event()
+
+    class SlowIdeas(StoredIdeas):
+        def get_ideas(self, session_id, include_author=False, round_number=None):
+            ideas = super().get_ideas(session_id)
+            if self.loads == 1:
+                loading.set()
+                release.wait()
+            return ideas
+
+    stored = SlowIdeas()
+    manager = DuplicateIndexManager(stored, threshold=0.6)
+    thread = threading.Thread(target=manager.groups, args=('s1',))
+    thread.start()
+    loading.wait()
+    manager.invalidate('s1')
+    release.set()
+    thread.join()
+
+    manager.groups('s1')
+
+    assert stored.loads == 2
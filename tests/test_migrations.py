@@ -0,0 +1,109 @@
+"""
+Schema migrations: ordering, idempotency and concurrent startup.
+"""
+
+import threading
+
+import pytest
+
+sqlalchemy = pytest.importorskip('sqlalchemy')
+from sqlalchemy import text
+
+from utils.db_pool import create_pooled_engine
+from utils.migrations import MIGRATIONS, Migration, get_applied_versions, run_migrations
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine, _ = create_pooled_engine(f"sqlite:///{tmp_path / 'migrations.db'}")
+    yield engine
+    engine.dispose()
+
+
+def applied_versions(engine):
+    with engine.connect() as conn:
+        return get_applied_versions(conn)
+
+
+def test_fresh_database_applies_every_version_in_order(engine):
+    applied = run_migrations(engine)
+
+    versions = sorted(migration.version for migration in MIGRATIONS)
+    assert applied == versions
+    assert applied_versions(engine) == set(versions)
+
+
+def test_second_run_applies_nothing(engine):
+    run_migrations(engine)
+
+    assert run_migrations(engine) == []
+
+
+def test_migrations_are_applied_by_version_not_list_order(engine):
+    # Version 2 inserts into the table version 1 creates
+    migrations = [
+        Migration(2, 'second', ["INSERT INTO first_table (id) VALUES (1)"]),
+        Migration(1, 'first', ["CREATE TABLE first_table (id INTEGER)"]),
+    ]
+
+    assert run_migrations(engine, migrations) == [1, 2]
+
+
+def test_already_applied_version_is_skipped(engine):
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE schema_migrations (
+                version INTEGER PRIMARY KEY,
+                description VARCHAR(200),
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """))
+        conn.execute(text("INSERT INTO schema_migrations (version, description) VALUES (1, 'done elsewhere')"))
+
+    # Version 1 would fail if it ran: the table it inserts into doesn't exist
+    migrations = [
+        Migration(1, 'first', ["INSERT INTO missing_table (id) VALUES (1)"]),
+        Migration(2, 'second', ["CREATE TABLE second_table (id INTEGER)"]),
+    ]
+
+    assert run_migrations(engine, migrations) == [2]
+
+
+def test_failed_migration_is_not_recorded(engine):
+    migrations = [
+        Migration(1, 'first', ["CREATE TABLE first_table (id INTEGER)"]),
+        Migration(2, 'broken', ["CREATE TABLE second_table (id INTEGER)", "NOT VALID SQL"]),
+    ]
+
+    with pytest.raises(sqlalchemy.exc.DBAPIError):
+        run_migrations(engine, migrations)
+
+    with engine.connect() as conn:
+        assert get_applied_versions(conn) == {1}
+        # The broken version's earlier statements rolled back with it
+        tables = {row[0] for row in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'"))}
+    assert 'second_table' not in tables
+
+
+def test_concurrent_runs_apply_each_version_once(engine):
+    results = []
+    errors = []
+    barrier = threading.Barrier(4)
+
+    def boot():
+        try:
+            barrier.wait()
+            results.append(run_migrations(engine))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=boot) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    applied = [version for result in results for version in result]
+    assert sorted(applied) == sorted(migration.version for migration in MIGRATIONS)
+    assert len(applied) == len(set(applied))
@@ -0,0 +1,99 @@
+"""
+SQLite writer thread: batching, per-write failures and timeouts.
+"""
+
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeout
+
+import pytest
+
+pytest.importorskip('sqlalchemy')
+from sqlalchemy import text
+
+from utils.db_pool import create_pooled_engine
+from utils.sqlite_writer import SQLiteWriter
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine, _ = create_pooled_engine(f"sqlite:///{tmp_path / 'writer.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE items (name VARCHAR(50) UNIQUE)"))
+    yield engine
+    engine.dispose()
+
+
+def insert(name):
+    def write(conn):
+        conn.execute(text("INSERT INTO items (name) VALUES (:name)"), {'name': name})
+        return name
+    return write
+
+
+def stored_names(engine):
+    with engine.connect() as conn:
+        return sorted(row[0] for row in conn.execute(text("SELECT name FROM items")))
+
+
+def test_execute_returns_the_committed_result(engine):
+    writer = SQLiteWriter(engine)
+
+    assert writer.execute(insert('first')) == 'first'
+    assert stored_names(engine) == ['first']
+
+
+def test_failing_write_does_not_roll_back_its_batch(engine):
+    writer = SQLiteWriter(engine)
+    started = threading.Event()
+    release = threading.Event()
+
+    def blocker(conn):
+        started.set()
+        release.wait()
+
+    # Hold the writer so the next three writes land in one batch
+    writer.submit(blocker)
+    started.wait()
+    futures = [writer.submit(insert('a')), writer.submit(insert('a')), writer.submit(insert('b'))]
+    release.set()
+
+    assert futures[0].result(timeout=5) == 'a'
+    with pytest.raises(Exception):
+        futures[1].result(timeout=5)
+    assert futures[2].result(timeout=5) == 'b'
+    assert stored_names(engine) == ['a', 'b']
+
+
+def test_queued_write_is_cancelled_on_timeout(engine):
+    writer = SQLiteWriter(engine, timeout=0.1)
+    started = threading.Event()
+    release = threading.Event()
+
+    def blocker(conn):
+        started.set()
+        release.wait()
+
+    blocked = writer.submit(blocker)
+    started.wait()
+    with pytest.raises(FutureTimeout):
+        writer.execute(insert('late'))
+    release.set()
+    blocked.result(timeout=5)
+
+    # Let the writer drain the cancelled entry; it must not be applied
+    writer.execute(insert('after'))
+    assert stored_names(engine) == ['after']
+
+
+def test_running_write_is_waited_for_past_the_timeout(engine):
+    writer = SQLiteWriter(engine, timeout=0.1)
+    # Warm the thread up so the write is picked up well inside the timeout
+    writer.execute(lambda conn: None)
+
+    def slow(conn):
+        time.sleep(0.5)
+        return insert('slow')(conn)
+
+    assert writer.execute(slow) == 'slow'
+    assert stored_names(engine) == ['slow']
@@ -0,0 +1,75 @@
+"""
+Session timers: remaining time and claiming expiry across workers.
+"""
+
+from datetime import datetime, timedelta
+
+from utils.timer_service import TimerService, remaining_seconds
+
+
+def start_expired_timer(db_manager, session_id, auto_advance=False):
+    db_manager.save_timer_state(session_id, {
+        'duration': 10,
+        'remaining': 10,
+        'is_running': True,
+        'started_at': (datetime.now() - timedelta(seconds=30)).isoformat(),
+        'auto_advance': auto_advance
+    })
+
+
+class Worker:
+    """A TimerService with recorded events and no background scheduler"""
+    def __init__(self, db_manager):
+        self.events = []
+        self.advanced = []
+        self.service = TimerService(
+            db_manager,
+            emit=lambda event, payload, room=None: self.events.append(event),
+            start_background_task=lambda fn: None,
+            on_expire=self.advanced.append,
+            tick=1
+        )
+
+
+def test_remaining_seconds_counts_down_from_started_at():
+    now = datetime.now()
+    running = {'remaining': 60, 'is_running': True, 'started_at': (now - timedelta(seconds=15)).isoformat()}
+    paused = {'remaining': 60, 'is_running': False, 'started_at': None}
+
+    assert remaining_seconds(running, now) == 45
+    assert remaining_seconds(paused, now) == 60
+    assert remaining_seconds({**running, 'remaining': 10}, now) == 0
+
+
+def test_expiry_is_claimed_by_exactly_one_worker(db_manager, make_session):
+    session_id = make_session()
+    start_expired_timer(db_manager, session_id, auto_advance=True)
+    workers = [Worker(db_manager) for _ in range(3)]
+
+    for worker in workers:
+        worker.service._fire(session_id, 0)
+
+    assert sum(worker.events.count('timer_expired') for worker in workers) == 1
+    assert sum(len(worker.advanced) for worker in workers) == 1
+    timer = db_manager.get_timer_state(session_id)
+    assert not timer['is_running'] and timer['remaining'] == 0
+
+
+def test_expire_timer_ignores_a_restarted_timer(db_manager, make_session):
+    session_id = make_session()
+    start_expired_timer(db_manager, session_id)
+    stale_started_at = db_manager.get_timer_state(session_id)['started_at']
+    Worker(db_manager).service.start_timer(session_id, 60)
+
+    assert not db_manager.expire_timer(session_id, stale_started_at)
+    assert db_manager.get_timer_state(session_id)['is_running']
+
+
+def test_running_timer_ticks_instead_of_expiring(db_manager, make_session):
+    session_id = make_session()
+    worker = Worker(db_manager)
+    worker.service.start_timer(session_id, 60)
+
+    worker.service._fire(session_id, 0)
+
+    assert worker.events == ['timer_update']
@@ -0,0 +1,137 @@
+"""
+Vote budgets: per-idea and per-participant limits under single and concurrent writes.
+"""
+
+import threading
+
+
+def voter_points(db_manager, session_id, voter_id):
+    return sum(vote['points'] for vote in db_manager.get_votes(session_id, voter_id))
+
+
+def test_cast_vote_tracks_remaining_budget(db_manager, make_session, make_idea):
+    session_id = make_session(votes_per_participant=5, max_votes_per_idea=3)
+    first = make_idea(session_id, 'First')
+    second = make_idea(session_id, 'Second')
+
+    result = db_manager.cast_vote(session_id, first, 'voter', 3)
+    assert result['status'] == 'ok'
+    assert result['idea_total'] == 3
+    assert result['remaining'] == 2
+
+    result = db_manager.cast_vote(session_id, second, 'voter', 2)
+    assert result['status'] == 'ok'
+    assert result['voter_total'] == 5
+    assert result['remaining'] == 0
+
+
+def test_cast_vote_rejects_overspending(db_manager, make_session, make_idea):
+    session_id = make_session(votes_per_participant=4, max_votes_per_idea=3)
+    first = make_idea(session_id, 'First')
+    second = make_idea(session_id, 'Second')
+    db_manager.cast_vote(session_id, first, 'voter', 3)
+
+    result = db_manager.cast_vote(session_id, second, 'voter', 2)
+
+    assert result['status'] == 'budget_exceeded'
+    assert result['remaining'] == 1
+    assert voter_points(db_manager, session_id, 'voter') == 3
+
+
+def test_changing_a_vote_only_spends_the_difference(db_manager, make_session, make_idea):
+    session_id = make_session(votes_per_participant=3, max_votes_per_idea=3)
+    idea_id = make_idea(session_id)
+    db_manager.cast_vote(session_id, idea_id, 'voter', 3)
+
+    lowered = db_manager.cast_vote(session_id, idea_id, 'voter', 1)
+    raised = db_manager.cast_vote(session_id, idea_id, 'voter', 3)
+
+    assert lowered['status'] == 'ok' and lowered['remaining'] == 2
+    assert raised['status'] == 'ok' and raised['idea_total'] == 3
+    assert voter_points(db_manager, session_id, 'voter') == 3
+
+
+def test_cast_vote_rejects_per_idea_limit(db_manager, make_session, make_idea):
+    session_id = make_session(votes_per_participant=10, max_votes_per_idea=2)
+    idea_id = make_idea(session_id)
+
+    result = db_manager.cast_vote(session_id, idea_id, 'voter', 3)
+
+    assert result['status'] == 'idea_limit'
+    assert voter_points(db_manager, session_id, 'voter') == 0
+
+
+def test_cast_vote_on_unknown_idea_leaves_budget_untouched(db_manager, make_session, make_idea):
+    session_id = make_session(votes_per_participant=3, max_votes_per_idea=3)
+    idea_id = make_idea(session_id)
+
+    assert db_manager.cast_vote(session_id, 'missing', 'voter', 2)['status'] == 'idea_not_found'
+    assert db_manager.cast_vote(session_id, idea_id, 'voter', 3)['status'] == 'ok'
+
+
+def test_cast_vote_on_unknown_session(db_manager):
+    assert db_manager.cast_vote('missing', 'idea', 'voter', 1)['status'] == 'session_not_found'
+
+
+def test_concurrent_votes_cannot_overspend(db_manager, make_session, make_idea):
+    session_id = make_session(votes_per_participant=5, max_votes_per_idea=1)
+    idea_ids = [make_idea(session_id, f'Idea {i}') for i in range(12)]
+    barrier = threading.Barrier(len(idea_ids))
+    statuses = []
+
+    def vote(idea_id):
+        barrier.wait()
+        statuses.append(db_manager.cast_vote(session_id, idea_id, 'voter', 1)['status'])
+
+    threads = [threading.Thread(target=vote, args=(idea_id,)) for idea_id in idea_ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert statuses.count('ok') == 5
+    assert statuses.count('budget_exceeded') == 7
+    assert voter_points(db_manager, session_id, 'voter') == 5
+
+
+def test_replace_ballot_drops_ideas_left_out(db_manager, make_session, make_idea):
+    session_id = make_session(votes_per_participant=5, max_votes_per_idea=3)
+    first = make_idea(session_id, 'First')
+    second = make_idea(session_id, 'Second')
+    db_manager.replace_ballot(session_id, 'voter', {first: 3, second: 2})
+
+    result = db_manager.replace_ballot(session_id, 'voter', {second: 1})
+
+    assert result['status'] == 'ok'
+    assert result['allocation'] == {second: 1}
+    assert result['idea_totals'] == {first: 0, second: 1}
+    assert result['remaining'] == 4
+    assert voter_points(db_manager, session_id, 'voter') == 1
+
+
+def test_replace_ballot_rejects_over_budget_without_writing(db_manager, make_session, make_idea):
+    session_id = make_session(votes_per_participant=4, max_votes_per_idea=3)
+    first = make_idea(session_id, 'First')
+    second = make_idea(session_id, 'Second')
+    db_manager.replace_ballot(session_id, 'voter', {first: 1})
+
+    over_budget = db_manager.replace_ballot(session_id, 'voter', {first: 3, second: 2})
+    over_limit = db_manager.replace_ballot(session_id, 'voter', {first: 4})
+    missing = db_manager.replace_ballot(session_id, 'voter', {first: 1, 'missing': 1})
+
+    assert over_budget['status'] == 'budget_exceeded'
+    assert over_limit['status'] == 'idea_limit' and over_limit['idea_ids'] == [first]
+    assert missing['status'] == 'idea_not_found' and missing['idea_ids'] == ['missing']
+    assert voter_points(db_manager, session_id, 'voter') == 1
+
+
+def test_replace_ballot_and_cast_vote_share_the_budget(db_manager, make_session, make_idea):
+    session_id = make_session(votes_per_participant=4, max_votes_per_idea=3)
+    first = make_idea(session_id, 'First')
+    second = make_idea(session_id, 'Second')
+    db_manager.replace_ballot(session_id, 'voter', {first: 3})
+
+    result = db_manager.cast_vote(session_id, second, 'voter', 2)
+
+    assert result['status'] == 'budget_exceeded'
+    assert result['remaining'] == 1
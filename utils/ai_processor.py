@@ -6,57 +6,222 @@ Handles NLP tasks like clustering ideas into themes.
 import numpy as np
 import pandas as pd
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.cluster import DBSCAN, KMeans
+from sklearn.cluster import DBSCAN, KMeans, MiniBatchKMeans
 from sklearn.decomposition import TruncatedSVD
-from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.metrics.pairwise import cosine_similarity, pairwise_distances
+from sklearn.preprocessing import normalize
+from scipy import sparse
 import spacy
+import os
+import json
 import uuid
 import re
-from collections import Counter
+import threading
+import time
 
-# Load spaCy model for English
-try:
-    nlp = spacy.load("en_core_web_sm")
-except:
-    # Fallback to smaller model if the large one is not available
-    try:
-        nlp = spacy.load("en_core_web_md")
-    except:
-        # If no spaCy model is available, use basic NLP
-        print("spaCy models not available, using basic NLP")
-        nlp = None
+# spaCy pipeline shared by every AIProcessor in the process. Loading it is the
+# slowest part of theme generation, so it happens once via load_nlp() (usually
+# from the processor registry's warm-up thread) instead of at import time.
+nlp = None
+_nlp_loaded = False
+_nlp_lock = threading.Lock()
+
+# Theme analysis only reads lemmas, stop-word flags and POS tags, so the
+# dependency parser and entity recognizer are excluded from the pipeline.
+NLP_EXCLUDED_COMPONENTS = ["parser", "ner"]
+
+# Part-of-speech tags considered meaningful when naming themes
+KEYWORD_POS_TAGS = ['NOUN', 'ADJ', 'VERB']
+
+# Default term -> concept lookup used to name themes. Terms are matched against
+# TF-IDF features (lemmas); AI_THEME_CONCEPTS_FILE can point at a JSON object of
+# the same shape to extend or override it.
+DEFAULT_THEME_CONCEPTS = {
+    'customer': ['Customer Experience', 'Customer Relations', 'Customer Service'],
+    'loyalty': ['Customer Experience', 'Customer Relations', 'Retention'],
+    'menu': ['Menu & Food', 'Culinary Experience', 'Food Service'],
+    'seasonal': ['Menu & Food', 'Seasonal Offerings', 'Food Innovation'],
+    'mobile': ['Technology', 'Digital Solutions', 'Mobile Apps'],
+    'app': ['Technology', 'Digital Solutions', 'Mobile Apps'],
+    'technology': ['Technology', 'Digital Solutions', 'Innovation'],
+    'digital': ['Technology', 'Digital Solutions', 'Innovation'],
+    'staff': ['Staff & Operations', 'Human Resources', 'Team Management'],
+    'employee': ['Staff & Operations', 'Human Resources', 'Team Management'],
+    'recognition': ['Staff & Operations', 'Human Resources', 'Team Management'],
+    'interior': ['Ambiance & Design', 'Physical Space', 'Interior Design'],
+    'design': ['Ambiance & Design', 'Physical Space', 'Design'],
+    'ambiance': ['Ambiance & Design', 'Physical Space', 'Experience'],
+    'marketing': ['Marketing & Promotion', 'Brand Building', 'Customer Outreach'],
+    'social': ['Marketing & Promotion', 'Social Media', 'Brand Building'],
+    'email': ['Marketing & Promotion', 'Communication', 'Customer Outreach'],
+    'photography': ['Marketing & Promotion', 'Visual Content', 'Brand Building'],
+    'event': ['Events & Entertainment', 'Customer Experience', 'Special Occasions'],
+    'dinner': ['Events & Entertainment', 'Dining Experience', 'Food Service'],
+    'themed': ['Events & Entertainment', 'Special Occasions', 'Experience'],
+    'program': ['Programs & Systems', 'Business Operations', 'Customer Experience']
+}
+
+# Specific examples that make poor theme names on their own
+THEME_NAME_EXCLUDED_WORDS = {'wine', 'pairing', 'wednesday', 'murder', 'mystery'}
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+def load_theme_concepts(path=None):
+    """Return the term -> concepts table, merging AI_THEME_CONCEPTS_FILE over the defaults"""
+    concepts = {term: list(names) for term, names in DEFAULT_THEME_CONCEPTS.items()}
+    path = path or os.getenv('AI_THEME_CONCEPTS_FILE')
+    if path:
+        try:
+            with open(path) as f:
+                custom = json.load(f)
+            for term, names in custom.items():
+                concepts[term.lower()] = [names] if isinstance(names, str) else list(names)
+        except Exception as e:
+            print(f"Failed to load theme concepts from {path}: {e}")
+    return concepts
+
+def load_nlp():
+    """Load the spaCy English model once and return it (None if unavailable)"""
+    global nlp, _nlp_loaded
+    if _nlp_loaded:
+        return nlp
+    with _nlp_lock:
+        if _nlp_loaded:
+            return nlp
+        try:
+            nlp = spacy.load("en_core_web_sm", exclude=NLP_EXCLUDED_COMPONENTS)
+        except:
+            # Fallback to smaller model if the large one is not available
+            try:
+                nlp = spacy.load("en_core_web_md", exclude=NLP_EXCLUDED_COMPONENTS)
+            except:
+                # If no spaCy model is available, use basic NLP
+                print("spaCy models not available, using basic NLP")
+                nlp = None
+        _nlp_loaded = True
+        return nlp
 
 class AIProcessor:
     """
     Processes ideas using NLP techniques to group them into themes
     and provide insights.
     """
-    def __init__(self):
-        self.vectorizer = TfidfVectorizer(
-            max_features=5000,
-            min_df=1,
-            max_df=0.8,
-            stop_words='english'
-        )
+    def __init__(self, batch_size=None, n_process=None, cache=None):
+        # nlp.pipe settings for batch preprocessing (env overridable)
+        self.batch_size = batch_size or int(os.getenv('AI_NLP_BATCH_SIZE', 256))
+        self.n_process = n_process or int(os.getenv('AI_NLP_N_PROCESS', 1))
+        
+        # Optional PreprocessCache so unchanged ideas skip spaCy on regeneration
+        self.cache = cache
+        
+        # Vectorizer settings only - a fresh TfidfVectorizer is fitted per call so a
+        # single processor can be shared across requests without leaking the
+        # vocabulary of one session into another. float32 halves matrix memory.
+        self.vectorizer_params = {
+            'max_features': int(os.getenv('AI_MAX_FEATURES', 5000)),
+            'min_df': 1,
+            'max_df': 0.8,
+            'stop_words': 'english',
+            'dtype': np.float32
+        }
+        
+        # Sessions at or above this size are clustered with MiniBatchKMeans directly
+        # on the sparse TF-IDF matrix instead of SVD + full KMeans
+        self.large_session_threshold = int(os.getenv('AI_LARGE_SESSION_THRESHOLD', 1000))
+        self.minibatch_size = int(os.getenv('AI_MINIBATCH_SIZE', 1024))
+        
+        # Automatic theme-count selection: silhouette scores are computed on a
+        # sample of at most silhouette_sample_size ideas
+        self.auto_select_k = os.getenv('AI_AUTO_K', 'true').lower() == 'true'
+        self.silhouette_sample_size = int(os.getenv('AI_SILHOUETTE_SAMPLE', 500))
+        
+        # Concept lookup table for theme naming; columns of the concept matrix
+        # follow first appearance so ties resolve the same way on every run
+        self.theme_concepts = load_theme_concepts()
+        self.concept_names = list(dict.fromkeys(
+            name for names in self.theme_concepts.values() for name in names
+        ))
+        self._concept_index = {name: i for i, name in enumerate(self.concept_names)}
+        load_nlp()
     
-    def preprocess_text(self, text):
-        """Preprocess text for analysis"""
+    def build_vectorizer(self):
+        """Create an unfitted TF-IDF vectorizer for a single clustering run"""
+        return TfidfVectorizer(**self.vectorizer_params)
+    
+    def clean_text(self, text):
+        """Lowercase text and strip special characters before NLP"""
         if not text or not isinstance(text, str):
             return ""
+        return re.sub(r'[^\w\s]', ' ', text.lower())
+    
+    def extract_tokens(self, doc):
+        """Return (lemmatized text, theme keywords) for a parsed spaCy doc"""
+        tokens = []
+        keywords = []
+        for token in doc:
+            if token.is_stop or token.is_punct:
+                continue
+            if len(token.text) > 1:
+                tokens.append(token.lemma_)
+            if token.pos_ in KEYWORD_POS_TAGS and len(token.text) > 3:
+                keywords.append(token.lemma_.lower())
+        return " ".join(tokens), keywords
+    
+    def cache_namespace(self):
+        """Identify the loaded pipeline so cached results are invalidated when the model changes"""
+        if not nlp:
+            return 'basic'
+        return f"{nlp.meta.get('name', 'spacy')}-{nlp.meta.get('version', '')}"
+    
+    def analyze_texts(self, texts):
+        """
+        Preprocess a batch of texts in one nlp.pipe pass
+        
+        Args:
+            texts: List of raw idea texts
             
-        # Convert to lowercase and remove special characters
-        text = re.sub(r'[^\w\s]', ' ', text.lower())
-        
-        if nlp:
-            # Use spaCy for lemmatization if available
-            doc = nlp(text)
-            tokens = [token.lemma_ for token in doc if not token.is_stop and not token.is_punct and len(token.text) > 1]
-            return " ".join(tokens)
-        else:
+        Returns:
+            List of (preprocessed_text, keywords) tuples in input order
+        """
+        cleaned = [self.clean_text(text) for text in texts]
+        
+        if not nlp:
             # Basic preprocessing if spaCy is not available
-            return text
+            return [(text, []) for text in cleaned]
+        
+        results = [("", [])] * len(cleaned)
+        # Empty strings are skipped rather than sent through the pipeline
+        indexed = [(i, text) for i, text in enumerate(cleaned) if text.strip()]
+        
+        # Reuse cached results for ideas whose content hasn't changed
+        hashes = {}
+        if self.cache and indexed:
+            namespace = self.cache_namespace()
+            hashes = {i: self.cache.content_hash(text, namespace) for i, text in indexed}
+            cached = self.cache.get_many(list(set(hashes.values())))
+            pending = []
+            for i, text in indexed:
+                if hashes[i] in cached:
+                    results[i] = cached[hashes[i]]
+                else:
+                    pending.append((i, text))
+            indexed = pending
+        
+        docs = nlp.pipe((text for _, text in indexed), batch_size=self.batch_size, n_process=self.n_process)
+        new_entries = {}
+        for (i, _), doc in zip(indexed, docs):
+            results[i] = self.extract_tokens(doc)
+            if hashes:
+                new_entries[hashes[i]] = results[i]
+        
+        if self.cache and new_entries:
+            self.cache.put_many(new_entries)
+        return results
     
-    def get_themes_from_ideas(self, ideas, min_ideas_per_theme=2, max_themes=8):
+    def preprocess_text(self, text):
+        """Preprocess text for analysis"""
+        return self.analyze_texts([text])[0][0]
+    
+    def get_themes_from_ideas(self, ideas, min_ideas_per_theme=2, max_themes=8, n_clusters=None):
         """
         Group ideas into themes using clustering
         
@@ -64,6 +229,7 @@ class AIProcessor:
             ideas: List of idea dictionaries with 'id' and 'content' keys
             min_ideas_per_theme: Minimum ideas required to form a theme
             max_themes: Maximum number of themes to generate
+            n_clusters: Fixed number of clusters (selected automatically if None)
             
         Returns:
             Dictionary with themes and their assigned ideas
@@ -74,12 +240,17 @@ class AIProcessor:
                 'idea_theme_mapping': {}
             }
         
+        timings = {}
+        stage_start = time.perf_counter()
+        
         # Extract text content from ideas
         idea_texts = [idea['content'] for idea in ideas]
         idea_ids = [idea['id'] for idea in ideas]
         
-        # Preprocess texts
-        preprocessed_texts = [self.preprocess_text(text) for text in idea_texts]
+        # Preprocess texts in a single batched pass
+        analyzed = self.analyze_texts(idea_texts)
+        preprocessed_texts = [processed for processed, _ in analyzed]
+        stage_start = self._record_timing(timings, 'preprocess', stage_start)
         
         if len(preprocessed_texts) < min_ideas_per_theme:
             return {
@@ -88,38 +259,27 @@ class AIProcessor:
             }
         
         # Create TF-IDF matrix
+        vectorizer = self.build_vectorizer()
         try:
-            tfidf_matrix = self.vectorizer.fit_transform(preprocessed_texts)
-        except:
-            # Fallback if vectorization fails
+            tfidf_matrix = vectorizer.fit_transform(preprocessed_texts)
+        except ValueError:
+            # Fallback if vectorization fails (e.g. every idea was only stop words)
             return {
                 'themes': [],
                 'idea_theme_mapping': {}
             }
+        stage_start = self._record_timing(timings, 'vectorize', stage_start)
         
-        # Determine optimal number of clusters (themes)
         n_ideas = len(ideas)
-        n_clusters = min(max(2, n_ideas // 3), max_themes)
-        
-        # Apply dimension reduction for better clustering
-        if tfidf_matrix.shape[1] > 100:
-            svd = TruncatedSVD(n_components=min(100, tfidf_matrix.shape[0] - 1))
-            tfidf_matrix = svd.fit_transform(tfidf_matrix)
-        
-        # Cluster ideas using K-means
-        try:
-            kmeans = KMeans(n_clusters=n_clusters, random_state=42)
-            clusters = kmeans.fit_predict(tfidf_matrix)
-        except:
-            # Fallback to DBSCAN if K-means fails
-            try:
-                dbscan = DBSCAN(eps=0.5, min_samples=min_ideas_per_theme)
-                clusters = dbscan.fit_predict(tfidf_matrix)
-            except:
-                return {
-                    'themes': [],
-                    'idea_theme_mapping': {}
-                }
+        clusters, algorithm, k_selection = self.cluster_matrix(
+            tfidf_matrix, max_themes, min_ideas_per_theme, n_clusters=n_clusters
+        )
+        stage_start = self._record_timing(timings, 'cluster', stage_start)
+        if clusters is None:
+            return {
+                'themes': [],
+                'idea_theme_mapping': {}
+            }
         
         # Create mapping of ideas to clusters
         idea_clusters = {}
@@ -135,28 +295,39 @@ class AIProcessor:
                     cluster_ideas[cluster_id] = []
                 cluster_ideas[cluster_id].append({
                     'id': idea_id,
-                    'content': idea_texts[i]
+                    'content': idea_texts[i],
+                    'row': i
                 })
         
+        # Skip clusters with too few ideas
+        theme_clusters = [
+            cluster_content for cluster_content in cluster_ideas.values()
+            if len(cluster_content) >= min_ideas_per_theme
+        ]
+        
+        # Name every theme in one vectorized pass over the cluster centroids
+        centroids = self.cluster_centroids(
+            tfidf_matrix, [[item['row'] for item in cluster_content] for cluster_content in theme_clusters]
+        )
+        theme_names = self.name_themes(centroids, vectorizer.get_feature_names_out(), vectorizer.vocabulary_)
+        
+        # Cosine similarity of every themed idea to its own centroid, in one pass
+        centroid_scores = self.centroid_similarities(
+            tfidf_matrix, centroids, [[item['row'] for item in cluster_content] for cluster_content in theme_clusters]
+        )
+        
         # Generate theme names and descriptions
         themes = []
         
-        for cluster, cluster_content in cluster_ideas.items():
-            if len(cluster_content) < min_ideas_per_theme:
-                # Skip clusters with too few ideas
-                continue
-                
-            # Extract texts for this cluster
-            cluster_texts = [item['content'] for item in cluster_content]
-            
-            # Generate theme name
-            theme_name = self.generate_theme_name(cluster_texts)
+        for cluster_content, theme_name, scores in zip(theme_clusters, theme_names, centroid_scores):
+            # Extract texts for this cluster, most representative first
+            cluster_texts = [cluster_content[i]['content'] for i in np.argsort(-scores, kind='stable')]
             
             # Create theme object
             theme_id = str(uuid.uuid4())
             themes.append({
                 'id': theme_id,
-                'name': theme_name,
+                'name': theme_name or self.fallback_theme_name(cluster_texts),
                 'description': self.generate_theme_description(cluster_texts),
                 'idea_count': len(cluster_content)
             })
@@ -165,88 +336,266 @@ class AIProcessor:
             for item in cluster_content:
                 idea_clusters[item['id']] = theme_id
         
+        self._record_timing(timings, 'naming', stage_start)
+        
         return {
             'themes': themes,
-            'idea_theme_mapping': idea_clusters
+            'idea_theme_mapping': idea_clusters,
+            'stats': {
+                'algorithm': algorithm,
+                'n_ideas': n_ideas,
+                'n_features': tfidf_matrix.shape[1],
+                'n_clusters': k_selection['n_clusters'],
+                'k_selection': k_selection,
+                'timings': timings
+            }
         }
     
-    def generate_theme_name(self, texts, max_length=40):
-        """Generate a theme name from a list of related texts"""
-        # Combine all texts and find most common significant words
-        combined_text = " ".join(texts)
-        
-        if nlp:
-            # Use spaCy for concept extraction, focusing on business categories
-            doc = nlp(combined_text)
+    def _record_timing(self, timings, stage, started):
+        """Store the elapsed milliseconds for a stage and return the next stage's start time"""
+        now = time.perf_counter()
+        timings[stage] = round((now - started) * 1000, 1)
+        return now
+    
+    def cluster_matrix(self, tfidf_matrix, max_themes=8, min_ideas_per_theme=2, n_clusters=None):
+        """
+        Cluster a sparse TF-IDF matrix
+        
+        Large sessions use MiniBatchKMeans on the L2-normalized sparse rows
+        (spherical k-means), so the matrix is never densified. Smaller ones
+        are projected with TruncatedSVD and clustered with full KMeans.
+        When n_clusters is None the number of themes is picked by silhouette score.
+        
+        Returns:
+            Tuple of (cluster labels or None, algorithm name, k selection details)
+        """
+        n_ideas = tfidf_matrix.shape[0]
+        default_k = min(max(2, n_ideas // 3), max_themes)
+        large_session = n_ideas >= self.large_session_threshold
+        algorithm = 'minibatch_kmeans' if large_session else 'kmeans'
+        
+        def fit(k):
+            if large_session:
+                model = MiniBatchKMeans(
+                    n_clusters=k,
+                    batch_size=min(self.minibatch_size, n_ideas),
+                    n_init=3,
+                    random_state=42
+                )
+            else:
+                model = KMeans(n_clusters=k, n_init=3, random_state=42)
+            return model.fit_predict(features), float(model.inertia_)
+        
+        features = tfidf_matrix
+        try:
+            # Apply dimension reduction for better clustering
+            if not large_session and tfidf_matrix.shape[1] > 100:
+                svd = TruncatedSVD(n_components=min(100, n_ideas - 1))
+                features = svd.fit_transform(tfidf_matrix)
             
-            # Define business concept mapping
-            business_concepts = {
-                'customer': ['Customer Experience', 'Customer Relations', 'Customer Service'],
-                'loyalty': ['Customer Experience', 'Customer Relations', 'Retention'],
-                'menu': ['Menu & Food', 'Culinary Experience', 'Food Service'],
-                'seasonal': ['Menu & Food', 'Seasonal Offerings', 'Food Innovation'],
-                'mobile': ['Technology', 'Digital Solutions', 'Mobile Apps'],
-                'app': ['Technology', 'Digital Solutions', 'Mobile Apps'],
-                'technology': ['Technology', 'Digital Solutions', 'Innovation'],
-                'digital': ['Technology', 'Digital Solutions', 'Innovation'],
-                'staff': ['Staff & Operations', 'Human Resources', 'Team Management'],
-                'employee': ['Staff & Operations', 'Human Resources', 'Team Management'],
-                'recognition': ['Staff & Operations', 'Human Resources', 'Team Management'],
-                'interior': ['Ambiance & Design', 'Physical Space', 'Interior Design'],
-                'design': ['Ambiance & Design', 'Physical Space', 'Design'],
-                'ambiance': ['Ambiance & Design', 'Physical Space', 'Experience'],
-                'marketing': ['Marketing & Promotion', 'Brand Building', 'Customer Outreach'],
-                'social': ['Marketing & Promotion', 'Social Media', 'Brand Building'],
-                'email': ['Marketing & Promotion', 'Communication', 'Customer Outreach'],
-                'photography': ['Marketing & Promotion', 'Visual Content', 'Brand Building'],
-                'event': ['Events & Entertainment', 'Customer Experience', 'Special Occasions'],
-                'dinner': ['Events & Entertainment', 'Dining Experience', 'Food Service'],
-                'themed': ['Events & Entertainment', 'Special Occasions', 'Experience'],
-                'program': ['Programs & Systems', 'Business Operations', 'Customer Experience']
-            }
+            # Candidate theme counts must leave room for min_ideas_per_theme per theme
+            candidates = list(range(2, min(max_themes, n_ideas // max(1, min_ideas_per_theme)) + 1))
+            if n_clusters is None and self.auto_select_k and len(candidates) > 1:
+                labels, k_selection = self.select_cluster_count(features, candidates, fit)
+                return labels, algorithm, k_selection
+            
+            k = n_clusters or default_k
+            labels, inertia = fit(k)
+            return labels, algorithm, {'n_clusters': k, 'auto': False, 'metrics': [{'k': k, 'inertia': round(inertia, 4)}]}
+        except ValueError as e:
+            # Fallback to DBSCAN if K-means can't run (e.g. fewer distinct ideas than clusters)
+            print(f"K-means clustering failed, falling back to DBSCAN: {e}")
+            k_selection = {'n_clusters': None, 'auto': False, 'metrics': []}
+            try:
+                dbscan = DBSCAN(eps=0.5, min_samples=min_ideas_per_theme)
+                labels = dbscan.fit_predict(tfidf_matrix)
+                k_selection['n_clusters'] = int(len(set(labels) - {-1}))
+                return labels, 'dbscan', k_selection
+            except ValueError:
+                return None, 'none', k_selection
+    
+    def select_cluster_count(self, features, candidates, fit):
+        """
+        Fit every candidate k and keep the one with the best silhouette score
+        
+        Pairwise distances are computed once on a sample of the ideas and reused
+        for every k; the silhouette itself is evaluated with matrix operations.
+        
+        Args:
+            features: Matrix the clusterer is fitted on
+            candidates: Candidate numbers of clusters
+            fit: Callable k -> (labels, inertia)
+            
+        Returns:
+            Tuple of (labels for the best k, selection details with per-k metrics)
+        """
+        n_ideas = features.shape[0]
+        rng = np.random.RandomState(42)
+        if n_ideas > self.silhouette_sample_size:
+            sample = np.sort(rng.choice(n_ideas, self.silhouette_sample_size, replace=False))
+        else:
+            sample = np.arange(n_ideas)
+        distances = pairwise_distances(features[sample], metric='euclidean')
+        
+        best_labels = None
+        best_score = None
+        best_k = None
+        metrics = []
+        for k in candidates:
+            labels, inertia = fit(k)
+            score = self.silhouette_from_distances(distances, labels[sample], k)
+            metrics.append({'k': k, 'silhouette': round(score, 4), 'inertia': round(inertia, 4)})
+            # Ties go to the smaller k since candidates are ascending
+            if best_score is None or score > best_score:
+                best_labels, best_score, best_k = labels, score, k
+        
+        return best_labels, {
+            'n_clusters': best_k,
+            'auto': True,
+            'silhouette': round(best_score, 4),
+            'sample_size': len(sample),
+            'metrics': metrics
+        }
+    
+    def silhouette_from_distances(self, distances, labels, k):
+        """Mean silhouette coefficient from a precomputed distance matrix, vectorized over all points"""
+        n_points = len(labels)
+        rows = np.arange(n_points)
+        membership = np.zeros((n_points, k))
+        membership[rows, labels] = 1.0
+        counts = membership.sum(axis=0)
+        
+        # Sum of distances from every point to every cluster in one matrix product
+        cluster_sums = distances @ membership
+        own_counts = counts[labels]
+        intra = cluster_sums[rows, labels] / np.maximum(own_counts - 1, 1)
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean_other = cluster_sums / counts
+        mean_other[:, counts == 0] = np.inf
+        mean_other[rows, labels] = np.inf
+        nearest = mean_other.min(axis=1)
+        if not np.isfinite(nearest).any():
+            # Only one cluster represented in the sample
+            return 0.0
+        
+        denominator = np.maximum(intra, nearest)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scores = np.where(denominator > 0, (nearest - intra) / denominator, 0.0)
+        # Singletons score 0 by convention
+        scores[own_counts <= 1] = 0.0
+        scores[~np.isfinite(scores)] = 0.0
+        return float(scores.mean())
+    
+    def cluster_centroids(self, tfidf_matrix, cluster_rows):
+        """
+        Mean TF-IDF vector of each cluster
+        
+        Args:
+            tfidf_matrix: Sparse (n_ideas x n_features) matrix
+            cluster_rows: List of row index lists, one per cluster
             
-            # Extract meaningful tokens
-            meaningful_tokens = []
-            for token in doc:
-                if (not token.is_stop and not token.is_punct and 
-                    token.pos_ in ['NOUN', 'ADJ', 'VERB'] and
-                    len(token.text) > 3):
-                    meaningful_tokens.append(token.lemma_.lower())
+        Returns:
+            Sparse (n_clusters x n_features) matrix of centroids
+        """
+        rows = []
+        cols = []
+        weights = []
+        for cluster, members in enumerate(cluster_rows):
+            rows.extend([cluster] * len(members))
+            cols.extend(members)
+            weights.extend([1.0 / len(members)] * len(members))
+        membership = sparse.csr_matrix(
+            (np.asarray(weights, dtype=np.float32), (rows, cols)),
+            shape=(len(cluster_rows), tfidf_matrix.shape[0])
+        )
+        return membership @ tfidf_matrix
+    
+    def centroid_similarities(self, tfidf_matrix, centroids, cluster_rows):
+        """
+        Cosine similarity of each clustered idea to its cluster centroid
+        
+        TF-IDF rows are already L2-normalized, so after normalizing the
+        centroids a row-wise dot product gives the cosine score.
+        
+        Returns:
+            List of score arrays aligned with cluster_rows
+        """
+        if not cluster_rows:
+            return []
+        rows = np.concatenate([np.asarray(members) for members in cluster_rows])
+        labels = np.repeat(np.arange(len(cluster_rows)), [len(members) for members in cluster_rows])
+        unit_centroids = normalize(sparse.csr_matrix(centroids))
+        scores = np.asarray(tfidf_matrix[rows].multiply(unit_centroids[labels]).sum(axis=1)).ravel()
+        return np.split(scores, np.cumsum([len(members) for members in cluster_rows])[:-1])
+    
+    def concept_matrix(self, vocabulary):
+        """Sparse (n_features x n_concepts) indicator matrix of the concept table for a fitted vocabulary"""
+        rows = []
+        cols = []
+        for term, names in self.theme_concepts.items():
+            feature = vocabulary.get(term)
+            if feature is None:
+                continue
+            for name in names:
+                rows.append(feature)
+                cols.append(self._concept_index[name])
+        return sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+            shape=(len(vocabulary), len(self.concept_names))
+        )
+    
+    def name_themes(self, centroids, feature_names, vocabulary, max_length=40):
+        """
+        Name every cluster from its centroid's top-weighted features
+        
+        Concept scores for all clusters come from a single sparse product of the
+        centroids with the concept matrix. Clusters that match no concept are
+        named after their strongest centroid terms.
+        
+        Args:
+            centroids: Sparse (n_clusters x n_features) centroid matrix
+            feature_names: Vectorizer feature names
+            vocabulary: Vectorizer term -> feature index mapping
+            max_length: Maximum theme name length
             
-            # Map tokens to business concepts
-            concept_scores = {}
-            for token in meaningful_tokens:
-                if token in business_concepts:
-                    for concept in business_concepts[token]:
-                        concept_scores[concept] = concept_scores.get(concept, 0) + 1
+        Returns:
+            List of theme names (None where the centroid has no usable terms)
+        """
+        centroids = sparse.csr_matrix(centroids)
+        concept_scores = (centroids @ self.concept_matrix(vocabulary)).toarray()
+        
+        names = []
+        for i in range(centroids.shape[0]):
+            # If we found business concepts, use the strongest one
+            if concept_scores.shape[1] and concept_scores[i].max() > 0:
+                names.append(self.concept_names[int(np.argmax(concept_scores[i]))][:max_length])
+                continue
             
-            # If we found business concepts, use the most common one
-            if concept_scores:
-                best_concept = max(concept_scores.items(), key=lambda x: x[1])
-                return best_concept[0][:max_length]
+            # Fallback: top centroid terms, avoiding specific examples and days
+            start, end = centroids.indptr[i], centroids.indptr[i + 1]
+            indices = centroids.indices[start:end]
+            weights = centroids.data[start:end]
+            theme_words = []
+            for j in np.argsort(-weights, kind='stable'):
+                word = str(feature_names[indices[j]])
+                if (len(word) > 3 and word not in THEME_NAME_EXCLUDED_WORDS and
+                        not any(day in word for day in WEEKDAYS)):
+                    theme_words.append(word.capitalize())
+                if len(theme_words) == 2:
+                    break
             
-            # Fallback: Extract most common meaningful nouns
-            if meaningful_tokens:
-                counter = Counter(meaningful_tokens)
-                common_words = counter.most_common(3)
-                
-                # Create theme name from top keywords, avoiding specific examples
-                theme_words = []
-                for word, count in common_words:
-                    # Skip specific examples and days/months
-                    if (word not in ['wine', 'pairing', 'wednesday', 'murder', 'mystery'] and
-                        not any(day in word for day in ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']) and
-                        len(theme_words) < 2):
-                        theme_words.append(word.capitalize())
-                
-                if theme_words:
-                    if len(theme_words) == 1:
-                        return f"{theme_words[0]} Solutions"
-                    else:
-                        return " & ".join(theme_words)
-        
-        # Ultimate fallback - create descriptive theme based on text analysis
-        words = combined_text.lower().split()
+            if not theme_words:
+                names.append(None)
+            elif len(theme_words) == 1:
+                names.append(f"{theme_words[0]} Solutions"[:max_length])
+            else:
+                names.append(" & ".join(theme_words)[:max_length])
+        return names
+    
+    def fallback_theme_name(self, texts):
+        """Descriptive theme name from raw text when the centroid has no usable terms"""
+        words = " ".join(texts).lower().split()
         if 'customer' in words or 'loyalty' in words:
             return "Customer Experience"
         elif 'menu' in words or 'food' in words or 'seasonal' in words:
@@ -263,8 +612,8 @@ class AIProcessor:
             return "Business Innovation"
     
     def generate_theme_description(self, texts, max_length=120):
-        """Generate a description for a theme based on related texts"""
-        # Simple approach: combine first parts of each text
+        """Generate a description for a theme from its texts, most representative first"""
+        # Combine the opening of the most representative texts
         summaries = []
         
         for text in texts[:3]:  # Use up to 3 texts
@@ -0,0 +1,134 @@
+"""
+Serving modes for the IdeaFlow API server.
+ASYNC_MODE=threading keeps the Werkzeug development server with one OS thread
+per socket. eventlet and gevent run a cooperative server in which one process
+holds thousands of sockets; PostgreSQL I/O is made cooperative with psycogreen
+and SQLite calls and inline theme clustering run on the hub's native thread pool.
+"""
+
+import os
+
+ASYNC_MODES = ('threading', 'eventlet', 'gevent')
+
+_patched = None
+
+
+def async_mode():
+    """Configured serving mode (ASYNC_MODE, default 'threading')"""
+    mode = os.getenv('ASYNC_MODE', 'threading').lower()
+    if mode not in ASYNC_MODES:
+        raise ValueError(f"ASYNC_MODE must be one of {', '.join(ASYNC_MODES)}, got {mode!r}")
+    return mode
+
+
+def is_cooperative():
+    """True when running under eventlet or gevent"""
+    return async_mode() != 'threading'
+
+
+def patch_runtime():
+    """
+    Monkey patch the standard library for the configured mode
+
+    Must run before flask, sqlalchemy or anything that imports threading or
+    socket; calling it again is a no-op.
+    """
+    global _patched
+    if _patched is not None:
+        return _patched
+
+    mode = async_mode()
+    if mode == 'eventlet':
+        import eventlet
+        eventlet.monkey_patch()
+    elif mode == 'gevent':
+        from gevent import monkey
+        monkey.patch_all()
+
+    if mode != 'threading':
+        try:
+            if mode == 'eventlet':
+                from psycogreen.eventlet import patch_psycopg
+            else:
+                from psycogreen.gevent import patch_psycopg
+            patch_psycopg()
+        except ImportError:
+            print("psycogreen not installed; PostgreSQL queries will block the event loop")
+
+    _patched = mode
+    print(f"Async mode: {mode}")
+    return mode
+
+
+def run_blocking(fn, *args, **kwargs):
+    """Run a blocking call on a native OS thread when cooperative, inline otherwise"""
+    mode = async_mode()
+    if mode == 'eventlet':
+        from eventlet import tpool
+        return tpool.execute(fn, *args, **kwargs)
+    if mode == 'gevent':
+        import gevent
+        return gevent.get_hub().threadpool.apply(fn, args, kwargs)
+    return fn(*args, **kwargs)
+
+
+def needs_offload(dialect):
+    """Whether a dialect's driver would block the hub (psycopg2 is patched by psycogreen instead)"""
+    return is_cooperative() and dialect == 'sqlite'
+
+
+class OffloadedCursor:
+    """DB-API cursor whose execute/fetch calls run on the native thread pool"""
+    _BLOCKING = ('execute', 'executemany', 'fetchone', 'fetchmany', 'fetchall', 'close')
+
+    def __init__(self, cursor):
+        object.__setattr__(self, '_cursor', cursor)
+
+    def __getattr__(self, name):
+        value = getattr(self._cursor, name)
+        if name in self._BLOCKING:
+            return lambda *args, **kwargs: run_blocking(value, *args, **kwargs)
+        return value
+
+    def __setattr__(self, name, value):
+        setattr(self._cursor, name, value)
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+
+class OffloadedConnection:
+    """DB-API connection whose blocking calls run on the native thread pool"""
+    _BLOCKING = ('commit', 'rollback', 'close')
+
+    def __init__(self, connection):
+        object.__setattr__(self, '_connection', connection)
+
+    def cursor(self, *args, **kwargs):
+        return OffloadedCursor(self._connection.cursor(*args, **kwargs))
+
+    def __getattr__(self, name):
+        value = getattr(self._connection, name)
+        if name in self._BLOCKING:
+            return lambda *args, **kwargs: run_blocking(value, *args, **kwargs)
+        return value
+
+    def __setattr__(self, name, value):
+        setattr(self._connection, name, value)
+
+
+def offload_dbapi(engine):
+    """Open the engine's DB-API connections through OffloadedConnection"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, 'do_connect')
+    def connect_offloaded(dialect, connection_record, cargs, cparams):
+        return OffloadedConnection(run_blocking(dialect.connect, *cargs, **cparams))
+
+
+def server_options():
+    """socketio.run keyword arguments for the configured mode"""
+    if async_mode() == 'threading':
+        # The Werkzeug server is only meant for development
+        return {'allow_unsafe_werkzeug': True}
+    return {}
@@ -0,0 +1,130 @@
+"""
+Per-room broadcast coalescing for Socket.IO.
+Hot events (votes, ideas, participant deltas) are queued per room and flushed
+once per tick as a single event_frame, so a busy room gets a few frames a
+second instead of one broadcast per click. Updates that supersede each other
+(the same voter's vote on the same idea) are merged before they are sent.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+FRAME_EVENT = 'event_frame'
+
+
+class BroadcastScheduler:
+    """
+    Buffers room emits and sends them in frames every tick.
+    A room with a single pending event gets that event as-is; several events
+    go out as one event_frame {'events': [[event, payload], ...]} in enqueue
+    order, which clients unpack and dispatch to their normal handlers.
+    """
+    def __init__(self, emit, start_background_task, sleep, tick=None, max_pending=None):
+        self._emit = emit
+        self._start_background_task = start_background_task
+        self._sleep = sleep
+        self.tick = tick if tick is not None else float(os.getenv('BROADCAST_TICK_MS', 100)) / 1000
+        self.max_pending = max_pending or int(os.getenv('BROADCAST_MAX_PENDING', 1000))
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._started = False
+        self._sequence = 0
+        self.enqueued = 0
+        self.merged = 0
+        self.frames = 0
+        self.events_sent = 0
+        self.max_depth = 0
+
+    def start(self):
+        """Start the flush loop (idempotent)"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        self._start_background_task(self._run)
+
+    def emit(self, event, payload, room, key=None):
+        """
+        Queue an event for a room
+
+        Args:
+            event: Socket.IO event name
+            payload: Event data
+            room: Room to broadcast to
+            key: Optional merge key; a queued event with the same event name
+                and key is replaced by this one
+        """
+        if self.tick <= 0:
+            self._emit(event, payload, room=room)
+            return
+        self.start()
+
+        flush_now = False
+        with self._lock:
+            queue = self._pending.setdefault(room, OrderedDict())
+            if key is None:
+                self._sequence += 1
+                queue_key = (event, None, self._sequence)
+            else:
+                queue_key = (event, key)
+                if queue_key in queue:
+                    self.merged += 1
+                    # The newest update takes the older one's place at the back of the frame
+                    del queue[queue_key]
+            queue[queue_key] = (event, payload)
+            self.enqueued += 1
+            self.max_depth = max(self.max_depth, len(queue))
+            flush_now = len(queue) >= self.max_pending
+
+        if flush_now:
+            self.flush(room)
+
+    def flush(self, room=None):
+        """Send everything queued (for one room, or all rooms)"""
+        with self._lock:
+            if room is None:
+                pending, self._pending = self._pending, {}
+            else:
+                queue = self._pending.pop(room, None)
+                pending = {room: queue} if queue else {}
+
+        for target, queue in pending.items():
+            events = list(queue.values())
+            try:
+                if len(events) == 1:
+                    event, payload = events[0]
+                    self._emit(event, payload, room=target)
+                else:
+                    self._emit(FRAME_EVENT, {'events': [[event, payload] for event, payload in events]}, room=target)
+            except Exception as e:
+                print(f"Failed to broadcast frame to {target}: {e}")
+                continue
+            with self._lock:
+                self.frames += 1
+                self.events_sent += len(events)
+
+    def _run(self):
+        while True:
+            self._sleep(self.tick)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Broadcast flush failed: {e}")
+
+    def stats(self):
+        """Queue depth and coalescing counters"""
+        with self._lock:
+            depths = {room: len(queue) for room, queue in self._pending.items()}
+            return {
+                'tick_ms': round(self.tick * 1000, 1),
+                'rooms_pending': len(depths),
+                'queue_depth': sum(depths.values()),
+                'max_room_depth': max(depths.values()) if depths else 0,
+                'max_depth_seen': self.max_depth,
+                'enqueued': self.enqueued,
+                'merged': self.merged,
+                'frames': self.frames,
+                'events_sent': self.events_sent,
+                'avg_frame_size': round(self.events_sent / self.frames, 2) if self.frames else 0.0
+            }
@@ -0,0 +1,222 @@
+"""
+Connection pool configuration and metrics for the IdeaFlow database.
+Pool sizing is tuned per dialect and can be overridden with DB_POOL_* env vars;
+checkout wait time, saturation and connection churn are tracked for /api/metrics.
+"""
+
+import os
+import time
+import threading
+from collections import deque
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool, StaticPool
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+# Defaults per dialect. SQLite only allows one writer at a time, so a small pool
+# with no overflow plus a busy timeout queues writers instead of piling up
+# connections that fail with "database is locked"; WAL keeps reads concurrent.
+POOL_DEFAULTS = {
+    'postgresql': {
+        'pool_size': 10,
+        'max_overflow': 20,
+        'pool_timeout': 30,
+        'pool_recycle': 300,
+        'pool_pre_ping': True
+    },
+    'sqlite': {
+        'pool_size': 5,
+        'max_overflow': 0,
+        'pool_timeout': 30,
+        'pool_recycle': -1,
+        'pool_pre_ping': False,
+        'busy_timeout': 30,
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 268435456
+    }
+}
+
+
+def pool_settings(dialect):
+    """Pool settings for a dialect with DB_POOL_* environment overrides applied"""
+    settings = dict(POOL_DEFAULTS.get(dialect, POOL_DEFAULTS['postgresql']))
+    settings['pool_size'] = int(os.getenv('DB_POOL_SIZE', settings['pool_size']))
+    settings['max_overflow'] = int(os.getenv('DB_MAX_OVERFLOW', settings['max_overflow']))
+    settings['pool_timeout'] = float(os.getenv('DB_POOL_TIMEOUT', settings['pool_timeout']))
+    settings['pool_recycle'] = int(os.getenv('DB_POOL_RECYCLE', settings['pool_recycle']))
+    settings['pool_pre_ping'] = os.getenv('DB_POOL_PRE_PING', str(settings['pool_pre_ping'])).lower() == 'true'
+    if 'busy_timeout' in settings:
+        settings['busy_timeout'] = float(os.getenv('DB_SQLITE_BUSY_TIMEOUT', settings['busy_timeout']))
+        settings['journal_mode'] = os.getenv('DB_SQLITE_JOURNAL_MODE', settings['journal_mode']).upper()
+        settings['synchronous'] = os.getenv('DB_SQLITE_SYNCHRONOUS', settings['synchronous']).upper()
+        settings['mmap_size'] = int(os.getenv('DB_SQLITE_MMAP_SIZE', settings['mmap_size']))
+    return settings
+
+
+def configure_sqlite(engine, settings):
+    """
+    Apply production pragmas to every new SQLite connection
+    
+    WAL lets readers run alongside the single writer, synchronous=NORMAL is
+    durable in WAL mode with far fewer fsyncs, and busy_timeout makes writers
+    wait for the lock instead of failing. pysqlite's implicit transaction
+    handling is switched off so BEGIN and SAVEPOINT behave as issued.
+    """
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={settings['journal_mode']}")
+        cursor.execute(f"PRAGMA synchronous={settings['synchronous']}")
+        cursor.execute(f"PRAGMA mmap_size={settings['mmap_size']}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings['busy_timeout'] * 1000)}")
+        cursor.close()
+
+    @event.listens_for(engine, 'begin')
+    def begin_transaction(conn):
+        # sqlite_begin_immediate=True takes the write lock at BEGIN (used by migrations)
+        if conn.get_execution_options().get('sqlite_begin_immediate'):
+            conn.exec_driver_sql('BEGIN IMMEDIATE')
+        else:
+            conn.exec_driver_sql('BEGIN')
+
+
+class PoolMetrics:
+    """
+    Thread-safe counters for a connection pool.
+    Wait times cover the time spent inside the pool waiting for a connection,
+    including opening a new one.
+    """
+    def __init__(self, sample_size=1000):
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=sample_size)
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.closes = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record_wait(self, seconds, timed_out=False):
+        """Record how long one checkout waited"""
+        with self._lock:
+            self._waits.append(seconds)
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def increment(self, counter):
+        """Increment a named event counter"""
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def attach(self, engine):
+        """Listen to the engine's pool events"""
+        event.listen(engine, 'connect', lambda *args: self.increment('connects'))
+        event.listen(engine, 'close', lambda *args: self.increment('closes'))
+        event.listen(engine, 'checkout', lambda *args: self.increment('checkouts'))
+        event.listen(engine, 'checkin', lambda *args: self.increment('checkins'))
+        event.listen(engine, 'invalidate', lambda *args: self.increment('invalidations'))
+
+    def snapshot(self, pool=None):
+        """Current counters, wait percentiles and saturation of pool"""
+        with self._lock:
+            waits = sorted(self._waits)
+            stats = {
+                'checkouts': self.checkouts,
+                'checkins': self.checkins,
+                'connects': self.connects,
+                'closes': self.closes,
+                'invalidations': self.invalidations,
+                'timeouts': self.timeouts,
+                'wait_ms': {
+                    'avg': round(self.wait_total / len(waits) * 1000, 3) if waits else 0.0,
+                    'p95': round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 3) if waits else 0.0,
+                    'max': round(self.wait_max * 1000, 3)
+                }
+            }
+        # Connections opened per checkout; close to 0 means connections are reused
+        stats['churn_ratio'] = round(stats['connects'] / stats['checkouts'], 3) if stats['checkouts'] else 0.0
+
+        if isinstance(pool, QueuePool):
+            capacity = pool.size() + max(pool._max_overflow, 0)
+            checked_out = pool.checkedout()
+            stats.update({
+                'pool_size': pool.size(),
+                'max_overflow': pool._max_overflow,
+                'checked_out': checked_out,
+                'idle': pool.checkedin(),
+                'overflow': pool.overflow(),
+                'saturation': round(checked_out / capacity, 3) if capacity > 0 else 0.0
+            })
+        return stats
+
+
+class MeteredQueuePool(QueuePool):
+    """QueuePool that reports checkout wait time to a PoolMetrics instance"""
+    metrics = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            timed_out = True
+            raise
+        finally:
+            if self.metrics:
+                self.metrics.record_wait(time.perf_counter() - started, timed_out)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+def create_pooled_engine(database_url, metrics=None):
+    """
+    Create an engine with the dialect's pool settings
+
+    Args:
+        database_url: SQLAlchemy database URL
+        metrics: Optional PoolMetrics to attach to the pool
+
+    Returns:
+        Tuple of (engine, applied settings)
+    """
+    url = make_url(database_url)
+    dialect = url.get_backend_name()
+    settings = pool_settings(dialect)
+
+    if dialect == 'sqlite':
+        connect_args = {'check_same_thread': False, 'timeout': settings['busy_timeout']}
+        if url.database in (None, '', ':memory:'):
+            # An in-memory database only exists on one connection
+            engine = create_engine(database_url, poolclass=StaticPool, connect_args=connect_args)
+            if metrics:
+                metrics.attach(engine)
+            return engine, {'poolclass': 'StaticPool'}
+    else:
+        connect_args = {}
+
+    engine = create_engine(
+        database_url,
+        poolclass=MeteredQueuePool,
+        pool_size=settings['pool_size'],
+        max_overflow=settings['max_overflow'],
+        pool_timeout=settings['pool_timeout'],
+        pool_recycle=settings['pool_recycle'],
+        pool_pre_ping=settings['pool_pre_ping'],
+        connect_args=connect_args
+    )
+    if dialect == 'sqlite':
+        configure_sqlite(engine, settings)
+    if metrics:
+        engine.pool.metrics = metrics
+        metrics.attach(engine)
+    return engine, settings
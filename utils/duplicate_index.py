@@ -0,0 +1,225 @@
+"""
+Near-duplicate idea detection for the IdeaFlow application.
+Keeps a MinHash/LSH index per session in memory so new submissions can be
+checked against every existing idea without a pairwise scan.
+"""
+
+import os
+import re
+import time
+import zlib
+import threading
+from collections import OrderedDict
+import numpy as np
+
+# Mersenne prime used for the MinHash permutations
+_MINHASH_PRIME = (1 << 31) - 1
+
+
+def shingle(text):
+    """Word unigrams and bigrams of normalized text, hashed to 32-bit ints"""
+    words = re.findall(r'\w+', (text or '').lower())
+    shingles = set(words)
+    shingles.update(f"{first} {second}" for first, second in zip(words, words[1:]))
+    return {zlib.crc32(item.encode('utf-8')) for item in shingles}
+
+
+class SessionDuplicateIndex:
+    """
+    MinHash signatures banded into LSH buckets for one session's ideas.
+    Candidates from shared buckets are verified with exact Jaccard similarity.
+    """
+    def __init__(self, num_perm=64, bands=16, threshold=0.6, seed=42):
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, _MINHASH_PRIME, size=num_perm).astype(np.uint64)
+        self._b = rng.randint(0, _MINHASH_PRIME, size=num_perm).astype(np.uint64)
+        self._buckets = {}
+        self._shingles = {}
+        self._contents = {}
+
+    def signature(self, shingles):
+        """MinHash signature of a shingle set"""
+        if not shingles:
+            return None
+        values = np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+        hashed = (self._a[:, None] * values[None, :] + self._b[:, None]) % _MINHASH_PRIME
+        return hashed.min(axis=1)
+
+    def _band_keys(self, signature):
+        """LSH bucket keys, one per band"""
+        return [
+            (band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+            for band in range(self.bands)
+        ]
+
+    def add(self, idea_id, content):
+        """Index an idea"""
+        shingles = shingle(content)
+        signature = self.signature(shingles)
+        if signature is None:
+            return
+        self._shingles[idea_id] = shingles
+        self._contents[idea_id] = content
+        for key in self._band_keys(signature):
+            self._buckets.setdefault(key, set()).add(idea_id)
+
+    def query(self, content, threshold=None, exclude_id=None):
+        """Return indexed ideas similar to content, most similar first"""
+        threshold = self.threshold if threshold is None else threshold
+        shingles = shingle(content)
+        signature = self.signature(shingles)
+        if signature is None:
+            return []
+
+        candidates = set()
+        for key in self._band_keys(signature):
+            candidates.update(self._buckets.get(key, ()))
+        candidates.discard(exclude_id)
+
+        matches = []
+        for idea_id in candidates:
+            similarity = self.jaccard(shingles, self._shingles[idea_id])
+            if similarity >= threshold:
+                matches.append({
+                    'id': idea_id,
+                    'content': self._contents[idea_id],
+                    'similarity': round(similarity, 3)
+                })
+        matches.sort(key=lambda match: match['similarity'], reverse=True)
+        return matches
+
+    def groups(self, threshold=None):
+        """Group near-duplicate ideas by union-find over verified bucket pairs"""
+        threshold = self.threshold if threshold is None else threshold
+        parent = {}
+
+        def find(idea_id):
+            parent.setdefault(idea_id, idea_id)
+            while parent[idea_id] != idea_id:
+                parent[idea_id] = parent[parent[idea_id]]
+                idea_id = parent[idea_id]
+            return idea_id
+
+        checked = set()
+        for members in self._buckets.values():
+            if len(members) < 2:
+                continue
+            ordered = sorted(members)
+            for i, first in enumerate(ordered):
+                for second in ordered[i + 1:]:
+                    if (first, second) in checked:
+                        continue
+                    checked.add((first, second))
+                    if self.jaccard(self._shingles[first], self._shingles[second]) >= threshold:
+                        parent[find(first)] = find(second)
+
+        grouped = {}
+        for idea_id in parent:
+            grouped.setdefault(find(idea_id), []).append(idea_id)
+
+        return [
+            [{'id': idea_id, 'content': self._contents[idea_id]} for idea_id in members]
+            for members in grouped.values() if len(members) > 1
+        ]
+
+    @staticmethod
+    def jaccard(first, second):
+        """Exact Jaccard similarity of two shingle sets"""
+        union = len(first | second)
+        return len(first & second) / union if union else 0.0
+
+    def __len__(self):
+        return len(self._shingles)
+
+
+class DuplicateIndexManager:
+    """
+    Per-session near-duplicate indexes, built from the database on first use.
+    Indexes are kept for the DUPLICATE_INDEX_MAX_SESSIONS most recently used
+    sessions and dropped after DUPLICATE_INDEX_IDLE_SECONDS without use. Each
+    index has its own lock, and a cold session is loaded outside the shared
+    lock so it never holds up duplicate checks in other sessions.
+    """
+    def __init__(self, db_manager, threshold=None, max_sessions=None, idle_seconds=None):
+        self.db_manager = db_manager
+        self.threshold = threshold if threshold is not None else float(os.getenv('DUPLICATE_THRESHOLD', 0.6))
+        self.max_sessions = max_sessions or int(os.getenv('DUPLICATE_INDEX_MAX_SESSIONS', 200))
+        self.idle_seconds = idle_seconds if idle_seconds is not None else float(os.getenv('DUPLICATE_INDEX_IDLE_SECONDS', 3600))
+        # {session_id: (index, index lock, last used)} in least recently used order
+        self._indexes = OrderedDict()
+        self._build_locks = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def _cached(self, session_id):
+        """(index, lock) for a loaded session, evicting idle sessions on the way"""
+        now = time.monotonic()
+        while self._indexes:
+            oldest_id, (_, _, last_used) = next(iter(self._indexes.items()))
+            if now - last_used <= self.idle_seconds:
+                break
+            del self._indexes[oldest_id]
+        entry = self._indexes.get(session_id)
+        if entry is None:
+            return None
+        self._indexes[session_id] = (entry[0], entry[1], now)
+        self._indexes.move_to_end(session_id)
+        return entry[0], entry[1]
+
+    def get(self, session_id):
+        """Return (index, lock) for the session, rebuilding the index from stored ideas if needed"""
+        with self._lock:
+            cached = self._cached(session_id)
+            if cached:
+                return cached
+            build_lock = self._build_locks.setdefault(session_id, threading.Lock())
+
+        # One loader per session; other sessions keep using the shared lock meanwhile
+        with build_lock:
+            with self._lock:
+                cached = self._cached(session_id)
+                if cached:
+                    return cached
+                generation = self._generation
+
+            index = SessionDuplicateIndex(threshold=self.threshold)
+            for idea in self.db_manager.get_ideas(session_id, include_author=False, round_number=None):
+                index.add(idea['id'], idea['content'])
+            entry = (index, threading.Lock())
+
+            with self._lock:
+                self._build_locks.pop(session_id, None)
+                # An invalidation during the load may have removed ideas this index still holds
+                if generation == self._generation:
+                    self._indexes[session_id] = (entry[0], entry[1], time.monotonic())
+                    while len(self._indexes) > self.max_sessions:
+                        self._indexes.popitem(last=False)
+            return entry
+
+    def find_duplicates(self, session_id, content):
+        """Existing ideas in the session that are near-duplicates of content"""
+        index, lock = self.get(session_id)
+        with lock:
+            return index.query(content)
+
+    def add(self, session_id, idea_id, content):
+        """Index a newly stored idea"""
+        index, lock = self.get(session_id)
+        with lock:
+            index.add(idea_id, content)
+
+    def groups(self, session_id):
+        """All near-duplicate groups in the session"""
+        index, lock = self.get(session_id)
+        with lock:
+            return index.groups()
+
+    def invalidate(self, session_id):
+        """Drop the session's index so it is rebuilt on next use"""
+        with self._lock:
+            self._indexes.pop(session_id, None)
+            self._generation += 1
@@ -0,0 +1,212 @@
+"""
+Incremental theme assignment for the IdeaFlow application.
+Places newly submitted ideas into the nearest existing theme centroid in a
+background worker, so sessions get live grouping without re-running the full
+clustering on every submission.
+"""
+
+import os
+import queue
+import threading
+import numpy as np
+from scipy import sparse
+from sklearn.preprocessing import normalize
+
+
+class _SessionModel:
+    """Fitted vectorizer and theme centroids for one session"""
+    def __init__(self, vectorizer, theme_ids, centroid_sums, counts, base_count):
+        self.vectorizer = vectorizer
+        self.theme_ids = theme_ids
+        self.centroid_sums = centroid_sums
+        self.counts = counts
+        self.base_count = base_count
+        self.assigned_count = 0
+        self.unassigned_ids = set()
+
+    def drift(self):
+        """Share of ideas that could not be placed into an existing theme"""
+        total = self.base_count + self.assigned_count + len(self.unassigned_ids)
+        return len(self.unassigned_ids) / total if total else 0.0
+
+
+class IncrementalThemeAssigner:
+    """
+    Background worker that assigns new ideas to the closest existing theme.
+    Ideas below the similarity threshold stay unassigned; once the unassigned
+    share passes the drift threshold a full re-cluster is requested.
+    """
+    def __init__(self, db_manager, processor_provider, on_delta=None, on_recluster=None,
+                 similarity_threshold=None, drift_threshold=None, min_new_ideas=None):
+        self.db_manager = db_manager
+        self.processor_provider = processor_provider
+        self.on_delta = on_delta
+        self.on_recluster = on_recluster
+        self.similarity_threshold = similarity_threshold if similarity_threshold is not None else float(os.getenv('AI_INCREMENTAL_THRESHOLD', 0.2))
+        self.drift_threshold = drift_threshold if drift_threshold is not None else float(os.getenv('AI_RECLUSTER_DRIFT', 0.3))
+        self.min_new_ideas = min_new_ideas if min_new_ideas is not None else int(os.getenv('AI_RECLUSTER_MIN_IDEAS', 5))
+        self._queue = queue.Queue()
+        self._models = {}
+        # Sessions whose full re-cluster is being stored; no model is built or written meanwhile
+        self._rebuilding = set()
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def start(self):
+        """Start the background worker thread (idempotent)"""
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name='incremental-themes', daemon=True)
+                self._worker.start()
+
+    def submit(self, session_id, idea):
+        """Queue a stored idea ({'id', 'content'}) for theme assignment"""
+        self.start()
+        self._queue.put((session_id, idea))
+
+    def invalidate(self, session_id):
+        """Forget the session's centroids, e.g. after a full theme generation"""
+        with self._lock:
+            self._models.pop(session_id, None)
+
+    def begin_rebuild(self, session_id):
+        """
+        Stop incremental writes while a full re-cluster stores its themes
+
+        An assignment already computed against the old centroids is dropped
+        instead of overwriting the new theme_ids; call end_rebuild() after
+        the re-cluster commits (or fails).
+        """
+        with self._lock:
+            self._rebuilding.add(session_id)
+            self._models.pop(session_id, None)
+
+    def end_rebuild(self, session_id):
+        """Resume incremental assignment from the newly stored themes"""
+        with self._lock:
+            self._rebuilding.discard(session_id)
+            self._models.pop(session_id, None)
+
+    def _is_current(self, session_id, model):
+        """Whether model is still the session's live model (call with the lock held)"""
+        return session_id not in self._rebuilding and self._models.get(session_id) is model
+
+    def _run(self):
+        """Worker loop: drain queued ideas and assign them per session"""
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            ideas_by_session = {}
+            for session_id, idea in batch:
+                ideas_by_session.setdefault(session_id, []).append(idea)
+
+            for session_id, ideas in ideas_by_session.items():
+                try:
+                    self._assign(session_id, ideas)
+                except Exception as e:
+                    print(f"[Themes] Incremental assignment failed for session {session_id}: {e}")
+
+    def _get_model(self, session_id):
+        """Return the session's model, building it from the stored theme assignments if needed"""
+        with self._lock:
+            if session_id in self._rebuilding:
+                return None
+            model = self._models.get(session_id)
+        if model is not None:
+            return model
+
+        ideas = self.db_manager.get_ideas(session_id, include_author=False, round_number=None)
+        themed = [idea for idea in ideas if idea.get('theme_id')]
+        if not themed:
+            return None
+
+        processor = self.processor_provider()
+        processed = processor.analyze_texts([idea['content'] for idea in themed])
+        vectorizer = processor.build_vectorizer()
+        try:
+            matrix = vectorizer.fit_transform([text for text, _ in processed])
+        except ValueError:
+            # Empty vocabulary - nothing to compare new ideas against
+            return None
+
+        theme_ids = sorted({idea['theme_id'] for idea in themed})
+        index = {theme_id: i for i, theme_id in enumerate(theme_ids)}
+        labels = np.array([index[idea['theme_id']] for idea in themed])
+        membership = sparse.csr_matrix(
+            (np.ones(len(labels)), (labels, np.arange(len(labels)))),
+            shape=(len(theme_ids), len(labels))
+        )
+        centroid_sums = np.asarray((membership @ matrix).todense())
+        counts = np.bincount(labels, minlength=len(theme_ids)).astype(float)
+
+        model = _SessionModel(vectorizer, theme_ids, centroid_sums, counts, len(themed))
+        with self._lock:
+            if session_id in self._rebuilding:
+                # Built from assignments the re-cluster is replacing
+                return None
+            self._models[session_id] = model
+        return model
+
+    def _assign(self, session_id, ideas):
+        """Assign a batch of new ideas for one session and report the delta"""
+        model = self._get_model(session_id)
+        if model is None:
+            return
+
+        processor = self.processor_provider()
+        processed = processor.analyze_texts([idea['content'] for idea in ideas])
+        vectors = model.vectorizer.transform([text for text, _ in processed])
+
+        # Normalized once per batch; an assignment only refreshes its own theme's row
+        centroids = normalize(model.centroid_sums / model.counts[:, None])
+        vectors = vectors.toarray()
+
+        assigned = []
+        unassigned = []
+        for i, idea in enumerate(ideas):
+            vector = vectors[i]
+            similarities = centroids @ vector
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+
+            if similarity >= self.similarity_threshold:
+                theme_id = model.theme_ids[best]
+                # Checked and written under the lock so a re-cluster can't land in between
+                with self._lock:
+                    if not self._is_current(session_id, model):
+                        print(f"[Themes] Session {session_id} was re-clustered, dropping stale assignments")
+                        return
+                    self.db_manager.update_idea_theme(idea['id'], theme_id)
+                # Running mean keeps the centroid current without refitting
+                model.centroid_sums[best] += vector
+                model.counts[best] += 1
+                centroids[best] = normalize((model.centroid_sums[best] / model.counts[best])[None, :])[0]
+                model.assigned_count += 1
+                assigned.append({
+                    'idea_id': idea['id'],
+                    'theme_id': theme_id,
+                    'content': idea['content'],
+                    'similarity': round(similarity, 3)
+                })
+            else:
+                model.unassigned_ids.add(idea['id'])
+                unassigned.append(idea['id'])
+
+        drift = model.drift()
+        if self.on_delta:
+            self.on_delta(session_id, {
+                'assigned': assigned,
+                'unassigned': unassigned,
+                'drift': round(drift, 3)
+            })
+
+        new_ideas = model.assigned_count + len(model.unassigned_ids)
+        if drift > self.drift_threshold and new_ideas >= self.min_new_ideas and self.on_recluster:
+            print(f"[Themes] Drift {drift:.2f} in session {session_id}, running full re-cluster")
+            self.invalidate(session_id)
+            self.on_recluster(session_id)
@@ -0,0 +1,174 @@
+"""
+Background job manager for the IdeaFlow application.
+Runs heavy session work (theme clustering, flowchart building) off the request
+thread, records job state in the database and coalesces duplicate requests.
+"""
+
+import os
+import json
+import time
+import uuid
+import socket
+import threading
+import multiprocessing
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from utils.async_runtime import run_blocking
+
+# Job lifecycle states
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_COMPLETED = 'completed'
+JOB_FAILED = 'failed'
+
+
+class JobManager:
+    """
+    Runs registered job handlers on a thread pool and tracks them in the jobs table.
+    Handlers receive (session_id, job_manager) and return a JSON-serialisable result;
+    CPU-bound parts can be pushed to worker processes with run_cpu().
+
+    Each job row carries this process's owner_id and a heartbeat refreshed while
+    it is active, so other workers only fail jobs whose owner has gone away.
+    Duplicate requests are coalesced per process: with several workers, two
+    requests landing on different workers can each start a job.
+    """
+    def __init__(self, db_manager, max_workers=None, process_workers=None, process_initializer=None, on_complete=None):
+        self.db_manager = db_manager
+        self.on_complete = on_complete
+        self.max_workers = max_workers or int(os.getenv('JOB_MAX_WORKERS', 2))
+        self.process_workers = process_workers if process_workers is not None else int(os.getenv('JOB_PROCESS_WORKERS', 0))
+        self.process_initializer = process_initializer
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='ideaflow-job')
+        self._process_pool = None
+        self._handlers = {}
+        self._active = {}
+        self._lock = threading.Lock()
+        self.owner_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.heartbeat_interval = float(os.getenv('JOB_HEARTBEAT_SECONDS', 30))
+        self.stale_after = float(os.getenv('JOB_STALE_SECONDS', self.heartbeat_interval * 3))
+        self._heartbeat_thread = None
+
+    def start(self):
+        """
+        Serving-process startup work
+
+        Not done in __init__: spawned process-pool workers re-import the
+        server module and must not touch jobs the parent is still running.
+        """
+        with self._lock:
+            if self._heartbeat_thread:
+                return
+            self._heartbeat_thread = threading.Thread(target=self._heartbeat, name='ideaflow-job-heartbeat', daemon=True)
+        self._fail_abandoned()
+        self._heartbeat_thread.start()
+
+    def _fail_abandoned(self):
+        """Fail jobs whose owning process stopped heartbeating; they will never finish"""
+        failed = self.db_manager.fail_interrupted_jobs(datetime.now() - timedelta(seconds=self.stale_after))
+        if failed:
+            print(f"[Jobs] Marked {failed} abandoned jobs as failed")
+
+    def _heartbeat(self):
+        while True:
+            time.sleep(self.heartbeat_interval)
+            try:
+                self.db_manager.touch_jobs(self.owner_id)
+                self._fail_abandoned()
+            except Exception as e:
+                print(f"[Jobs] Heartbeat failed: {e}")
+
+    def register(self, kind, handler):
+        """Register the handler that runs jobs of the given kind"""
+        self._handlers[kind] = handler
+
+    def submit(self, kind, session_id):
+        """
+        Queue a job, reusing the active job for the same kind and session
+
+        Returns:
+            Tuple of (job dict, created flag)
+        """
+        if kind not in self._handlers:
+            raise ValueError(f'Unknown job kind: {kind}')
+
+        with self._lock:
+            active_id = self._active.get((kind, session_id))
+            if active_id:
+                job = self.db_manager.get_job(active_id)
+                if job:
+                    return job, False
+
+            job = {
+                'id': str(uuid.uuid4()),
+                'kind': kind,
+                'session_id': session_id,
+                'status': JOB_QUEUED,
+                'created_at': datetime.now(),
+                'owner_id': self.owner_id,
+                'heartbeat_at': datetime.now()
+            }
+            if not self.db_manager.create_job(job):
+                raise RuntimeError('Failed to create job')
+            self._active[(kind, session_id)] = job['id']
+
+        self._executor.submit(self._run, job['id'], kind, session_id)
+        return self.db_manager.get_job(job['id']) or job, True
+
+    def get(self, job_id):
+        """Get job status and result"""
+        return self.db_manager.get_job(job_id)
+
+    def run_cpu(self, fn, *args):
+        """Run a picklable CPU-bound function in the process pool, or inline if none is configured"""
+        if self.process_workers <= 0:
+            # Under eventlet/gevent a green thread would stall the hub; use a native thread
+            return run_blocking(fn, *args)
+        with self._lock:
+            if self._process_pool is None:
+                context = multiprocessing.get_context(os.getenv('JOB_PROCESS_START_METHOD', 'spawn'))
+                self._process_pool = ProcessPoolExecutor(
+                    max_workers=self.process_workers,
+                    mp_context=context,
+                    initializer=self.process_initializer
+                )
+        return self._process_pool.submit(fn, *args).result()
+
+    def _run(self, job_id, kind, session_id):
+        """Execute a job and record its outcome"""
+        self.db_manager.update_job(job_id, JOB_RUNNING, started_at=datetime.now())
+        status = JOB_COMPLETED
+        result = None
+        error = None
+        try:
+            result = self._handlers[kind](session_id, self)
+        except Exception as e:
+            print(f"[Jobs] {kind} job {job_id} for session {session_id} failed: {e}")
+            status = JOB_FAILED
+            error = str(e)
+        finally:
+            with self._lock:
+                if self._active.get((kind, session_id)) == job_id:
+                    del self._active[(kind, session_id)]
+
+        self.db_manager.update_job(job_id, status, result=json.dumps(result, default=str) if result is not None else None,
+                                   error=error, finished_at=datetime.now())
+        if self.on_complete:
+            self.on_complete({
+                'job_id': job_id,
+                'kind': kind,
+                'session_id': session_id,
+                'status': status,
+                'result': result,
+                'error': error
+            })
+
+    def stats(self):
+        """Active job counts for monitoring"""
+        with self._lock:
+            return {
+                'owner_id': self.owner_id,
+                'active_jobs': len(self._active),
+                'max_workers': self.max_workers,
+                'process_workers': self.process_workers
+            }
@@ -0,0 +1,370 @@
+"""
+Versioned schema migrations for the IdeaFlow database.
+Applied versions are recorded in schema_migrations, so startup only runs the
+migrations a database hasn't seen and does nothing once the schema is current.
+"""
+
+from datetime import datetime
+from contextlib import contextmanager
+from sqlalchemy import text
+
+# pg_advisory_xact_lock key shared by every IdeaFlow process migrating the same database
+MIGRATION_LOCK_KEY = 482617301
+
+
+class Migration:
+    """
+    A numbered schema change.
+    Statements are SQL strings or (sql, dialects) tuples limited to the named
+    dialects. Tolerant migrations run each statement in a savepoint and ignore
+    failures, for legacy changes that may already be present in older databases.
+    """
+    def __init__(self, version, description, statements, tolerant=False):
+        self.version = version
+        self.description = description
+        self.statements = statements
+        self.tolerant = tolerant
+
+    def statements_for(self, dialect):
+        """SQL statements that apply to the given dialect name"""
+        selected = []
+        for statement in self.statements:
+            if isinstance(statement, tuple):
+                sql, dialects = statement
+                if dialect not in dialects:
+                    continue
+                selected.append(sql)
+            else:
+                selected.append(statement)
+        return selected
+
+
+MIGRATIONS = [
+    Migration(1, 'initial schema', [
+        # Users table for authentication with subscription management
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id VARCHAR(36) PRIMARY KEY,
+            username VARCHAR(100) UNIQUE NOT NULL,
+            password_hash VARCHAR(64) NOT NULL,
+            display_name VARCHAR(100) NOT NULL,
+            role VARCHAR(20) DEFAULT 'participant',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            subscription_tier VARCHAR(20) DEFAULT 'free',
+            subscription_status VARCHAR(20) DEFAULT 'active',
+            max_sessions_per_month INTEGER DEFAULT 1,
+            max_participants_per_session INTEGER DEFAULT 5,
+            sessions_used_this_month INTEGER DEFAULT 0,
+            stripe_customer_id VARCHAR(100),
+            stripe_subscription_id VARCHAR(100),
+            stripe_price_id VARCHAR(100),
+            cancel_at_period_end BOOLEAN DEFAULT FALSE
+        )
+        """,
+        # Sessions table
+        """
+        CREATE TABLE IF NOT EXISTS sessions (
+            id VARCHAR(36) PRIMARY KEY,
+            name VARCHAR(200) NOT NULL,
+            question TEXT NOT NULL,
+            facilitator_id VARCHAR(36) NOT NULL,
+            facilitator_name VARCHAR(100) NOT NULL,
+            current_phase INTEGER DEFAULT 0,
+            idea_phase_time INTEGER DEFAULT 600,
+            review_phase_time INTEGER DEFAULT 300,
+            voting_phase_time INTEGER DEFAULT 300,
+            analysis_phase_time INTEGER DEFAULT 300,
+            action_phase_time INTEGER DEFAULT 600,
+            votes_per_participant INTEGER DEFAULT 5,
+            max_votes_per_idea INTEGER DEFAULT 3,
+            max_participants INTEGER DEFAULT 10,
+            status VARCHAR(20) DEFAULT 'active',
+            round_number INTEGER DEFAULT 1,
+            iterative_prompt TEXT,
+            join_enabled BOOLEAN DEFAULT TRUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (facilitator_id) REFERENCES users(id)
+        )
+        """,
+        # Participants table
+        """
+        CREATE TABLE IF NOT EXISTS participants (
+            id VARCHAR(36) PRIMARY KEY,
+            session_id VARCHAR(36) NOT NULL,
+            user_id VARCHAR(36) NOT NULL,
+            name VARCHAR(100) NOT NULL,
+            is_facilitator BOOLEAN DEFAULT FALSE,
+            joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (session_id) REFERENCES sessions(id),
+            FOREIGN KEY (user_id) REFERENCES users(id),
+            UNIQUE(session_id, user_id)
+        )
+        """,
+        # Ideas table with author attribution (no foreign key on author_id to allow participant submissions)
+        """
+        CREATE TABLE IF NOT EXISTS ideas (
+            id VARCHAR(36) PRIMARY KEY,
+            session_id VARCHAR(36) NOT NULL,
+            content TEXT NOT NULL,
+            author_id VARCHAR(36) NOT NULL,
+            author_name VARCHAR(100) NOT NULL,
+            theme_id VARCHAR(36),
+            round_number INTEGER DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (session_id) REFERENCES sessions(id)
+        )
+        """,
+        # Themes table for AI clustering
+        """
+        CREATE TABLE IF NOT EXISTS themes (
+            id VARCHAR(36) PRIMARY KEY,
+            session_id VARCHAR(36) NOT NULL,
+            name VARCHAR(255) NOT NULL,
+            description TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (session_id) REFERENCES sessions(id)
+        )
+        """,
+        # Votes table (no foreign key on voter_id to allow participant voting)
+        """
+        CREATE TABLE IF NOT EXISTS votes (
+            id VARCHAR(36) PRIMARY KEY,
+            session_id VARCHAR(36) NOT NULL,
+            idea_id VARCHAR(36) NOT NULL,
+            voter_id VARCHAR(36) NOT NULL,
+            points INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (session_id) REFERENCES sessions(id),
+            FOREIGN KEY (idea_id) REFERENCES ideas(id),
+            UNIQUE(idea_id, voter_id)
+        )
+        """,
+        # Action items table
+        """
+        CREATE TABLE IF NOT EXISTS action_items (
+            id VARCHAR(36) PRIMARY KEY,
+            session_id VARCHAR(36) NOT NULL,
+            theme_id VARCHAR(36),
+            description TEXT NOT NULL,
+            assignee VARCHAR(100),
+            due_date DATE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (session_id) REFERENCES sessions(id),
+            FOREIGN KEY (theme_id) REFERENCES themes(id)
+        )
+        """,
+        # Session timers table for persistent timer state
+        """
+        CREATE TABLE IF NOT EXISTS session_timers (
+            session_id VARCHAR(36) PRIMARY KEY,
+            duration INTEGER NOT NULL,
+            remaining INTEGER NOT NULL,
+            is_running BOOLEAN DEFAULT FALSE,
+            started_at TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (session_id) REFERENCES sessions(id) ON DELETE CASCADE
+        )
+        """,
+        # User subscriptions table - Enhanced for Stripe integration
+        """
+        CREATE TABLE IF NOT EXISTS user_subscriptions (
+            id VARCHAR(36) PRIMARY KEY,
+            user_id VARCHAR(36) NOT NULL,
+            tier VARCHAR(20) DEFAULT 'basic',
+            status VARCHAR(20) DEFAULT 'active',
+            sessions_used_this_month INTEGER DEFAULT 0,
+            max_sessions_per_month INTEGER DEFAULT 4,
+            max_participants_per_session INTEGER DEFAULT 10,
+            current_period_start TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            current_period_end TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            stripe_customer_id VARCHAR(100),
+            stripe_subscription_id VARCHAR(100),
+            stripe_price_id VARCHAR(100),
+            cancel_at_period_end BOOLEAN DEFAULT FALSE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id),
+            UNIQUE(user_id)
+        )
+        """,
+        # Preprocessed idea text keyed by content hash (AI theme generation cache)
+        """
+        CREATE TABLE IF NOT EXISTS idea_preprocessing_cache (
+            content_hash VARCHAR(64) PRIMARY KEY,
+            processed_text TEXT NOT NULL,
+            keywords TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        # Background jobs (theme generation, flowcharts)
+        """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id VARCHAR(36) PRIMARY KEY,
+            kind VARCHAR(50) NOT NULL,
+            session_id VARCHAR(36),
+            status VARCHAR(20) NOT NULL,
+            result TEXT,
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+        """
+    ]),
+
+    # Databases created before the tables above gained these columns; each
+    # change may already be present, so failures are ignored
+    Migration(2, 'legacy columns and constraints', [
+        ("ALTER TABLE ideas DROP CONSTRAINT IF EXISTS ideas_author_id_fkey", ('postgresql',)),
+        ("ALTER TABLE votes DROP CONSTRAINT IF EXISTS votes_voter_id_fkey", ('postgresql',)),
+        "ALTER TABLE users ADD COLUMN role VARCHAR(20) DEFAULT 'participant'",
+        "ALTER TABLE sessions ADD COLUMN max_participants INTEGER DEFAULT 10",
+        "ALTER TABLE sessions ADD COLUMN status VARCHAR(20) DEFAULT 'active'",
+        "ALTER TABLE sessions ADD COLUMN round_number INTEGER DEFAULT 1",
+        "ALTER TABLE sessions ADD COLUMN iterative_prompt TEXT",
+        "ALTER TABLE sessions ADD COLUMN join_enabled BOOLEAN DEFAULT TRUE",
+        "ALTER TABLE ideas ADD COLUMN round_number INTEGER DEFAULT 1",
+        "ALTER TABLE user_subscriptions ADD COLUMN status VARCHAR(20) DEFAULT 'active'",
+        "ALTER TABLE user_subscriptions ADD COLUMN sessions_used_this_month INTEGER DEFAULT 0",
+        "ALTER TABLE user_subscriptions ADD COLUMN max_sessions_per_month INTEGER DEFAULT 4",
+        "ALTER TABLE user_subscriptions ADD COLUMN max_participants_per_session INTEGER DEFAULT 10",
+        "ALTER TABLE user_subscriptions ADD COLUMN stripe_price_id VARCHAR(100)",
+        "ALTER TABLE user_subscriptions ADD COLUMN cancel_at_period_end BOOLEAN DEFAULT FALSE"
+    ], tolerant=True),
+
+    # Secondary indexes for the hot per-session queries. votes(idea_id) and
+    # participants(session_id) are already covered by their UNIQUE constraints.
+    Migration(3, 'query indexes', [
+        "CREATE INDEX IF NOT EXISTS idx_ideas_session_round ON ideas (session_id, round_number)",
+        "CREATE INDEX IF NOT EXISTS idx_ideas_session_author ON ideas (session_id, author_id)",
+        "CREATE INDEX IF NOT EXISTS idx_ideas_theme ON ideas (theme_id)",
+        "CREATE INDEX IF NOT EXISTS idx_votes_session_voter ON votes (session_id, voter_id)",
+        "CREATE INDEX IF NOT EXISTS idx_themes_session ON themes (session_id)",
+        "CREATE INDEX IF NOT EXISTS idx_sessions_facilitator_created ON sessions (facilitator_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_participants_user ON participants (user_id)",
+        "CREATE INDEX IF NOT EXISTS idx_action_items_session ON action_items (session_id)",
+        "CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status)"
+    ]),
+
+    # Vote tallies maintained on write so reads don't re-aggregate the votes table
+    Migration(4, 'materialized vote tallies', [
+        "ALTER TABLE ideas ADD COLUMN vote_total INTEGER DEFAULT 0",
+        """
+        UPDATE ideas SET vote_total = COALESCE(
+            (SELECT SUM(v.points) FROM votes v WHERE v.idea_id = ideas.id), 0
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS voter_totals (
+            session_id VARCHAR(36) NOT NULL,
+            voter_id VARCHAR(36) NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (session_id, voter_id)
+        )
+        """,
+        """
+        INSERT INTO voter_totals (session_id, voter_id, total)
+        SELECT session_id, voter_id, SUM(points) FROM votes GROUP BY session_id, voter_id
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_ideas_session_votes ON ideas (session_id, vote_total)"
+    ]),
+
+    # Timers can move the session to the next phase when they expire
+    Migration(5, 'timer auto-advance', [
+        "ALTER TABLE session_timers ADD COLUMN auto_advance BOOLEAN DEFAULT FALSE"
+    ]),
+
+    # Jobs record the server process running them, which refreshes heartbeat_at
+    # while they are active; only jobs whose owner stopped heartbeating are failed
+    Migration(6, 'job ownership', [
+        "ALTER TABLE jobs ADD COLUMN owner_id VARCHAR(64)",
+        "ALTER TABLE jobs ADD COLUMN heartbeat_at TIMESTAMP",
+        "CREATE INDEX IF NOT EXISTS idx_jobs_owner ON jobs (owner_id)"
+    ])
+]
+
+
+def get_applied_versions(conn):
+    """Versions recorded in schema_migrations"""
+    result = conn.execute(text("SELECT version FROM schema_migrations"))
+    return {row[0] for row in result.fetchall()}
+
+
+@contextmanager
+def migration_lock(engine):
+    """
+    Transaction holding the database-wide migration lock
+
+    PostgreSQL takes a transaction-scoped advisory lock; SQLite opens the
+    transaction with BEGIN IMMEDIATE, which takes the write lock up front.
+    Workers booting together wait here instead of applying the same version.
+    """
+    with engine.connect() as conn:
+        if engine.dialect.name == 'sqlite':
+            conn = conn.execution_options(sqlite_begin_immediate=True)
+        with conn.begin():
+            if engine.dialect.name == 'postgresql':
+                conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {'key': MIGRATION_LOCK_KEY})
+            yield conn
+
+
+def run_migrations(engine, migrations=None):
+    """
+    Apply pending migrations in version order, each in its own transaction
+
+    Each migration runs under migration_lock() and re-checks schema_migrations
+    first, so a version applied by another worker in the meantime is skipped.
+
+    Args:
+        engine: SQLAlchemy engine
+        migrations: Migrations to apply (defaults to MIGRATIONS)
+
+    Returns:
+        List of versions applied by this call
+    """
+    migrations = sorted(migrations or MIGRATIONS, key=lambda migration: migration.version)
+    dialect = engine.dialect.name
+
+    with migration_lock(engine) as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                description VARCHAR(200),
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """))
+        applied = get_applied_versions(conn)
+
+    pending = [migration for migration in migrations if migration.version not in applied]
+    if not pending:
+        return []
+
+    applied_now = []
+    for migration in pending:
+        with migration_lock(engine) as conn:
+            if migration.version in get_applied_versions(conn):
+                # Another worker applied it while this one waited for the lock
+                continue
+            for sql in migration.statements_for(dialect):
+                if migration.tolerant:
+                    # A savepoint keeps one failed statement from aborting the
+                    # whole transaction (PostgreSQL rejects later statements otherwise)
+                    savepoint = conn.begin_nested()
+                    try:
+                        conn.execute(text(sql))
+                        savepoint.commit()
+                    except Exception:
+                        savepoint.rollback()
+                else:
+                    conn.execute(text(sql))
+            conn.execute(text("""
+                INSERT INTO schema_migrations (version, description, applied_at)
+                VALUES (:version, :description, :applied_at)
+            """), {
+                'version': migration.version,
+                'description': migration.description,
+                'applied_at': datetime.now()
+            })
+        print(f"Applied migration {migration.version}: {migration.description}")
+        applied_now.append(migration.version)
+    return applied_now
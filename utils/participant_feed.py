@@ -0,0 +1,118 @@
+"""
+Versioned participant updates for session rooms.
+Joins, leaves and stat changes go out as small deltas stamped with a
+per-session sequence number. Clients apply them to their local list and ask
+for a full snapshot only on first load or when they see a gap in the sequence.
+"""
+
+import os
+import threading
+
+
+class MemorySequenceStore:
+    """Per-process sequence counters"""
+    def __init__(self):
+        self._sequences = {}
+        self._lock = threading.Lock()
+
+    def next(self, session_id):
+        with self._lock:
+            self._sequences[session_id] = self._sequences.get(session_id, 0) + 1
+            return self._sequences[session_id]
+
+    def current(self, session_id):
+        with self._lock:
+            return self._sequences.get(session_id, 0)
+
+    def reset(self, session_id):
+        with self._lock:
+            self._sequences.pop(session_id, None)
+
+
+class RedisSequenceStore:
+    """Sequence counters shared by every worker through Redis INCR"""
+    def __init__(self, url, prefix='ideaflow:participants:seq:'):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def next(self, session_id):
+        return self.client.incr(self.prefix + session_id)
+
+    def current(self, session_id):
+        value = self.client.get(self.prefix + session_id)
+        return int(value) if value is not None else 0
+
+    def reset(self, session_id):
+        self.client.delete(self.prefix + session_id)
+
+
+def build_sequence_store():
+    """Redis counters when PARTICIPANT_SEQUENCE_BACKEND=redis (needed with several workers)"""
+    if os.getenv('PARTICIPANT_SEQUENCE_BACKEND', 'memory').lower() == 'redis':
+        try:
+            store = RedisSequenceStore(os.getenv('REDIS_URL', 'redis://localhost:6379'))
+            store.client.ping()
+            return store
+        except Exception as e:
+            print(f"Redis participant sequences unavailable, using per-worker counters: {e}")
+    return MemorySequenceStore()
+
+
+class ParticipantFeed:
+    """
+    Emits participant_joined, participant_left and participant_updated deltas.
+    Every delta is idempotent (joins upsert, leaves remove, stats are absolute
+    values), so replaying one a snapshot already reflects is harmless.
+    """
+    def __init__(self, emit, sequences=None):
+        self.emit = emit
+        self.sequences = sequences or build_sequence_store()
+        self._lock = threading.Lock()
+        self.deltas = 0
+        self.snapshots = 0
+
+    def _publish(self, event, session_id, payload):
+        # Emit under the lock so this worker's deltas leave in sequence order
+        with self._lock:
+            seq = self.sequences.next(session_id)
+            self.emit(event, {**payload, 'session_id': session_id, 'seq': seq}, room=f'session_{session_id}')
+            self.deltas += 1
+        return seq
+
+    def joined(self, session_id, participant):
+        """Announce a participant who joined (or rejoined) the session"""
+        return self._publish('participant_joined', session_id, participant)
+
+    def left(self, session_id, user_id):
+        """Announce a participant who left or disconnected"""
+        return self._publish('participant_left', session_id, {'id': user_id, 'user_id': user_id, 'action': 'left'})
+
+    def updated(self, session_id, user_id, **stats):
+        """Announce new absolute stats (ideas, votes_cast) for one participant"""
+        return self._publish('participant_updated', session_id, {'user_id': user_id, 'stats': stats})
+
+    def updated_all(self, session_id, **stats):
+        """Announce stats that now apply to every participant (e.g. votes cleared)"""
+        return self._publish('participant_updated', session_id, {'user_id': None, 'all': True, 'stats': stats})
+
+    def snapshot(self, session_id, loader):
+        """
+        Full participant list with the sequence number it is current as of
+
+        The sequence is read before the list, so any delta the list already
+        includes is at most re-applied, never missed.
+        """
+        seq = self.sequences.current(session_id)
+        participants = loader(session_id)
+        with self._lock:
+            self.snapshots += 1
+        return {'session_id': session_id, 'seq': seq, 'participants': participants}
+
+    def reset(self, session_id):
+        """Forget a deleted session's sequence"""
+        self.sequences.reset(session_id)
+
+    def stats(self):
+        with self._lock:
+            return {'deltas': self.deltas, 'snapshots': self.snapshots}
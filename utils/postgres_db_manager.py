@@ -3,11 +3,51 @@ PostgreSQL Database manager for the ideation platform with user authentication.
 """
 
 import os
+import json
 import uuid
+import threading
 from datetime import datetime
-from sqlalchemy import create_engine, text
+from collections import OrderedDict
+from sqlalchemy import text
 from sqlalchemy.orm import sessionmaker
+from utils.migrations import run_migrations
+from utils.db_pool import PoolMetrics, create_pooled_engine
+from utils.sqlite_writer import SQLiteWriter
+from utils.session_cache import SessionCache, build_cache_backend
+from utils.async_runtime import needs_offload, offload_dbapi
 import hashlib
+from contextlib import contextmanager
+
+
+class VoteRejected(Exception):
+    """Raised inside a vote transaction to roll it back; carries the outcome to report"""
+    def __init__(self, outcome):
+        super().__init__(outcome.get('status'))
+        self.outcome = outcome
+
+
+class RequestConnection:
+    """
+    Connection shared by every manager call made while handling one request.
+    Methods still commit where they always did; the connection itself is only
+    released (committing any trailing read transaction) when the request ends.
+    """
+    def __init__(self, conn):
+        self._conn = conn
+    
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+    
+    def finish(self, error=None):
+        """Commit or roll back the open transaction and return the connection to the pool"""
+        try:
+            if self._conn.in_transaction():
+                if error is None:
+                    self._conn.commit()
+                else:
+                    self._conn.rollback()
+        finally:
+            self._conn.close()
 
 class PostgresDBManager:
     """
@@ -29,16 +69,38 @@ class PostgresDBManager:
             database_url = f'sqlite:///{db_path}'
         print(f"Using SQLite database: {database_url}")
         self.database_url = database_url
+        self.pool_metrics = PoolMetrics()
+        self.pool_settings = {}
+        # Returns per-request storage (e.g. Flask g) or None outside a request
+        self.request_scope = None
+        # Per-session author display names for facilitator idea lists
+        self.author_name_cache_enabled = os.getenv('AUTHOR_NAME_CACHE', 'true').lower() == 'true'
+        self.author_name_cache_sessions = int(os.getenv('AUTHOR_NAME_CACHE_SESSIONS', 1000))
+        self._author_names = OrderedDict()
+        self._author_names_lock = threading.Lock()
+        # Session rows are read on nearly every request; writes below invalidate them
+        self.session_cache = SessionCache(build_cache_backend())
         
         try:
-            self.engine = create_engine(self.database_url, pool_pre_ping=True, pool_recycle=300)
+            # Pool sizing is tuned per dialect (DB_POOL_* env vars override it)
+            self.engine, self.pool_settings = create_pooled_engine(self.database_url, self.pool_metrics)
+            if needs_offload(self.engine.dialect.name):
+                # sqlite3 blocks in C; keep it off the eventlet/gevent hub
+                offload_dbapi(self.engine)
             self.Session = sessionmaker(bind=self.engine)
             self.initialize_db()
+            
+            # File-backed SQLite funnels hot writes through one group-committing writer thread
+            self.writer = None
+            if (self.engine.dialect.name == 'sqlite' and self.pool_settings.get('poolclass') != 'StaticPool'
+                    and os.getenv('DB_SQLITE_WRITER', 'true').lower() == 'true'):
+                self.writer = SQLiteWriter(self.engine)
             print(f"Database initialized successfully")
         except Exception as e:
             print(f"Database connection failed: {e}")
             self.engine = None
             self.Session = None
+            self.writer = None
     
     def get_connection(self):
         """Create and return a database connection"""
@@ -50,265 +112,101 @@ class PostgresDBManager:
             print(f"Database connection failed: {e}")
             return None
     
+    def use_request_scope(self, scope_provider):
+        """Share one connection per request; scope_provider returns request storage or None"""
+        self.request_scope = scope_provider
+    
+    @contextmanager
+    def connection(self):
+        """
+        Yield the request's shared connection, or a fresh pooled one outside a request
+        
+        The shared connection is checked out on first use. A failing call rolls
+        back its transaction so later calls in the request start clean.
+        """
+        scope = self.request_scope() if self.request_scope else None
+        if scope is None:
+            with self.engine.connect() as conn:
+                yield conn
+            return
+        
+        conn = getattr(scope, 'db_connection', None)
+        if conn is None:
+            conn = RequestConnection(self.engine.connect())
+            scope.db_connection = conn
+        try:
+            yield conn
+        except Exception:
+            if conn.in_transaction():
+                conn.rollback()
+            raise
+    
+    @contextmanager
+    def write_connection(self):
+        """
+        connection() for methods that write and commit on it directly
+        
+        Ends the request's open read transaction first: SQLite refuses to
+        upgrade a read snapshot to a write once another connection has
+        committed (SQLITE_BUSY_SNAPSHOT), and busy_timeout does not retry that.
+        """
+        self._end_request_snapshot()
+        with self.connection() as conn:
+            yield conn
+    
+    def release_request_connection(self, scope, error=None):
+        """Finish the request's shared connection, if one was checked out"""
+        conn = getattr(scope, 'db_connection', None)
+        if conn is not None:
+            scope.db_connection = None
+            try:
+                conn.finish(error)
+            except Exception as e:
+                print(f"Failed to release request connection: {e}")
+    
+    def _end_request_snapshot(self):
+        """End the request connection's open read transaction so it sees writes committed elsewhere"""
+        scope = self.request_scope() if self.request_scope else None
+        conn = getattr(scope, 'db_connection', None) if scope is not None else None
+        if conn is not None and conn.in_transaction():
+            conn.commit()
+    
+    def run_write(self, write):
+        """
+        Run write(conn) in a committed transaction and return its result
+        
+        With the SQLite writer enabled the write is queued to the writer thread
+        and committed together with other pending writes.
+        """
+        if self.writer:
+            result = self.writer.execute(write)
+            # A read transaction opened earlier in the request would still see the old snapshot
+            self._end_request_snapshot()
+            return result
+        with self.write_connection() as conn:
+            result = write(conn)
+            conn.commit()
+            return result
+    
+    def pool_status(self):
+        """Connection pool settings and metrics"""
+        if not self.engine:
+            return {'connected': False}
+        return {
+            'connected': True,
+            'dialect': self.engine.dialect.name,
+            'settings': self.pool_settings,
+            'metrics': self.pool_metrics.snapshot(self.engine.pool),
+            'writer': self.writer.stats() if self.writer else None,
+            'session_cache': self.session_cache.stats()
+        }
+    
     def initialize_db(self):
-        """Initialize database tables if they don't exist"""
+        """Bring the database schema up to date by applying pending migrations"""
         if not self.engine:
             return
         try:
-            with self.engine.connect() as conn:
-                # Users table for authentication with subscription management
-                conn.execute(text("""
-                    CREATE TABLE IF NOT EXISTS users (
-                        id VARCHAR(36) PRIMARY KEY,
-                        username VARCHAR(100) UNIQUE NOT NULL,
-                        password_hash VARCHAR(64) NOT NULL,
-                        display_name VARCHAR(100) NOT NULL,
-                        role VARCHAR(20) DEFAULT 'participant',
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        subscription_tier VARCHAR(20) DEFAULT 'free',
-                        subscription_status VARCHAR(20) DEFAULT 'active',
-                        max_sessions_per_month INTEGER DEFAULT 1,
-                        max_participants_per_session INTEGER DEFAULT 5,
-                        sessions_used_this_month INTEGER DEFAULT 0,
-                        stripe_customer_id VARCHAR(100),
-                        stripe_subscription_id VARCHAR(100),
-                        stripe_price_id VARCHAR(100),
-                        cancel_at_period_end BOOLEAN DEFAULT FALSE
-                    )
-                """))
-                
-                # Sessions table
-                conn.execute(text("""
-                    CREATE TABLE IF NOT EXISTS sessions (
-                        id VARCHAR(36) PRIMARY KEY,
-                        name VARCHAR(200) NOT NULL,
-                        question TEXT NOT NULL,
-                        facilitator_id VARCHAR(36) NOT NULL,
-                        facilitator_name VARCHAR(100) NOT NULL,
-                        current_phase INTEGER DEFAULT 0,
-                        idea_phase_time INTEGER DEFAULT 600,
-                        review_phase_time INTEGER DEFAULT 300,
-                        voting_phase_time INTEGER DEFAULT 300,
-                        analysis_phase_time INTEGER DEFAULT 300,
-                        action_phase_time INTEGER DEFAULT 600,
-                        votes_per_participant INTEGER DEFAULT 5,
-                        max_votes_per_idea INTEGER DEFAULT 3,
-                        max_participants INTEGER DEFAULT 10,
-                        status VARCHAR(20) DEFAULT 'active',
-                        round_number INTEGER DEFAULT 1,
-                        iterative_prompt TEXT,
-                        join_enabled BOOLEAN DEFAULT TRUE,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (facilitator_id) REFERENCES users(id)
-                    )
-                """))
-                
-                # Participants table
-                conn.execute(text("""
-                    CREATE TABLE IF NOT EXISTS participants (
-                        id VARCHAR(36) PRIMARY KEY,
-                        session_id VARCHAR(36) NOT NULL,
-                        user_id VARCHAR(36) NOT NULL,
-                        name VARCHAR(100) NOT NULL,
-                        is_facilitator BOOLEAN DEFAULT FALSE,
-                        joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (session_id) REFERENCES sessions(id),
-                        FOREIGN KEY (user_id) REFERENCES users(id),
-                        UNIQUE(session_id, user_id)
-                    )
-                """))
-                
-                # Ideas table with author attribution (no foreign key on author_id to allow participant submissions)
-                conn.execute(text("""
-                    CREATE TABLE IF NOT EXISTS ideas (
-                        id VARCHAR(36) PRIMARY KEY,
-                        session_id VARCHAR(36) NOT NULL,
-                        content TEXT NOT NULL,
-                        author_id VARCHAR(36) NOT NULL,
-                        author_name VARCHAR(100) NOT NULL,
-                        theme_id VARCHAR(36),
-                        round_number INTEGER DEFAULT 1,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (session_id) REFERENCES sessions(id)
-                    )
-                """))
-                
-                # Remove foreign key constraint if it exists (for migration)
-                try:
-                    conn.execute(text("ALTER TABLE ideas DROP CONSTRAINT IF EXISTS ideas_author_id_fkey;"))
-                    conn.commit()
-                except Exception:
-                    pass  # Constraint may not exist
-                
-                # Add round_number column to existing ideas table if it doesn't exist
-                try:
-                    conn.execute(text("ALTER TABLE ideas ADD COLUMN round_number INTEGER DEFAULT 1;"))
-                    conn.commit()
-                except Exception:
-                    pass  # Column may already exist
-                
-                # Add join_enabled column to existing sessions table if it doesn't exist
-                try:
-                    conn.execute(text("ALTER TABLE sessions ADD COLUMN join_enabled BOOLEAN DEFAULT TRUE;"))
-                    conn.commit()
-                except Exception:
-                    pass  # Column may already exist
-                
-                # Themes table for AI clustering
-                conn.execute(text("""
-                    CREATE TABLE IF NOT EXISTS themes (
-                        id VARCHAR(36) PRIMARY KEY,
-                        session_id VARCHAR(36) NOT NULL,
-                        name VARCHAR(255) NOT NULL,
-                        description TEXT,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (session_id) REFERENCES sessions(id)
-                    )
-                """))
-                
-                # Votes table (no foreign key on voter_id to allow participant voting)
-                conn.execute(text("""
-                    CREATE TABLE IF NOT EXISTS votes (
-                        id VARCHAR(36) PRIMARY KEY,
-                        session_id VARCHAR(36) NOT NULL,
-                        idea_id VARCHAR(36) NOT NULL,
-                        voter_id VARCHAR(36) NOT NULL,
-                        points INTEGER NOT NULL,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (session_id) REFERENCES sessions(id),
-                        FOREIGN KEY (idea_id) REFERENCES ideas(id),
-                        UNIQUE(idea_id, voter_id)
-                    )
-                """))
-                
-                # Remove foreign key constraint if it exists (for migration)
-                try:
-                    conn.execute(text("ALTER TABLE votes DROP CONSTRAINT IF EXISTS votes_voter_id_fkey;"))
-                    conn.commit()
-                except Exception:
-                    pass  # Constraint may not exist
-                
-                # Themes table
-                conn.execute(text("""
-                    CREATE TABLE IF NOT EXISTS themes (
-                        id VARCHAR(36) PRIMARY KEY,
-                        session_id VARCHAR(36) NOT NULL,
-                        name VARCHAR(200) NOT NULL,
-                        description TEXT,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (session_id) REFERENCES sessions(id)
-                    )
-                """))
-                
-                # Action items table
-                conn.execute(text("""
-                    CREATE TABLE IF NOT EXISTS action_items (
-                        id VARCHAR(36) PRIMARY KEY,
-                        session_id VARCHAR(36) NOT NULL,
-                        theme_id VARCHAR(36),
-                        description TEXT NOT NULL,
-                        assignee VARCHAR(100),
-                        due_date DATE,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (session_id) REFERENCES sessions(id),
-                        FOREIGN KEY (theme_id) REFERENCES themes(id)
-                    )
-                """))
-                
-                # Session timers table for persistent timer state
-                conn.execute(text("""
-                    CREATE TABLE IF NOT EXISTS session_timers (
-                        session_id VARCHAR(36) PRIMARY KEY,
-                        duration INTEGER NOT NULL,
-                        remaining INTEGER NOT NULL,
-                        is_running BOOLEAN DEFAULT FALSE,
-                        started_at TIMESTAMP,
-                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (session_id) REFERENCES sessions(id) ON DELETE CASCADE
-                    )
-                """))
-                
-                # User subscriptions table - Enhanced for Stripe integration
-                conn.execute(text("""
-                    CREATE TABLE IF NOT EXISTS user_subscriptions (
-                        id VARCHAR(36) PRIMARY KEY,
-                        user_id VARCHAR(36) NOT NULL,
-                        tier VARCHAR(20) DEFAULT 'basic',
-                        status VARCHAR(20) DEFAULT 'active',
-                        sessions_used_this_month INTEGER DEFAULT 0,
-                        max_sessions_per_month INTEGER DEFAULT 4,
-                        max_participants_per_session INTEGER DEFAULT 10,
-                        current_period_start TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        current_period_end TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        stripe_customer_id VARCHAR(100),
-                        stripe_subscription_id VARCHAR(100),
-                        stripe_price_id VARCHAR(100),
-                        cancel_at_period_end BOOLEAN DEFAULT FALSE,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (user_id) REFERENCES users(id),
-                        UNIQUE(user_id)
-                    )
-                """))
-                
-                # Add missing columns to existing tables if they don't exist (SQLite compatible)
-                try:
-                    # Try to add columns - will fail silently if they exist (SQLite limitation)
-                    try:
-                        conn.execute(text("ALTER TABLE users ADD COLUMN role VARCHAR(20) DEFAULT 'participant'"))
-                    except:
-                        pass
-                    try:
-                        conn.execute(text("ALTER TABLE sessions ADD COLUMN max_participants INTEGER DEFAULT 10"))
-                    except:
-                        pass
-                    try:
-                        conn.execute(text("ALTER TABLE sessions ADD COLUMN status VARCHAR(20) DEFAULT 'active'"))
-                    except:
-                        pass
-                    try:
-                        conn.execute(text("ALTER TABLE sessions ADD COLUMN round_number INTEGER DEFAULT 1"))
-                    except:
-                        pass
-                    try:
-                        conn.execute(text("ALTER TABLE sessions ADD COLUMN iterative_prompt TEXT"))
-                    except:
-                        pass
-                    try:
-                        conn.execute(text("ALTER TABLE ideas ADD COLUMN round_number INTEGER DEFAULT 1"))
-                    except:
-                        pass
-                    
-                    # Enhance user_subscriptions table with new columns (SQLite compatible)
-                    try:
-                        conn.execute(text("ALTER TABLE user_subscriptions ADD COLUMN status VARCHAR(20) DEFAULT 'active'"))
-                    except:
-                        pass
-                    try:
-                        conn.execute(text("ALTER TABLE user_subscriptions ADD COLUMN sessions_used_this_month INTEGER DEFAULT 0"))
-                    except:
-                        pass
-                    try:
-                        conn.execute(text("ALTER TABLE user_subscriptions ADD COLUMN max_sessions_per_month INTEGER DEFAULT 4"))
-                    except:
-                        pass
-                    try:
-                        conn.execute(text("ALTER TABLE user_subscriptions ADD COLUMN max_participants_per_session INTEGER DEFAULT 10"))
-                    except:
-                        pass
-                    try:
-                        conn.execute(text("ALTER TABLE user_subscriptions ADD COLUMN stripe_price_id VARCHAR(100)"))
-                    except:
-                        pass
-                    try:
-                        conn.execute(text("ALTER TABLE user_subscriptions ADD COLUMN cancel_at_period_end BOOLEAN DEFAULT FALSE"))
-                    except:
-                        pass
-                except Exception as e:
-                    print(f"Note: Columns may already exist: {e}")
-                
-                conn.commit()
-                
+            run_migrations(self.engine)
         except Exception as e:
             print(f"Failed to initialize database: {e}")
     
@@ -321,7 +219,7 @@ class PostgresDBManager:
         if not self.engine:
             return None
         try:
-            with self.engine.connect() as conn:
+            with self.write_connection() as conn:
                 user_id = str(uuid.uuid4())
                 password_hash = self.hash_password(password)
                 
@@ -351,7 +249,7 @@ class PostgresDBManager:
         if not self.engine:
             return None
         try:
-            with self.engine.connect() as conn:
+            with self.connection() as conn:
                 password_hash = self.hash_password(password)
                 
                 result = conn.execute(text("""
@@ -379,7 +277,7 @@ class PostgresDBManager:
         if not self.engine:
             return None
         try:
-            with self.engine.connect() as conn:
+            with self.connection() as conn:
                 result = conn.execute(text("""
                     SELECT id, username, display_name FROM users 
                     WHERE id = :user_id
@@ -402,7 +300,7 @@ class PostgresDBManager:
     def create_session(self, session_data):
         """Create a new ideation session"""
         try:
-            with self.engine.connect() as conn:
+            with self.write_connection() as conn:
                 # Get facilitator name for the session
                 facilitator_result = conn.execute(text("""
                     SELECT display_name FROM users WHERE id = :facilitator_id
@@ -435,7 +333,7 @@ class PostgresDBManager:
         if not self.engine:
             return []
         try:
-            with self.engine.connect() as conn:
+            with self.connection() as conn:
                 result = conn.execute(text("""
                     SELECT id, name, question, facilitator_name, current_phase, created_at
                     FROM sessions 
@@ -470,7 +368,7 @@ class PostgresDBManager:
         if not self.engine:
             return None
         try:
-            with self.engine.connect() as conn:
+            with self.connection() as conn:
                 result = conn.execute(text("""
                     SELECT id, username, display_name FROM users 
                     WHERE id = :user_id
@@ -489,9 +387,13 @@ class PostgresDBManager:
             return None
     
     def get_session(self, session_id):
-        """Get session details by ID"""
+        """Get session details by ID (served from the session cache when fresh)"""
+        return self.session_cache.get(session_id, self._load_session)
+    
+    def _load_session(self, session_id):
+        """Read the session row from the database"""
         try:
-            with self.engine.connect() as conn:
+            with self.connection() as conn:
                 result = conn.execute(text("""
                     SELECT * FROM sessions WHERE id = :session_id
                 """), {'session_id': session_id})
@@ -508,11 +410,12 @@ class PostgresDBManager:
     def update_session_phase(self, session_id, phase):
         """Update the current phase of a session"""
         try:
-            with self.engine.connect() as conn:
+            with self.write_connection() as conn:
                 conn.execute(text("""
                     UPDATE sessions SET current_phase = :phase WHERE id = :session_id
                 """), {'phase': phase, 'session_id': session_id})
                 conn.commit()
+                self.invalidate_session(session_id)
                 return True
         except Exception as e:
             print(f"Failed to update session phase: {e}")
@@ -521,7 +424,7 @@ class PostgresDBManager:
     def update_voting_settings(self, session_id, max_votes_per_idea=None, votes_per_participant=None):
         """Update voting configuration for a session"""
         try:
-            with self.engine.connect() as conn:
+            with self.write_connection() as conn:
                 update_fields = []
                 params = {'session_id': session_id}
                 
@@ -537,6 +440,7 @@ class PostgresDBManager:
                     query = f"UPDATE sessions SET {', '.join(update_fields)} WHERE id = :session_id"
                     conn.execute(text(query), params)
                     conn.commit()
+                    self.invalidate_session(session_id)
                     return True
                 return False
         except Exception as e:
@@ -546,7 +450,7 @@ class PostgresDBManager:
     def add_participant(self, session_id, user_id, name):
         """Add a participant to a session"""
         try:
-            with self.engine.connect() as conn:
+            def write(conn):
                 conn.execute(text("""
                     INSERT INTO participants (id, session_id, user_id, name, is_facilitator)
                     VALUES (:id, :session_id, :user_id, :name, :is_facilitator)
@@ -557,8 +461,10 @@ class PostgresDBManager:
                     'name': name,
                     'is_facilitator': False
                 })
-                conn.commit()
                 return True
+            added = self.run_write(write)
+            self.invalidate_author_names(session_id)
+            return added
         except Exception as e:
             print(f"Failed to add participant: {e}")
             return False
@@ -566,7 +472,7 @@ class PostgresDBManager:
     def remove_participant(self, session_id, user_id):
         """Remove a participant from a session"""
         try:
-            with self.engine.connect() as conn:
+            with self.write_connection() as conn:
                 result = conn.execute(text("""
                     DELETE FROM participants 
                     WHERE session_id = :session_id AND user_id = :user_id
@@ -575,6 +481,7 @@ class PostgresDBManager:
                     'user_id': user_id
                 })
                 conn.commit()
+                self.invalidate_author_names(session_id)
                 deleted_count = result.rowcount
                 print(f"Removed participant {user_id} from session {session_id} (deleted {deleted_count} row(s))")
                 return deleted_count > 0
@@ -594,7 +501,7 @@ class PostgresDBManager:
             current_round = idea_data.get('round_number')
             
             if current_round is None:
-                with self.engine.connect() as conn:
+                with self.connection() as conn:
                     session_query = text("SELECT round_number FROM sessions WHERE id = :session_id")
                     session_result = conn.execute(session_query, {'session_id': session_id})
                     session_row = session_result.fetchone()
@@ -610,87 +517,103 @@ class PostgresDBManager:
                 'round_number': current_round
             }
             
-            with self.engine.connect() as conn:
+            def write(conn):
                 conn.execute(text("""
                     INSERT INTO ideas (id, session_id, content, author_id, author_name, theme_id, round_number)
                     VALUES (:id, :session_id, :content, :author_id, :author_name, :theme_id, :round_number)
                 """), idea_data_with_id)
-                conn.commit()
                 return idea_id
+            return self.run_write(write)
         except Exception as e:
             print(f"Failed to add idea: {e}")
             return False
     
+    def add_ideas_bulk(self, session_id, ideas, round_number=None):
+        """
+        Insert many ideas in a single transaction
+        
+        Args:
+            session_id: Session the ideas belong to
+            ideas: List of dicts with 'content' and optional 'author_id', 'author_name', 'theme_id'
+            round_number: Round for every idea (defaults to the session's current round)
+            
+        Returns:
+            List of inserted idea dicts with their ids, or False on failure
+        """
+        if not ideas:
+            return []
+        try:
+            def write(conn):
+                current_round = round_number
+                if current_round is None:
+                    session_row = conn.execute(text("""
+                        SELECT round_number FROM sessions WHERE id = :session_id
+                    """), {'session_id': session_id}).fetchone()
+                    current_round = session_row[0] if session_row and session_row[0] else 1
+                
+                rows = [{
+                    'id': str(uuid.uuid4()),
+                    'session_id': session_id,
+                    'content': idea['content'],
+                    'author_id': idea.get('author_id'),
+                    'author_name': idea.get('author_name'),
+                    'theme_id': idea.get('theme_id'),
+                    'round_number': current_round
+                } for idea in ideas]
+                
+                # One executemany (batched multi-row INSERT) for the whole import
+                conn.execute(text("""
+                    INSERT INTO ideas (id, session_id, content, author_id, author_name, theme_id, round_number)
+                    VALUES (:id, :session_id, :content, :author_id, :author_name, :theme_id, :round_number)
+                """), rows)
+                return rows
+            return self.run_write(write)
+        except Exception as e:
+            print(f"Failed to add ideas in bulk: {e}")
+            return False
+    
     def get_ideas(self, session_id, include_author=False, round_number=None):
         """Get all ideas for a session, optionally including author information"""
         try:
-            with self.engine.connect() as conn:
-                # Determine filtering strategy based on round_number parameter
-                if round_number is None:
-                    # Check if this should get current round or all rounds
-                    session_result = conn.execute(text("""
-                        SELECT round_number FROM sessions WHERE id = :session_id
-                    """), {'session_id': session_id})
-                    session_row = session_result.fetchone()
-                    current_round = session_row[0] if session_row else 1
-                    
-                    # If called from API with round_number=None, return ALL ideas (for facilitator)
-                    use_round_filter = False
-                else:
-                    # Specific round requested
-                    current_round = round_number
-                    use_round_filter = True
+            with self.connection() as conn:
+                # round_number=None returns ALL ideas (facilitator and theme views)
+                current_round = round_number
+                use_round_filter = round_number is not None
                 
                 if include_author:
                     # Get ideas with author information (for facilitators)
                     if use_round_filter:
                         ideas_result = conn.execute(text("""
-                            SELECT i.id, i.content, i.author_id, 
-                                   COALESCE(i.author_name, u.display_name, u.username, 'Anonymous') as author_name, 
+                            SELECT i.id, i.content, i.author_id, i.author_name, 
                                    i.theme_id, i.created_at, COALESCE(i.round_number, 1) as round_number
                             FROM ideas i
-                            LEFT JOIN users u ON i.author_id = u.id
                             WHERE i.session_id = :session_id AND (i.round_number = :round_number OR i.round_number IS NULL)
                             ORDER BY i.round_number, i.created_at
                         """), {'session_id': session_id, 'round_number': current_round})
                     else:
                         # Get ALL ideas for facilitator with proper author names
                         ideas_result = conn.execute(text("""
-                            SELECT i.id, i.content, i.author_id, 
-                                   COALESCE(i.author_name, u.display_name, u.username, 'Anonymous') as author_name, 
+                            SELECT i.id, i.content, i.author_id, i.author_name, 
                                    i.theme_id, i.created_at, COALESCE(i.round_number, 1) as round_number
                             FROM ideas i
-                            LEFT JOIN users u ON i.author_id = u.id
                             WHERE i.session_id = :session_id
                             ORDER BY i.round_number DESC, i.created_at DESC
                         """), {'session_id': session_id})
                     
                     ideas = [dict(zip(ideas_result.keys(), row)) for row in ideas_result.fetchall()]
                     
-                    # Get all participants for this session
-                    participants_result = conn.execute(text("""
-                        SELECT user_id, name FROM participants WHERE session_id = :session_id
-                    """), {'session_id': session_id})
-                    
-                    participants = {row[0]: row[1] for row in participants_result.fetchall()}
-                    
-                    # Map real names for facilitators - ensure proper author display
-                    for idea in ideas:
-                        # First check if author_name is already properly set
-                        if idea['author_name'] and not idea['author_name'].startswith('Participant'):
-                            continue
-                            
-                        # Try to find participant by user_id first
-                        if idea['author_id'] in participants:
-                            idea['author_name'] = participants[idea['author_id']]
-                        elif idea['author_id']:
-                            # Try to get user display name from users table
-                            user_result = conn.execute(text("""
-                                SELECT display_name FROM users WHERE id = :user_id
-                            """), {'user_id': idea['author_id']})
-                            user_row = user_result.fetchone()
-                            if user_row:
-                                idea['author_name'] = user_row[0]
+                    # Map real names for facilitators - ensure proper author display.
+                    # Ideas with a proper author_name keep it; the rest are resolved in one query.
+                    unresolved = [
+                        idea for idea in ideas
+                        if not idea['author_name'] or idea['author_name'] == 'Anonymous'
+                        or idea['author_name'].startswith('Participant')
+                    ]
+                    if unresolved:
+                        author_ids = {idea['author_id'] for idea in unresolved if idea['author_id']}
+                        author_names = self.get_author_names(session_id, author_ids, conn)
+                        for idea in unresolved:
+                            idea['author_name'] = author_names.get(idea['author_id']) or idea['author_name'] or 'Anonymous'
                     
                     return ideas
                 else:
@@ -717,18 +640,96 @@ class PostgresDBManager:
             print(f"Failed to get ideas: {e}")
             return []
     
+    def get_author_names(self, session_id, author_ids=(), conn=None):
+        """
+        Resolve display names for every idea author in a session with one query
+        
+        Participant names take priority over user display names, then usernames.
+        Results are cached per session (AUTHOR_NAME_CACHE, bounded to the
+        AUTHOR_NAME_CACHE_SESSIONS most recently used sessions) and rebuilt when
+        a requested author is missing or a participant joins or leaves.
+        
+        Returns:
+            Dictionary of author_id -> name (None if the author is unknown)
+        """
+        if self.author_name_cache_enabled:
+            with self._author_names_lock:
+                cached = self._author_names.get(session_id)
+                if cached is not None:
+                    self._author_names.move_to_end(session_id)
+            if cached is not None and set(author_ids) <= cached.keys():
+                return cached
+        
+        query = text("""
+            SELECT DISTINCT i.author_id, p.name AS participant_name, u.display_name, u.username
+            FROM ideas i
+            LEFT JOIN participants p ON p.session_id = i.session_id AND p.user_id = i.author_id
+            LEFT JOIN users u ON u.id = i.author_id
+            WHERE i.session_id = :session_id
+        """)
+        if conn is None:
+            with self.connection() as conn:
+                rows = conn.execute(query, {'session_id': session_id}).fetchall()
+        else:
+            rows = conn.execute(query, {'session_id': session_id}).fetchall()
+        
+        names = {
+            author_id: participant_name or display_name or username
+            for author_id, participant_name, display_name, username in rows
+        }
+        if self.author_name_cache_enabled:
+            with self._author_names_lock:
+                self._author_names[session_id] = names
+                self._author_names.move_to_end(session_id)
+                while len(self._author_names) > self.author_name_cache_sessions:
+                    self._author_names.popitem(last=False)
+        return names
+    
+    def invalidate_session(self, session_id):
+        """Drop the cached session row; call after any write to the sessions table"""
+        self.session_cache.invalidate(session_id)
+    
+    def invalidate_author_names(self, session_id):
+        """Drop the session's cached author names"""
+        with self._author_names_lock:
+            self._author_names.pop(session_id, None)
+    
+    def _apply_vote_delta(self, conn, session_id, idea_id, voter_id, delta):
+        """Adjust the idea's vote_total and the voter's running total by delta"""
+        if not delta:
+            return
+        conn.execute(text("""
+            UPDATE ideas SET vote_total = COALESCE(vote_total, 0) + :delta WHERE id = :idea_id
+        """), {'delta': delta, 'idea_id': idea_id})
+        conn.execute(text("""
+            INSERT INTO voter_totals (session_id, voter_id, total)
+            VALUES (:session_id, :voter_id, :delta)
+            ON CONFLICT (session_id, voter_id)
+            DO UPDATE SET total = voter_totals.total + EXCLUDED.total
+        """), {'session_id': session_id, 'voter_id': voter_id, 'delta': delta})
+    
+    def _current_vote_points(self, conn, idea_id, voter_id):
+        """Points the voter currently has on the idea"""
+        row = conn.execute(text("""
+            SELECT points FROM votes WHERE idea_id = :idea_id AND voter_id = :voter_id
+        """), {'idea_id': idea_id, 'voter_id': voter_id}).fetchone()
+        return row[0] if row else 0
+    
     def add_vote(self, vote_data):
         """Add a vote for an idea"""
         try:
-            with self.engine.connect() as conn:
+            def write(conn):
+                previous = self._current_vote_points(conn, vote_data['idea_id'], vote_data['voter_id'])
                 conn.execute(text("""
                     INSERT INTO votes (id, session_id, idea_id, voter_id, points)
                     VALUES (:id, :session_id, :idea_id, :voter_id, :points)
                     ON CONFLICT (idea_id, voter_id) 
                     DO UPDATE SET points = :points
                 """), vote_data)
-                conn.commit()
+                self._apply_vote_delta(conn, vote_data['session_id'], vote_data['idea_id'],
+                                       vote_data['voter_id'], vote_data['points'] - previous)
                 return True
+            return self.run_write(write)
         except Exception as e:
             print(f"Failed to add vote: {e}")
             return False
@@ -736,39 +737,247 @@ class PostgresDBManager:
     def upsert_vote(self, vote_data):
         """Insert or update vote for an idea with vote count"""
         try:
-            with self.engine.connect() as conn:
-                # First, delete existing votes for this voter and idea
-                conn.execute(text("""
-                    DELETE FROM votes WHERE idea_id = :idea_id AND voter_id = :voter_id
-                """), {
-                    'idea_id': vote_data['idea_id'],
-                    'voter_id': vote_data['voter_id']
-                })
-                
-                # If votes > 0, insert new votes (one record per vote to work around unique constraint)
-                if vote_data['votes'] > 0:
-                    # Insert a single vote record with the total count in points field
-                    conn.execute(text("""
-                        INSERT INTO votes (id, session_id, idea_id, voter_id, points, created_at)
-                        VALUES (:id, :session_id, :idea_id, :voter_id, :points, CURRENT_TIMESTAMP)
-                    """), {
-                        'id': str(uuid.uuid4()),
-                        'session_id': vote_data['session_id'],
-                        'idea_id': vote_data['idea_id'],
-                        'voter_id': vote_data['voter_id'],
-                        'points': vote_data['votes']
-                    })
-                
-                conn.commit()
+            def write(conn):
+                self._write_vote(conn, vote_data['session_id'], vote_data['idea_id'],
+                                 vote_data['voter_id'], max(vote_data['votes'], 0))
                 return True
+            return self.run_write(write)
         except Exception as e:
             print(f"Failed to upsert vote: {e}")
             return False
     
+    def _write_vote(self, conn, session_id, idea_id, voter_id, votes, previous=None):
+        """
+        Set the voter's points on an idea and move the tallies by the difference
+        
+        Returns:
+            The idea's new vote_total, or None if the idea isn't in the session
+        """
+        if previous is None:
+            previous = self._current_vote_points(conn, idea_id, voter_id)
+        if votes > 0:
+            # Single upsert on the UNIQUE(idea_id, voter_id) target
+            conn.execute(text("""
+                INSERT INTO votes (id, session_id, idea_id, voter_id, points, created_at)
+                VALUES (:id, :session_id, :idea_id, :voter_id, :points, CURRENT_TIMESTAMP)
+                ON CONFLICT (idea_id, voter_id)
+                DO UPDATE SET points = EXCLUDED.points, created_at = CURRENT_TIMESTAMP
+            """), {
+                'id': str(uuid.uuid4()),
+                'session_id': session_id,
+                'idea_id': idea_id,
+                'voter_id': voter_id,
+                'points': votes
+            })
+        elif previous:
+            conn.execute(text("""
+                DELETE FROM votes WHERE idea_id = :idea_id AND voter_id = :voter_id
+            """), {'idea_id': idea_id, 'voter_id': voter_id})
+        
+        # Keep the materialized tallies in the same transaction as the vote
+        self._apply_vote_delta(conn, session_id, idea_id, voter_id, votes - previous)
+        row = conn.execute(text("""
+            SELECT vote_total FROM ideas WHERE id = :idea_id AND session_id = :session_id
+        """), {'idea_id': idea_id, 'session_id': session_id}).fetchone()
+        return row[0] if row else None
+    
+    def _vote_limits(self, conn, session_id):
+        """The session's per-idea and per-participant vote limits, or None if the session doesn't exist"""
+        session_row = conn.execute(text("""
+            SELECT max_votes_per_idea, votes_per_participant FROM sessions WHERE id = :session_id
+        """), {'session_id': session_id}).fetchone()
+        if not session_row:
+            return None
+        return {
+            'max_votes_per_idea': session_row[0] if session_row[0] is not None else 3,
+            'votes_per_participant': session_row[1] if session_row[1] is not None else 5
+        }
+    
+    def _lock_voter_total(self, conn, session_id, voter_id):
+        """Lock (creating if needed) the voter's running total row and return the total"""
+        conn.execute(text("""
+            INSERT INTO voter_totals (session_id, voter_id, total)
+            VALUES (:session_id, :voter_id, 0)
+            ON CONFLICT (session_id, voter_id) DO NOTHING
+        """), {'session_id': session_id, 'voter_id': voter_id})
+        return conn.execute(text("""
+            UPDATE voter_totals SET total = total
+            WHERE session_id = :session_id AND voter_id = :voter_id
+            RETURNING total
+        """), {'session_id': session_id, 'voter_id': voter_id}).fetchone()[0]
+    
+    def cast_vote(self, session_id, idea_id, voter_id, votes):
+        """
+        Atomically set a voter's points on an idea, enforcing the session's vote budgets
+        
+        The voter's voter_totals row is locked before the budget check, so
+        concurrent votes from the same voter are serialized and can't overspend.
+        
+        Returns:
+            Dictionary with 'status' ('ok', 'session_not_found', 'idea_not_found',
+            'idea_limit' or 'budget_exceeded'), the session limits and the new totals
+        """
+        votes = max(int(votes), 0)
+        
+        def write(conn):
+            limits = self._vote_limits(conn, session_id)
+            if limits is None:
+                return {'status': 'session_not_found'}
+            
+            if votes > limits['max_votes_per_idea']:
+                return {'status': 'idea_limit', **limits}
+            
+            voter_total = self._lock_voter_total(conn, session_id, voter_id)
+            previous = self._current_vote_points(conn, idea_id, voter_id)
+            other_votes = voter_total - previous
+            if other_votes + votes > limits['votes_per_participant']:
+                return {'status': 'budget_exceeded', 'remaining': limits['votes_per_participant'] - other_votes, **limits}
+            
+            idea_total = self._write_vote(conn, session_id, idea_id, voter_id, votes, previous)
+            if idea_total is None:
+                # Undo the tally changes along with the vote
+                raise VoteRejected({'status': 'idea_not_found', **limits})
+            
+            new_voter_total = other_votes + votes
+            return {
+                'status': 'ok',
+                'votes': votes,
+                'idea_total': idea_total,
+                'voter_total': new_voter_total,
+                'remaining': limits['votes_per_participant'] - new_voter_total,
+                **limits
+            }
+        
+        try:
+            return self.run_write(write)
+        except VoteRejected as rejected:
+            return rejected.outcome
+        except Exception as e:
+            print(f"Failed to cast vote: {e}")
+            return {'status': 'error', 'error': str(e)}
+    
+    def replace_ballot(self, session_id, voter_id, allocation):
+        """
+        Replace a voter's whole allocation in one transaction
+        
+        Every idea gets the points in allocation (ideas left out drop to 0).
+        The ballot is validated against the session's budgets in one pass and
+        written with batched statements.
+        
+        Args:
+            session_id: Session the ballot belongs to
+            voter_id: Voter casting the ballot
+            allocation: Dictionary of idea_id -> points
+            
+        Returns:
+            Dictionary with 'status' ('ok', 'session_not_found', 'idea_not_found',
+            'idea_limit' or 'budget_exceeded'), the limits and the new totals
+        """
+        allocation = {idea_id: max(int(points), 0) for idea_id, points in allocation.items()}
+        
+        def write(conn):
+            limits = self._vote_limits(conn, session_id)
+            if limits is None:
+                return {'status': 'session_not_found'}
+            
+            over_limit = [idea_id for idea_id, points in allocation.items() if points > limits['max_votes_per_idea']]
+            if over_limit:
+                return {'status': 'idea_limit', 'idea_ids': over_limit, **limits}
+            ballot_total = sum(allocation.values())
+            if ballot_total > limits['votes_per_participant']:
+                return {'status': 'budget_exceeded', 'remaining': limits['votes_per_participant'], **limits}
+            
+            # Serialize with the voter's other vote writes before reading their votes
+            self._lock_voter_total(conn, session_id, voter_id)
+            
+            if allocation:
+                # Build IN clause for SQLite compatibility
+                placeholders = ','.join([f':i{i}' for i in range(len(allocation))])
+                params = {f'i{i}': idea_id for i, idea_id in enumerate(allocation)}
+                found = {row[0] for row in conn.execute(text(f"""
+                    SELECT id FROM ideas WHERE session_id = :session_id AND id IN ({placeholders})
+                """), {'session_id': session_id, **params}).fetchall()}
+                missing = [idea_id for idea_id in allocation if idea_id not in found]
+                if missing:
+                    return {'status': 'idea_not_found', 'idea_ids': missing, **limits}
+            
+            previous = {row[0]: row[1] for row in conn.execute(text("""
+                SELECT idea_id, points FROM votes WHERE session_id = :session_id AND voter_id = :voter_id
+            """), {'session_id': session_id, 'voter_id': voter_id}).fetchall()}
+            
+            upserts = []
+            deletes = []
+            deltas = []
+            for idea_id in set(allocation) | set(previous):
+                points = allocation.get(idea_id, 0)
+                delta = points - previous.get(idea_id, 0)
+                if not delta:
+                    continue
+                if points > 0:
+                    upserts.append({
+                        'id': str(uuid.uuid4()),
+                        'session_id': session_id,
+                        'idea_id': idea_id,
+                        'voter_id': voter_id,
+                        'points': points
+                    })
+                else:
+                    deletes.append({'idea_id': idea_id, 'voter_id': voter_id})
+                deltas.append({'idea_id': idea_id, 'delta': delta})
+            
+            if upserts:
+                conn.execute(text("""
+                    INSERT INTO votes (id, session_id, idea_id, voter_id, points, created_at)
+                    VALUES (:id, :session_id, :idea_id, :voter_id, :points, CURRENT_TIMESTAMP)
+                    ON CONFLICT (idea_id, voter_id)
+                    DO UPDATE SET points = EXCLUDED.points, created_at = CURRENT_TIMESTAMP
+                """), upserts)
+            if deletes:
+                conn.execute(text("""
+                    DELETE FROM votes WHERE idea_id = :idea_id AND voter_id = :voter_id
+                """), deletes)
+            
+            idea_totals = {}
+            if deltas:
+                conn.execute(text("""
+                    UPDATE ideas SET vote_total = COALESCE(vote_total, 0) + :delta WHERE id = :idea_id
+                """), deltas)
+                placeholders = ','.join([f':i{i}' for i in range(len(deltas))])
+                params = {f'i{i}': item['idea_id'] for i, item in enumerate(deltas)}
+                idea_totals = {row[0]: row[1] for row in conn.execute(text(f"""
+                    SELECT id, vote_total FROM ideas WHERE id IN ({placeholders})
+                """), params).fetchall()}
+            
+            conn.execute(text("""
+                UPDATE voter_totals SET total = :total
+                WHERE session_id = :session_id AND voter_id = :voter_id
+            """), {'total': ballot_total, 'session_id': session_id, 'voter_id': voter_id})
+            
+            return {
+                'status': 'ok',
+                'allocation': {idea_id: points for idea_id, points in allocation.items() if points > 0},
+                'idea_totals': idea_totals,
+                'voter_total': ballot_total,
+                'remaining': limits['votes_per_participant'] - ballot_total,
+                **limits
+            }
+        
+        try:
+            return self.run_write(write)
+        except Exception as e:
+            print(f"Failed to replace ballot: {e}")
+            return {'status': 'error', 'error': str(e)}
+    
+    def clear_session_votes(self, conn, session_id):
+        """Delete a session's votes and reset its tallies on an open connection (caller commits)"""
+        conn.execute(text("DELETE FROM votes WHERE idea_id IN (SELECT id FROM ideas WHERE session_id = :session_id)"), {'session_id': session_id})
+        conn.execute(text("UPDATE ideas SET vote_total = 0 WHERE session_id = :session_id"), {'session_id': session_id})
+        conn.execute(text("DELETE FROM voter_totals WHERE session_id = :session_id"), {'session_id': session_id})
+    
     def get_votes(self, session_id, voter_id=None):
         """Get all votes for a session, optionally filtered by voter"""
         try:
-            with self.engine.connect() as conn:
+            with self.connection() as conn:
                 if voter_id:
                     # Get individual vote records for API vote counting
                     result = conn.execute(text("""
@@ -789,15 +998,13 @@ class PostgresDBManager:
     def get_vote_results(self, session_id):
         """Get aggregated vote results for all ideas in a session"""
         try:
-            with self.engine.connect() as conn:
+            with self.connection() as conn:
                 result = conn.execute(text("""
-                    SELECT i.id, i.content, COALESCE(SUM(v.points), 0) as total_points,
+                    SELECT i.id, i.content, COALESCE(i.vote_total, 0) as total_points,
                            u.display_name as author_name
                     FROM ideas i
-                    LEFT JOIN votes v ON i.id = v.idea_id
                     LEFT JOIN users u ON i.author_id = u.id
                     WHERE i.session_id = :session_id
-                    GROUP BY i.id, i.content, u.display_name
                     ORDER BY total_points DESC
                 """), {'session_id': session_id})
                 
@@ -810,7 +1017,7 @@ class PostgresDBManager:
     def add_theme(self, theme_data):
         """Add a new AI-generated theme"""
         try:
-            with self.engine.connect() as conn:
+            with self.write_connection() as conn:
                 conn.execute(text("""
                     INSERT INTO themes (id, session_id, name, description)
                     VALUES (:id, :session_id, :name, :description)
@@ -824,7 +1031,7 @@ class PostgresDBManager:
     def get_themes(self, session_id):
         """Get all themes for a session"""
         try:
-            with self.engine.connect() as conn:
+            with self.connection() as conn:
                 result = conn.execute(text("""
                     SELECT * FROM themes WHERE session_id = :session_id
                 """), {'session_id': session_id})
@@ -838,12 +1045,12 @@ class PostgresDBManager:
     def update_idea_theme(self, idea_id, theme_id):
         """Update the theme association for an idea"""
         try:
-            with self.engine.connect() as conn:
+            def write(conn):
                 conn.execute(text("""
                     UPDATE ideas SET theme_id = :theme_id WHERE id = :idea_id
                 """), {'theme_id': theme_id, 'idea_id': idea_id})
-                conn.commit()
                 return True
+            return self.run_write(write)
         except Exception as e:
             print(f"Failed to update idea theme: {e}")
             return False
@@ -851,15 +1058,13 @@ class PostgresDBManager:
     def get_ideas_by_theme(self, session_id):
         """Get ideas grouped by themes for a session"""
         try:
-            with self.engine.connect() as conn:
+            with self.connection() as conn:
                 result = conn.execute(text("""
                     SELECT t.id as theme_id, t.name as theme_name, 
-                           i.id as idea_id, i.content, COALESCE(SUM(v.points), 0) as points
+                           i.id as idea_id, i.content, COALESCE(i.vote_total, 0) as points
                     FROM themes t
                     LEFT JOIN ideas i ON t.id = i.theme_id
-                    LEFT JOIN votes v ON i.id = v.idea_id
                     WHERE t.session_id = :session_id
-                    GROUP BY t.id, t.name, i.id, i.content
                     ORDER BY t.name, points DESC
                 """), {'session_id': session_id})
                 
@@ -886,10 +1091,57 @@ class PostgresDBManager:
             print(f"Failed to get ideas by theme: {e}")
             return {}
     
+    def get_preprocessed_texts(self, content_hashes):
+        """Get cached preprocessing results as {content_hash: (processed_text, keywords)}"""
+        if not self.engine or not content_hashes:
+            return {}
+        try:
+            with self.connection() as conn:
+                # Build IN clause for SQLite compatibility
+                placeholders = ','.join([f':h{i}' for i in range(len(content_hashes))])
+                params = {f'h{i}': content_hash for i, content_hash in enumerate(content_hashes)}
+                result = conn.execute(text(f"""
+                    SELECT content_hash, processed_text, keywords
+                    FROM idea_preprocessing_cache
+                    WHERE content_hash IN ({placeholders})
+                """), params)
+                
+                return {
+                    row[0]: (row[1], row[2].split() if row[2] else [])
+                    for row in result.fetchall()
+                }
+        except Exception as e:
+            print(f"Failed to get preprocessed texts: {e}")
+            return {}
+    
+    def save_preprocessed_texts(self, entries):
+        """Persist {content_hash: (processed_text, keywords)} preprocessing results"""
+        if not self.engine or not entries:
+            return False
+        try:
+            with self.write_connection() as conn:
+                conn.execute(text("""
+                    INSERT INTO idea_preprocessing_cache (content_hash, processed_text, keywords)
+                    VALUES (:content_hash, :processed_text, :keywords)
+                    ON CONFLICT (content_hash) DO NOTHING
+                """), [
+                    {
+                        'content_hash': content_hash,
+                        'processed_text': processed_text,
+                        'keywords': ' '.join(keywords)
+                    }
+                    for content_hash, (processed_text, keywords) in entries.items()
+                ])
+                conn.commit()
+                return True
+        except Exception as e:
+            print(f"Failed to save preprocessed texts: {e}")
+            return False
+    
     def add_action_item(self, action_data):
         """Add a new action item"""
         try:
-            with self.engine.connect() as conn:
+            with self.write_connection() as conn:
                 conn.execute(text("""
                     INSERT INTO action_items (id, session_id, theme_id, description, assignee, due_date)
                     VALUES (:id, :session_id, :theme_id, :description, :assignee, :due_date)
@@ -903,7 +1155,7 @@ class PostgresDBManager:
     def get_action_items(self, session_id):
         """Get all action items for a session"""
         try:
-            with self.engine.connect() as conn:
+            with self.connection() as conn:
                 result = conn.execute(text("""
                     SELECT a.*, t.name as theme_name
                     FROM action_items a
@@ -921,12 +1173,12 @@ class PostgresDBManager:
     def get_participants(self, session_id):
         """Get all participants for a session with total statistics across all rounds"""
         try:
-            with self.engine.connect() as conn:
+            with self.connection() as conn:
                 # Get participants with idea and vote counts across ALL rounds (not filtered by round)
                 result = conn.execute(text("""
                     SELECT p.*,
                            COALESCE(idea_counts.idea_count, 0) as ideas,
-                           COALESCE(vote_counts.vote_count, 0) as votes_cast
+                           COALESCE(vt.total, 0) as votes_cast
                     FROM participants p
                     LEFT JOIN (
                         SELECT author_id, COUNT(*) as idea_count
@@ -934,13 +1186,7 @@ class PostgresDBManager:
                         WHERE session_id = :session_id
                         GROUP BY author_id
                     ) idea_counts ON p.user_id = idea_counts.author_id
-                    LEFT JOIN (
-                        SELECT v.voter_id, SUM(v.points) as vote_count
-                        FROM votes v
-                        JOIN ideas i ON v.idea_id = i.id
-                        WHERE i.session_id = :session_id
-                        GROUP BY v.voter_id
-                    ) vote_counts ON p.user_id = vote_counts.voter_id
+                    LEFT JOIN voter_totals vt ON vt.session_id = p.session_id AND vt.voter_id = p.user_id
                     WHERE p.session_id = :session_id
                 """), {'session_id': session_id})
                 
@@ -950,12 +1196,56 @@ class PostgresDBManager:
             print(f"Failed to get participants: {e}")
             return []
     
+    def count_participants(self, session_id):
+        """Number of participants in a session (without the per-participant stats)"""
+        try:
+            with self.connection() as conn:
+                result = conn.execute(text("""
+                    SELECT COUNT(*) FROM participants WHERE session_id = :session_id
+                """), {'session_id': session_id})
+                return result.scalar() or 0
+        except Exception as e:
+            print(f"Failed to count participants: {e}")
+            return 0
+    
+    def get_participant_stats(self, session_id, user_ids):
+        """
+        Idea and vote totals for a few participants
+        
+        Returns:
+            Dictionary of {user_id: {'ideas': int, 'votes_cast': int}} for the
+            given users that are participants of the session
+        """
+        user_ids = [user_id for user_id in set(user_ids) if user_id]
+        if not user_ids:
+            return {}
+        try:
+            with self.connection() as conn:
+                # Build IN clause for SQLite compatibility
+                placeholders = ','.join([f':u{i}' for i in range(len(user_ids))])
+                params = {'session_id': session_id}
+                params.update({f'u{i}': user_id for i, user_id in enumerate(user_ids)})
+                
+                result = conn.execute(text(f"""
+                    SELECT p.user_id,
+                           (SELECT COUNT(*) FROM ideas i
+                            WHERE i.session_id = p.session_id AND i.author_id = p.user_id) as ideas,
+                           COALESCE(vt.total, 0) as votes_cast
+                    FROM participants p
+                    LEFT JOIN voter_totals vt ON vt.session_id = p.session_id AND vt.voter_id = p.user_id
+                    WHERE p.session_id = :session_id AND p.user_id IN ({placeholders})
+                """), params)
+                return {row[0]: {'ideas': row[1], 'votes_cast': row[2]} for row in result.fetchall()}
+        except Exception as e:
+            print(f"Failed to get participant stats: {e}")
+            return {}
+    
     def get_user_subscription(self, user_id):
         """Get user's subscription details"""
         if not self.engine:
             return None
         try:
-            with self.engine.connect() as conn:
+            with self.connection() as conn:
                 result = conn.execute(text("""
                     SELECT * FROM user_subscriptions WHERE user_id = :user_id
                 """), {'user_id': user_id})
@@ -981,7 +1271,7 @@ class PostgresDBManager:
             
             limits = tier_limits.get(tier, tier_limits['free'])
             
-            with self.engine.connect() as conn:
+            with self.write_connection() as conn:
                 conn.execute(text("""
                     INSERT INTO user_subscriptions (
                         id, user_id, tier, status, sessions_used_this_month,
@@ -1014,7 +1304,7 @@ class PostgresDBManager:
     def increment_user_sessions(self, user_id):
         """Increment user's session usage for current period"""
         try:
-            with self.engine.connect() as conn:
+            with self.write_connection() as conn:
                 # Update user_subscriptions table
                 conn.execute(text("""
                     UPDATE user_subscriptions 
@@ -1085,7 +1375,7 @@ class PostgresDBManager:
                 updates.append('cancel_at_period_end = :cancel_at_period_end')
                 params['cancel_at_period_end'] = cancel_at_period_end
             
-            with self.engine.connect() as conn:
+            with self.write_connection() as conn:
                 # Update user_subscriptions table
                 query = f"""
                     UPDATE user_subscriptions 
@@ -1151,7 +1441,7 @@ class PostgresDBManager:
         if not self.engine:
             return False
         try:
-            with self.engine.connect() as conn:
+            with self.write_connection() as conn:
                 # Update user_subscriptions table
                 conn.execute(text("""
                     UPDATE user_subscriptions 
@@ -1233,7 +1523,7 @@ class PostgresDBManager:
     def grandfather_existing_users(self):
         """Grandfather existing users with basic plan"""
         try:
-            with self.engine.connect() as conn:
+            with self.connection() as conn:
                 # Get all users without subscriptions
                 result = conn.execute(text("""
                     SELECT u.id, u.username 
@@ -1263,7 +1553,7 @@ class PostgresDBManager:
     def get_user_by_id(self, user_id):
         """Get user by ID for Stripe integration"""
         try:
-            with self.engine.connect() as conn:
+            with self.connection() as conn:
                 result = conn.execute(text("""
                     SELECT * FROM users WHERE id = :user_id
                 """), {'user_id': user_id})
@@ -1280,7 +1570,7 @@ class PostgresDBManager:
     def update_user_stripe_customer(self, user_id, stripe_customer_id):
         """Update user with Stripe customer ID"""
         try:
-            with self.engine.connect() as conn:
+            with self.write_connection() as conn:
                 conn.execute(text("""
                     UPDATE users SET stripe_customer_id = :stripe_customer_id 
                     WHERE id = :user_id
@@ -1294,7 +1584,7 @@ class PostgresDBManager:
     def get_user_by_stripe_customer(self, stripe_customer_id):
         """Get user by Stripe customer ID"""
         try:
-            with self.engine.connect() as conn:
+            with self.connection() as conn:
                 result = conn.execute(text("""
                     SELECT * FROM users WHERE stripe_customer_id = :stripe_customer_id
                 """), {'stripe_customer_id': stripe_customer_id})
@@ -1311,7 +1601,7 @@ class PostgresDBManager:
     def get_user_by_stripe_subscription(self, stripe_subscription_id):
         """Get user by Stripe subscription ID"""
         try:
-            with self.engine.connect() as conn:
+            with self.connection() as conn:
                 result = conn.execute(text("""
                     SELECT u.* FROM users u
                     JOIN user_subscriptions s ON u.id = s.user_id
@@ -1357,7 +1647,7 @@ class PostgresDBManager:
         if not self.engine:
             return 'participant'
         try:
-            with self.engine.connect() as conn:
+            with self.connection() as conn:
                 result = conn.execute(text("""
                     SELECT role FROM users WHERE id = :user_id
                 """), {'user_id': user_id})
@@ -1375,7 +1665,7 @@ class PostgresDBManager:
         if not self.engine:
             return False
         try:
-            with self.engine.connect() as conn:
+            with self.write_connection() as conn:
                 conn.execute(text("""
                     UPDATE users SET role = :role WHERE id = :user_id
                 """), {'user_id': user_id, 'role': role})
@@ -1390,17 +1680,27 @@ class PostgresDBManager:
         if not self.engine:
             return False
         try:
-            with self.engine.connect() as conn:
+            def write(conn):
                 conn.execute(text("""
-                    INSERT INTO session_timers (session_id, duration, remaining, is_running, started_at)
-                    VALUES (:session_id, :duration, :remaining, :is_running, :started_at)
+                    INSERT INTO session_timers (session_id, duration, remaining, is_running, started_at, auto_advance)
+                    VALUES (:session_id, :duration, :remaining, :is_running, :started_at, :auto_advance)
                     ON CONFLICT (session_id) DO UPDATE SET
+                        duration = EXCLUDED.duration,
                         remaining = EXCLUDED.remaining,
                         is_running = EXCLUDED.is_running,
+                        started_at = EXCLUDED.started_at,
+                        auto_advance = EXCLUDED.auto_advance,
                         updated_at = CURRENT_TIMESTAMP
-                """), {**timer_data, 'session_id': session_id})
-                conn.commit()
+                """), {
+                    'session_id': session_id,
+                    'duration': timer_data['duration'],
+                    'remaining': timer_data['remaining'],
+                    'is_running': timer_data['is_running'],
+                    'started_at': timer_data.get('started_at'),
+                    'auto_advance': bool(timer_data.get('auto_advance'))
+                })
                 return True
+            return self.run_write(write)
         except Exception as e:
             print(f"Failed to save timer state: {e}")
             return False
@@ -1410,9 +1710,9 @@ class PostgresDBManager:
         if not self.engine:
             return None
         try:
-            with self.engine.connect() as conn:
+            with self.connection() as conn:
                 result = conn.execute(text("""
-                    SELECT duration, remaining, is_running, started_at, updated_at
+                    SELECT duration, remaining, is_running, started_at, updated_at, auto_advance
                     FROM session_timers WHERE session_id = :session_id
                 """), {'session_id': session_id})
                 
@@ -1423,19 +1723,62 @@ class PostgresDBManager:
                         'remaining': row[1],
                         'is_running': row[2],
                         'started_at': row[3],
-                        'updated_at': row[4]
+                        'updated_at': row[4],
+                        'auto_advance': bool(row[5])
                     }
                 return None
         except Exception as e:
             print(f"Failed to get timer state: {e}")
             return None
     
+    def get_running_timers(self):
+        """Session IDs and deadlines of every running timer, for rescheduling after a restart"""
+        if not self.engine:
+            return []
+        try:
+            with self.connection() as conn:
+                result = conn.execute(text("""
+                    SELECT session_id, remaining, started_at
+                    FROM session_timers WHERE is_running = :is_running
+                """), {'is_running': True})
+                
+                return [{
+                    'session_id': row[0],
+                    'remaining': row[1],
+                    'started_at': row[2]
+                } for row in result.fetchall()]
+        except Exception as e:
+            print(f"Failed to get running timers: {e}")
+            return []
+    
+    def expire_timer(self, session_id, started_at):
+        """
+        Mark a running timer as finished
+        
+        Only succeeds while the row still has the given started_at, so when
+        several workers reach the same deadline exactly one of them wins.
+        """
+        if not self.engine:
+            return False
+        try:
+            def write(conn):
+                result = conn.execute(text("""
+                    UPDATE session_timers
+                    SET remaining = 0, is_running = :stopped, started_at = NULL, updated_at = CURRENT_TIMESTAMP
+                    WHERE session_id = :session_id AND is_running = :running AND started_at = :started_at
+                """), {'session_id': session_id, 'started_at': started_at, 'running': True, 'stopped': False})
+                return result.rowcount == 1
+            return self.run_write(write)
+        except Exception as e:
+            print(f"Failed to expire timer: {e}")
+            return False
+    
     def delete_timer_state(self, session_id):
         """Delete timer state from database"""
         if not self.engine:
             return False
         try:
-            with self.engine.connect() as conn:
+            with self.write_connection() as conn:
                 conn.execute(text("""
                     DELETE FROM session_timers WHERE session_id = :session_id
                 """), {'session_id': session_id})
@@ -1450,7 +1793,7 @@ class PostgresDBManager:
         if not self.engine:
             return False
         try:
-            with self.engine.connect() as conn:
+            with self.write_connection() as conn:
                 # First verify the session belongs to the facilitator
                 session_check = conn.execute(text("""
                     SELECT id FROM sessions WHERE id = :session_id AND facilitator_id = :facilitator_id
@@ -1461,7 +1804,7 @@ class PostgresDBManager:
                 
                 # Delete all related data in the correct order (due to foreign key constraints)
                 # Delete votes first
-                conn.execute(text("DELETE FROM votes WHERE idea_id IN (SELECT id FROM ideas WHERE session_id = :session_id)"), {'session_id': session_id})
+                self.clear_session_votes(conn, session_id)
                 
                 # Delete ideas
                 conn.execute(text("DELETE FROM ideas WHERE session_id = :session_id"), {'session_id': session_id})
@@ -1479,6 +1822,8 @@ class PostgresDBManager:
                 conn.execute(text("DELETE FROM sessions WHERE id = :session_id"), {'session_id': session_id})
                 
                 conn.commit()
+                self.invalidate_session(session_id)
+                self.invalidate_author_names(session_id)
                 return True
         except Exception as e:
             print(f"Failed to delete session: {e}")
@@ -1489,7 +1834,7 @@ class PostgresDBManager:
         if not self.engine:
             return False
         try:
-            with self.engine.connect() as conn:
+            with self.write_connection() as conn:
                 # Verify the session belongs to the facilitator
                 session_check = conn.execute(text("""
                     SELECT id FROM sessions WHERE id = :session_id AND facilitator_id = :facilitator_id
@@ -1504,7 +1849,118 @@ class PostgresDBManager:
                 """), {'session_id': session_id, 'join_enabled': join_enabled})
                 
                 conn.commit()
+                self.invalidate_session(session_id)
                 return True
         except Exception as e:
             print(f"Failed to set session join enabled: {e}")
-            return False
\ No newline at end of file
+            return False
+    
+    def create_job(self, job):
+        """Record a new background job"""
+        if not self.engine:
+            return False
+        try:
+            with self.write_connection() as conn:
+                conn.execute(text("""
+                    INSERT INTO jobs (id, kind, session_id, status, created_at, owner_id, heartbeat_at)
+                    VALUES (:id, :kind, :session_id, :status, :created_at, :owner_id, :heartbeat_at)
+                """), job)
+                conn.commit()
+                return True
+        except Exception as e:
+            print(f"Failed to create job: {e}")
+            return False
+    
+    def update_job(self, job_id, status, result=None, error=None, started_at=None, finished_at=None):
+        """Update a job's status, result and timing"""
+        if not self.engine:
+            return False
+        try:
+            with self.write_connection() as conn:
+                update_fields = ['status = :status']
+                params = {'job_id': job_id, 'status': status}
+                
+                if result is not None:
+                    update_fields.append('result = :result')
+                    params['result'] = result
+                if error is not None:
+                    update_fields.append('error = :error')
+                    params['error'] = error
+                if started_at is not None:
+                    update_fields.append('started_at = :started_at')
+                    params['started_at'] = started_at
+                if finished_at is not None:
+                    update_fields.append('finished_at = :finished_at')
+                    params['finished_at'] = finished_at
+                
+                conn.execute(text(f"UPDATE jobs SET {', '.join(update_fields)} WHERE id = :job_id"), params)
+                conn.commit()
+                return True
+        except Exception as e:
+            print(f"Failed to update job: {e}")
+            return False
+    
+    def get_job(self, job_id):
+        """Get a background job by ID"""
+        if not self.engine:
+            return None
+        try:
+            with self.connection() as conn:
+                result = conn.execute(text("""
+                    SELECT id, kind, session_id, status, result, error, created_at, started_at, finished_at
+                    FROM jobs WHERE id = :job_id
+                """), {'job_id': job_id})
+                
+                row = result.fetchone()
+                if not row:
+                    return None
+                
+                job = dict(zip(result.keys(), row))
+                job['result'] = json.loads(job['result']) if job['result'] else None
+                for field in ('created_at', 'started_at', 'finished_at'):
+                    if job[field] and hasattr(job[field], 'isoformat'):
+                        job[field] = job[field].isoformat()
+                return job
+        except Exception as e:
+            print(f"Failed to get job: {e}")
+            return None
+    
+    def touch_jobs(self, owner_id):
+        """Refresh the heartbeat of every active job owned by a server process"""
+        if not self.engine:
+            return 0
+        try:
+            with self.write_connection() as conn:
+                result = conn.execute(text("""
+                    UPDATE jobs SET heartbeat_at = :heartbeat_at
+                    WHERE owner_id = :owner_id AND status IN ('queued', 'running')
+                """), {'heartbeat_at': datetime.now(), 'owner_id': owner_id})
+                conn.commit()
+                return result.rowcount
+        except Exception as e:
+            print(f"Failed to refresh job heartbeats: {e}")
+            return 0
+    
+    def fail_interrupted_jobs(self, stale_before):
+        """
+        Mark queued or running jobs whose owner stopped heartbeating as failed
+        
+        Args:
+            stale_before: Jobs with no heartbeat since this time are considered
+                abandoned (rows without a heartbeat predate job ownership)
+        """
+        if not self.engine:
+            return 0
+        try:
+            with self.write_connection() as conn:
+                result = conn.execute(text("""
+                    UPDATE jobs SET status = 'failed', error = 'Interrupted: server process stopped',
+                                    finished_at = :finished_at
+                    WHERE status IN ('queued', 'running')
+                    AND (heartbeat_at IS NULL OR heartbeat_at < :stale_before)
+                """), {'finished_at': datetime.now(), 'stale_before': stale_before})
+                conn.commit()
+                return result.rowcount
+        except Exception as e:
+            print(f"Failed to clean up interrupted jobs: {e}")
+            return 0
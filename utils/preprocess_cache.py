@@ -0,0 +1,89 @@
+"""
+Preprocessing cache for the IdeaFlow AI processor.
+Maps a content hash to the lemmatized text and theme keywords of an idea so
+regenerating themes only runs spaCy over new or edited ideas.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class PreprocessCache:
+    """
+    Bounded, thread-safe LRU cache of preprocessed idea text.
+    An optional store (e.g. PostgresDBManager) persists entries across restarts;
+    it must provide get_preprocessed_texts(hashes) and save_preprocessed_texts(entries).
+    """
+    def __init__(self, max_entries=20000, store=None):
+        self.max_entries = max_entries
+        self.store = store
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def content_hash(text, namespace=''):
+        """Hash cleaned idea text together with the pipeline that processed it"""
+        return hashlib.sha256(f"{namespace}\x00{text}".encode('utf-8')).hexdigest()
+
+    def get_many(self, hashes):
+        """Return {hash: (processed_text, keywords)} for every cached hash"""
+        found = {}
+        missing = []
+        with self._lock:
+            for content_hash in hashes:
+                entry = self._entries.get(content_hash)
+                if entry is None:
+                    missing.append(content_hash)
+                else:
+                    self._entries.move_to_end(content_hash)
+                    found[content_hash] = entry
+
+        # Fall back to the persistent store for anything evicted or from a previous run
+        if missing and self.store:
+            stored = self.store.get_preprocessed_texts(missing)
+            if stored:
+                self._remember(stored)
+                found.update(stored)
+
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(hashes) - len(found)
+        return found
+
+    def put_many(self, entries):
+        """Cache {hash: (processed_text, keywords)} entries and persist them if a store is set"""
+        if not entries:
+            return
+        self._remember(entries)
+        if self.store:
+            self.store.save_preprocessed_texts(entries)
+
+    def _remember(self, entries):
+        """Insert entries into the in-memory LRU, evicting the oldest beyond max_entries"""
+        with self._lock:
+            for content_hash, entry in entries.items():
+                self._entries[content_hash] = entry
+                self._entries.move_to_end(content_hash)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop all in-memory entries"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Cache size and hit ratio"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else 0.0,
+                'persistent': self.store is not None
+            }
@@ -0,0 +1,93 @@
+"""
+Process-wide registry for the IdeaFlow AI processor.
+Loads the NLP pipeline once in the background and hands out a shared,
+stateless AIProcessor so theme requests don't pay the model start-up cost.
+"""
+
+import os
+import threading
+import time
+from utils.preprocess_cache import PreprocessCache
+
+
+class ProcessorRegistry:
+    """
+    Thread-safe holder for the shared AIProcessor instance.
+    The processor keeps no per-session state, so one instance serves every request.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._processor = None
+        self._warmup_thread = None
+        self._error = None
+        self._load_seconds = None
+        self.cache = PreprocessCache(max_entries=int(os.getenv('AI_CACHE_MAX_ENTRIES', 20000)))
+
+    def set_cache_store(self, store):
+        """Persist preprocessed ideas through store (e.g. the DB manager)"""
+        self.cache.store = store
+
+    def start_warmup(self):
+        """Load the NLP pipeline and processor in a background thread (idempotent)"""
+        with self._lock:
+            if self._warmup_thread or self._ready.is_set():
+                return
+            self._warmup_thread = threading.Thread(target=self._warm_up, name='ai-processor-warmup', daemon=True)
+            self._warmup_thread.start()
+
+    def _warm_up(self):
+        """Build the shared processor, recording how long the model load took"""
+        try:
+            self.get_processor()
+        except Exception as e:
+            self._error = str(e)
+            print(f"AI processor warm-up failed: {e}")
+
+    def get_processor(self):
+        """Return the shared AIProcessor, loading it synchronously if warm-up hasn't finished"""
+        if self._ready.is_set():
+            return self._processor
+        with self._lock:
+            if self._processor is None:
+                started = time.perf_counter()
+                # Imported lazily so importing the registry never pulls in spaCy
+                from utils.ai_processor import AIProcessor
+                self._processor = AIProcessor(cache=self.cache)
+                self._load_seconds = round(time.perf_counter() - started, 3)
+                self._error = None
+                print(f"AI processor ready in {self._load_seconds}s")
+            self._ready.set()
+            return self._processor
+
+    def is_ready(self):
+        """Whether the NLP pipeline has finished loading"""
+        return self._ready.is_set()
+
+    def status(self):
+        """Readiness details for health checks"""
+        nlp_loaded = False
+        if self._ready.is_set():
+            from utils import ai_processor
+            nlp_loaded = ai_processor.nlp is not None
+        return {
+            'ready': self._ready.is_set(),
+            'nlp_loaded': nlp_loaded,
+            'load_seconds': self._load_seconds,
+            'error': self._error,
+            'cache': self.cache.stats()
+        }
+
+
+# Shared registry used by the API server
+processor_registry = ProcessorRegistry()
+
+
+def cluster_ideas(ideas):
+    """Cluster ideas into themes with the shared processor (picklable entry point for worker processes)"""
+    return processor_registry.get_processor().get_themes_from_ideas(ideas)
+
+
+def warm_worker():
+    """Process pool initializer: load the NLP pipeline before the first job arrives"""
+    processor_registry.get_processor()
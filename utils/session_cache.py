@@ -0,0 +1,172 @@
+"""
+Session metadata cache for the IdeaFlow database manager.
+Nearly every endpoint reads the session row, which only changes on phase,
+round, voting-settings and join-flag updates; those writes invalidate the
+cached row, and a TTL bounds staleness from writers that bypass the manager.
+Invalidations only reach other workers through the Redis backend, so the
+in-memory cache is switched off when several workers share a message queue.
+"""
+
+import os
+import time
+import pickle
+import threading
+from collections import OrderedDict
+
+
+class MemoryCacheBackend:
+    """Per-process TTL cache bounded to max_entries (oldest entries evicted first)"""
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisCacheBackend:
+    """Redis-backed cache shared by every worker pointing at the same server"""
+    def __init__(self, url, prefix='ideaflow:session:'):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return pickle.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=max(int(ttl), 1))
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+
+def build_cache_backend(name=None):
+    """
+    Create the backend named by SESSION_CACHE_BACKEND ('memory' or 'redis')
+
+    Falls back to the in-memory backend if Redis is unavailable.
+    """
+    name = (name or os.getenv('SESSION_CACHE_BACKEND', 'memory')).lower()
+    if name == 'redis':
+        try:
+            backend = RedisCacheBackend(os.getenv('REDIS_URL', 'redis://localhost:6379'))
+            backend.client.ping()
+            return backend
+        except Exception as e:
+            print(f"Redis session cache unavailable, using in-memory cache: {e}")
+    return MemoryCacheBackend(int(os.getenv('SESSION_CACHE_MAX_ENTRIES', 10000)))
+
+
+class SessionCache:
+    """
+    Read-through cache of session rows keyed by session id.
+    Callers get a copy of the cached row, so mutating it never leaks into the cache.
+    """
+    def __init__(self, backend=None, ttl=None, enabled=None):
+        self.backend = backend or MemoryCacheBackend()
+        self.ttl = ttl if ttl is not None else float(os.getenv('SESSION_CACHE_TTL', 30))
+        self.enabled = enabled if enabled is not None else os.getenv('SESSION_CACHE', 'true').lower() == 'true'
+        if self.enabled and isinstance(self.backend, MemoryCacheBackend) and os.getenv('SOCKETIO_MESSAGE_QUEUE'):
+            print("Session cache disabled: SOCKETIO_MESSAGE_QUEUE is set but SESSION_CACHE_BACKEND is not redis, "
+                  "so invalidations would not reach other workers")
+            self.enabled = False
+        self._lock = threading.Lock()
+        # Bumped on every invalidation so a load racing with a write isn't cached.
+        # One counter for all sessions keeps memory constant; an unrelated
+        # invalidation only costs the racing load its cache write.
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.errors = 0
+
+    def get(self, session_id, loader):
+        """Return the session row, calling loader(session_id) on a miss"""
+        if not self.enabled:
+            return loader(session_id)
+
+        try:
+            cached = self.backend.get(session_id)
+        except Exception as e:
+            print(f"Session cache read failed: {e}")
+            cached = None
+            with self._lock:
+                self.errors += 1
+        if cached is not None:
+            with self._lock:
+                self.hits += 1
+            return dict(cached)
+
+        with self._lock:
+            self.misses += 1
+            generation = self._generation
+        session = loader(session_id)
+        if session is None:
+            return None
+
+        with self._lock:
+            stale = self._generation != generation
+        if not stale:
+            try:
+                self.backend.set(session_id, dict(session), self.ttl)
+            except Exception as e:
+                print(f"Session cache write failed: {e}")
+                with self._lock:
+                    self.errors += 1
+        return session
+
+    def invalidate(self, session_id):
+        """Drop the cached row after the session was written"""
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+        try:
+            self.backend.delete(session_id)
+        except Exception as e:
+            print(f"Session cache invalidation failed: {e}")
+            with self._lock:
+                self.errors += 1
+
+    def stats(self):
+        """Hit ratio and invalidation counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                'enabled': self.enabled,
+                'backend': type(self.backend).__name__,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else 0.0,
+                'invalidations': self.invalidations,
+                'errors': self.errors
+            }
+        if isinstance(self.backend, MemoryCacheBackend):
+            stats['entries'] = len(self.backend)
+        return stats
@@ -0,0 +1,298 @@
+"""
+Multi-process Socket.IO support for the IdeaFlow application.
+Room emits fan out to every worker through a pub/sub message queue, and socket
+connections are tracked in a registry that all workers can read. Redis, AMQP,
+Kafka and ZeroMQ queues go through python-socketio's own managers; a small
+Unix-socket broker covers local multi-process testing without extra services.
+"""
+
+import os
+import json
+import time
+import uuid
+import threading
+from multiprocessing.connection import Listener, Client
+from socketio import PubSubManager
+from utils.async_runtime import run_blocking
+
+DEFAULT_BROKER_ADDRESS = '/tmp/ideaflow-socketio.sock'
+
+
+def broker_address(url):
+    """Unix socket path of a unix:// or local:// message queue URL"""
+    for prefix in ('unix://', 'local://'):
+        if url.startswith(prefix):
+            return url[len(prefix):] or DEFAULT_BROKER_ADDRESS
+    raise ValueError(f'Not a local broker URL: {url}')
+
+
+def broker_authkey():
+    """Shared secret used by broker clients"""
+    return os.getenv('SOCKETIO_BROKER_AUTHKEY', 'ideaflow-socketio').encode('utf-8')
+
+
+class LocalBroker:
+    """
+    Unix-socket pub/sub broker for running several workers on one machine.
+    Each client announces itself as a 'publisher' or 'subscriber'; every
+    published message is forwarded to all subscribers. Each publisher has its
+    own thread, so sends to a subscriber are serialized by that subscriber's
+    lock to keep frames from interleaving.
+    """
+    def __init__(self, address=DEFAULT_BROKER_ADDRESS, authkey=None):
+        self.address = address
+        self.authkey = authkey or broker_authkey()
+        # {subscriber connection: send lock}
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._listener = None
+        self.published = 0
+
+    def bind(self):
+        """Bind the socket, replacing a stale socket file left by a dead broker"""
+        if os.path.exists(self.address):
+            try:
+                Client(self.address, family='AF_UNIX', authkey=self.authkey).close()
+                raise OSError(f'Broker already running at {self.address}')
+            except (ConnectionRefusedError, FileNotFoundError):
+                os.unlink(self.address)
+        self._listener = Listener(self.address, family='AF_UNIX', authkey=self.authkey)
+
+    def serve_forever(self):
+        """Accept clients until the process exits"""
+        if self._listener is None:
+            self.bind()
+        print(f"Socket.IO broker listening on {self.address}")
+        while True:
+            try:
+                conn = run_blocking(self._listener.accept)
+            except Exception as e:
+                print(f"Socket.IO broker rejected a client: {e}")
+                continue
+            threading.Thread(target=self._serve_client, args=(conn,), daemon=True).start()
+
+    def start(self):
+        """Serve from a daemon thread in this process"""
+        self.bind()
+        threading.Thread(target=self.serve_forever, name='socketio-broker', daemon=True).start()
+
+    def _serve_client(self, conn):
+        try:
+            role = run_blocking(conn.recv)
+            if role == 'subscriber':
+                with self._lock:
+                    self._subscribers[conn] = threading.Lock()
+                return
+            while True:
+                self._forward(run_blocking(conn.recv))
+        except (EOFError, OSError):
+            conn.close()
+
+    def _forward(self, message):
+        with self._lock:
+            subscribers = list(self._subscribers.items())
+            self.published += 1
+        for subscriber, send_lock in subscribers:
+            try:
+                with send_lock:
+                    subscriber.send(message)
+            except (EOFError, OSError):
+                with self._lock:
+                    self._subscribers.pop(subscriber, None)
+
+
+class LocalBrokerManager(PubSubManager):
+    """python-socketio client manager that talks to a LocalBroker"""
+    name = 'localbroker'
+
+    def __init__(self, url=f'unix://{DEFAULT_BROKER_ADDRESS}', channel='socketio', write_only=False, logger=None):
+        self.address = broker_address(url)
+        self.authkey = broker_authkey()
+        self._publisher = None
+        self._publish_lock = threading.Lock()
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+
+    def _connect(self, role):
+        conn = Client(self.address, family='AF_UNIX', authkey=self.authkey)
+        conn.send(role)
+        return conn
+
+    def _publish(self, data):
+        with self._publish_lock:
+            for attempt in range(2):
+                try:
+                    if self._publisher is None:
+                        self._publisher = self._connect('publisher')
+                    self._publisher.send((self.channel, data))
+                    return
+                except (EOFError, OSError):
+                    # Broker restarted; reconnect once before giving up
+                    self._publisher = None
+                    if attempt:
+                        raise
+
+    def _listen(self):
+        retry_sleep = 1
+        while True:
+            try:
+                conn = self._connect('subscriber')
+                retry_sleep = 1
+                while True:
+                    # Blocking pipe read; keep it on a native thread under eventlet/gevent
+                    channel, data = run_blocking(conn.recv)
+                    if channel == self.channel:
+                        yield data
+            except (EOFError, OSError) as e:
+                print(f"Socket.IO broker connection lost, retrying in {retry_sleep}s: {e}")
+                time.sleep(retry_sleep)
+                retry_sleep = min(retry_sleep * 2, 60)
+
+
+def socketio_queue_options(url=None):
+    """
+    SocketIO keyword arguments for the SOCKETIO_MESSAGE_QUEUE setting
+
+    unix:// and local:// URLs use the LocalBroker (started in this process when
+    SOCKETIO_BROKER_EMBEDDED is true); any other URL (redis://, amqp://,
+    kafka://, zmq+tcp://) is handed to Flask-SocketIO as message_queue.
+    """
+    url = url if url is not None else os.getenv('SOCKETIO_MESSAGE_QUEUE', '')
+    if not url:
+        return {}
+    warn_unshared_state()
+    channel = os.getenv('SOCKETIO_CHANNEL', 'ideaflow-socketio')
+    if url.startswith(('unix://', 'local://')):
+        if os.getenv('SOCKETIO_BROKER_EMBEDDED', 'false').lower() == 'true':
+            try:
+                LocalBroker(broker_address(url)).start()
+            except OSError as e:
+                # Another worker already owns the broker
+                print(f"Using existing Socket.IO broker: {e}")
+        return {'client_manager': LocalBrokerManager(url, channel=channel)}
+    return {'message_queue': url, 'channel': channel}
+
+
+# State that stays per worker unless its setting points at Redis
+SHARED_STATE_SETTINGS = {
+    'SOCKETIO_CONNECTION_REGISTRY': 'connection counts cover only this worker',
+    'PARTICIPANT_SEQUENCE_BACKEND': 'participant deltas from different workers reuse sequence numbers',
+    'SESSION_CACHE_BACKEND': 'the in-memory session cache is disabled'
+}
+
+
+def warn_unshared_state():
+    """Print a warning for each per-worker setting left at memory in a multi-worker deployment"""
+    for setting, effect in SHARED_STATE_SETTINGS.items():
+        if os.getenv(setting, 'memory').lower() != 'redis':
+            print(f"Warning: SOCKETIO_MESSAGE_QUEUE is set but {setting} is not 'redis'; {effect}")
+
+
+class ConnectionRegistry:
+    """
+    Socket connections of this worker: {socket_id: {'session_id', 'user_id', 'is_facilitator'}}
+    """
+    shared = False
+
+    def __init__(self):
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._connections = {}
+        self._lock = threading.Lock()
+
+    def add(self, socket_id, info):
+        with self._lock:
+            self._connections[socket_id] = info
+
+    def get(self, socket_id):
+        with self._lock:
+            return self._connections.get(socket_id)
+
+    def remove(self, socket_id):
+        """Forget a socket and return its info, or None if it wasn't tracked"""
+        with self._lock:
+            return self._connections.pop(socket_id, None)
+
+    def heartbeat(self):
+        """Keep this worker's entries alive in a shared registry (no-op locally)"""
+
+    def count(self):
+        """Connections tracked across all workers"""
+        with self._lock:
+            return len(self._connections)
+
+    def session_connections(self, session_id):
+        """Connection infos for one session across all workers"""
+        with self._lock:
+            return [info for info in self._connections.values() if info.get('session_id') == session_id]
+
+    def __contains__(self, socket_id):
+        return self.get(socket_id) is not None
+
+    def __len__(self):
+        return self.count()
+
+
+class RedisConnectionRegistry(ConnectionRegistry):
+    """
+    Connection registry shared through Redis. Each worker writes its own hash,
+    which expires unless heartbeat() refreshes it, so a crashed worker's
+    sockets drop out of the counts on their own.
+    """
+    shared = True
+
+    def __init__(self, url, prefix='ideaflow:connections:', ttl=90):
+        super().__init__()
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.ttl = ttl
+        self.key = f"{prefix}{self.worker_id}"
+
+    def add(self, socket_id, info):
+        super().add(socket_id, info)
+        pipe = self.client.pipeline()
+        pipe.hset(self.key, socket_id, json.dumps(info))
+        pipe.expire(self.key, self.ttl)
+        pipe.execute()
+
+    def remove(self, socket_id):
+        info = super().remove(socket_id)
+        self.client.hdel(self.key, socket_id)
+        return info
+
+    def heartbeat(self):
+        with self._lock:
+            tracked = {socket_id: json.dumps(info) for socket_id, info in self._connections.items()}
+        if tracked:
+            pipe = self.client.pipeline()
+            pipe.hset(self.key, mapping=tracked)
+            pipe.expire(self.key, self.ttl)
+            pipe.execute()
+
+    def count(self):
+        return sum(self.client.hlen(key) for key in self.client.scan_iter(f"{self.prefix}*"))
+
+    def session_connections(self, session_id):
+        connections = []
+        for key in self.client.scan_iter(f"{self.prefix}*"):
+            for value in self.client.hvals(key):
+                info = json.loads(value)
+                if info.get('session_id') == session_id:
+                    connections.append(info)
+        return connections
+
+
+def build_connection_registry():
+    """Shared Redis registry when SOCKETIO_CONNECTION_REGISTRY=redis, otherwise per-worker"""
+    if os.getenv('SOCKETIO_CONNECTION_REGISTRY', 'memory').lower() == 'redis':
+        try:
+            registry = RedisConnectionRegistry(os.getenv('REDIS_URL', 'redis://localhost:6379'))
+            registry.client.ping()
+            return registry
+        except Exception as e:
+            print(f"Redis connection registry unavailable, tracking connections per worker: {e}")
+    return ConnectionRegistry()
+
+
+if __name__ == '__main__':
+    # Standalone broker for local multi-worker runs: python -m utils.socket_cluster
+    LocalBroker(broker_address(os.getenv('SOCKETIO_MESSAGE_QUEUE') or f'unix://{DEFAULT_BROKER_ADDRESS}')).serve_forever()
@@ -0,0 +1,123 @@
+"""
+Serialized SQLite writer for the IdeaFlow database.
+SQLite allows one writer at a time, so hot writes (ideas, votes, joins) are
+queued to a single thread that group-commits them in one transaction instead
+of every request contending for the write lock.
+"""
+
+import os
+import queue
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+
+class SQLiteWriter:
+    """
+    Dedicated writer thread that applies queued write functions in batches.
+    Each write runs in its own savepoint, so one failing write doesn't roll back
+    the rest of the batch; the batch itself is committed once.
+    """
+    def __init__(self, engine, max_batch=None, timeout=None):
+        self.engine = engine
+        self.max_batch = max_batch or int(os.getenv('DB_SQLITE_WRITE_BATCH', 100))
+        self.timeout = timeout or float(os.getenv('DB_SQLITE_WRITE_TIMEOUT', 30))
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.batches = 0
+        self.writes = 0
+        self.failures = 0
+
+    def start(self):
+        """Start the writer thread (idempotent)"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='sqlite-writer', daemon=True)
+                self._thread.start()
+
+    def submit(self, fn):
+        """Queue fn(conn) for the writer thread and return a Future with its result"""
+        self.start()
+        future = Future()
+        self._queue.put((fn, future))
+        return future
+
+    def execute(self, fn):
+        """
+        Run fn(conn) on the writer thread and wait for its result
+
+        A write still queued after DB_SQLITE_WRITE_TIMEOUT seconds is cancelled
+        and the timeout raised; one already running is waited for, so a caller
+        never sees a failure for a write that was committed.
+        """
+        if threading.current_thread() is self._thread:
+            # Nested write from inside a batch would deadlock waiting on itself
+            raise RuntimeError('SQLiteWriter.execute called from the writer thread')
+        future = self.submit(fn)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            # Still queued: cancel it so the caller's failure is accurate (the batch skips it)
+            if future.cancel():
+                raise
+            # Already in a batch: it will commit or fail, so report what actually happened
+            return future.result()
+
+    def _run(self):
+        """Writer loop: drain up to max_batch writes and commit them together"""
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._apply(batch)
+
+    def _apply(self, batch):
+        """Apply one batch of writes in a single transaction"""
+        results = []
+        try:
+            with self.engine.connect() as conn:
+                for fn, future in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    savepoint = conn.begin_nested()
+                    try:
+                        result = fn(conn)
+                        savepoint.commit()
+                        results.append((future, result, None))
+                    except Exception as e:
+                        savepoint.rollback()
+                        results.append((future, None, e))
+                conn.commit()
+        except Exception as e:
+            # The commit itself failed, so none of the batch was written
+            print(f"SQLite writer batch failed: {e}")
+            for fn, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            with self._lock:
+                self.failures += len(batch)
+            return
+
+        with self._lock:
+            self.batches += 1
+            self.writes += len(results)
+            self.failures += sum(1 for _, _, error in results if error is not None)
+        for future, result, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def stats(self):
+        """Batch counters for metrics"""
+        with self._lock:
+            return {
+                'queued': self._queue.qsize(),
+                'batches': self.batches,
+                'writes': self.writes,
+                'failures': self.failures,
+                'avg_batch_size': round(self.writes / self.batches, 2) if self.batches else 0.0
+            }
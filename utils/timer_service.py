@@ -0,0 +1,259 @@
+"""
+Server-authoritative session timers.
+Running timers are kept in a heap of deadlines and one background task wakes
+for the earliest of them, pushing timer_update ticks to the session room at a
+fixed cadence and a single timer_expired event when the deadline passes.
+session_timers stays the source of truth: every wake-up re-reads the row, and
+load() rebuilds the heap from running rows after a restart.
+"""
+
+import os
+import heapq
+import itertools
+import threading
+from datetime import datetime
+
+
+def parse_started_at(value):
+    """started_at as a datetime (SQLite returns ISO strings, PostgreSQL datetimes)"""
+    if value is None or isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+
+def remaining_seconds(timer, now=None):
+    """
+    Seconds left on a timer row
+
+    A running timer's remaining value was measured at started_at; a paused
+    timer's remaining value is current as stored.
+    """
+    remaining = timer.get('remaining') or 0
+    started_at = parse_started_at(timer.get('started_at'))
+    if not timer.get('is_running') or started_at is None:
+        return max(0, remaining)
+    elapsed = ((now or datetime.now()) - started_at).total_seconds()
+    return max(0, int(round(remaining - elapsed)))
+
+
+class TimerService:
+    """
+    Schedules ticks and expiry for running session timers.
+    A timer is owned by the worker that started it: only that worker ticks it.
+    If the worker dies, nobody else picks it up until a process restarts and
+    load() finds it. Several workers may then hold the same timer; ticks carry
+    absolute values so duplicates are harmless, and expiry is claimed with a
+    conditional update so exactly one worker emits timer_expired.
+    """
+    def __init__(self, db_manager, emit, start_background_task, on_expire=None, tick=None, auto_advance=None):
+        self.db_manager = db_manager
+        self._emit = emit
+        self._start_background_task = start_background_task
+        self.on_expire = on_expire
+        self.tick = tick if tick is not None else float(os.getenv('TIMER_TICK_SECONDS', 5))
+        if auto_advance is None:
+            auto_advance = os.getenv('TIMER_AUTO_ADVANCE', 'false').lower() == 'true'
+        self.auto_advance = auto_advance
+        self._heap = []
+        self._generations = {}
+        self._counter = itertools.count()
+        self._wakeup = threading.Condition()
+        self._started = False
+        self.ticks = 0
+        self.expired = 0
+
+    def start(self):
+        """Start the scheduler loop (idempotent)"""
+        with self._wakeup:
+            if self._started:
+                return
+            self._started = True
+        self._start_background_task(self._run)
+
+    def load(self):
+        """
+        Schedule every timer still running in session_timers; returns how many
+
+        Call from the serving process only (see start_background_services),
+        never at import time.
+        """
+        timers = self.db_manager.get_running_timers()
+        for timer in timers:
+            self._schedule(timer['session_id'], 0)
+        if timers:
+            print(f"Restored {len(timers)} running session timers")
+        return len(timers)
+
+    def status(self, session_id):
+        """Timer payload with remaining computed on the server, or None"""
+        timer = self.db_manager.get_timer_state(session_id)
+        return self._payload(timer) if timer else None
+
+    def start_timer(self, session_id, duration, auto_advance=None):
+        """Start (or restart) a session timer from its full duration"""
+        timer = {
+            'duration': duration,
+            'remaining': duration,
+            'is_running': True,
+            'started_at': datetime.now().isoformat(),
+            'auto_advance': self.auto_advance if auto_advance is None else bool(auto_advance)
+        }
+        if not self.db_manager.save_timer_state(session_id, timer):
+            return None
+        self._schedule(session_id, 0)
+        return self._payload(timer)
+
+    def set_timer(self, session_id, duration, remaining=None):
+        """Store a stopped timer without scheduling it"""
+        timer = {
+            'duration': duration,
+            'remaining': duration if remaining is None else remaining,
+            'is_running': False,
+            'started_at': None,
+            'auto_advance': self.auto_advance
+        }
+        if not self.db_manager.save_timer_state(session_id, timer):
+            return None
+        self.cancel(session_id)
+        return self._payload(timer)
+
+    def pause(self, session_id, remaining=None):
+        """
+        Stop the countdown, keeping the server's remaining time
+
+        An explicit remaining value (e.g. 0 for a reset) replaces it.
+        """
+        current = self.db_manager.get_timer_state(session_id)
+        if not current:
+            return None
+        timer = {
+            **current,
+            'remaining': remaining_seconds(current) if remaining is None else remaining,
+            'is_running': False,
+            'started_at': None
+        }
+        if not self.db_manager.save_timer_state(session_id, timer):
+            return None
+        self.cancel(session_id)
+        return self._payload(timer)
+
+    def resume(self, session_id, remaining=None):
+        """Continue a paused timer from its stored (or the given) remaining time"""
+        current = self.db_manager.get_timer_state(session_id)
+        if not current:
+            return None
+        timer = {
+            **current,
+            'remaining': remaining_seconds(current) if remaining is None else remaining,
+            'is_running': True,
+            'started_at': datetime.now().isoformat()
+        }
+        if timer['remaining'] <= 0:
+            return self.pause(session_id, 0)
+        if not self.db_manager.save_timer_state(session_id, timer):
+            return None
+        self._schedule(session_id, 0)
+        return self._payload(timer)
+
+    def cancel(self, session_id):
+        """Drop any scheduled wake-ups for a session (the row is left alone)"""
+        with self._wakeup:
+            self._generations.pop(session_id, None)
+
+    def _schedule(self, session_id, delay):
+        """Replace a session's pending wake-up with one delay seconds from now"""
+        self.start()
+        fire_at = datetime.now().timestamp() + delay
+        with self._wakeup:
+            generation = self._generations.get(session_id, 0) + 1
+            self._generations[session_id] = generation
+            heapq.heappush(self._heap, (fire_at, next(self._counter), session_id, generation))
+            self._wakeup.notify()
+
+    def _payload(self, timer, now=None):
+        now = now or datetime.now()
+        started_at = parse_started_at(timer.get('started_at'))
+        return {
+            'duration': timer.get('duration'),
+            'remaining': remaining_seconds(timer, now),
+            'is_running': bool(timer.get('is_running')),
+            'started_at': started_at.isoformat() if started_at else None,
+            'auto_advance': bool(timer.get('auto_advance')),
+            'server_time': now.isoformat()
+        }
+
+    def _next_due(self):
+        """Block until a wake-up is due and return (session_id, generation)"""
+        with self._wakeup:
+            while True:
+                # Discard wake-ups superseded by a later start/pause/resume
+                while self._heap and self._generations.get(self._heap[0][2]) != self._heap[0][3]:
+                    heapq.heappop(self._heap)
+                if not self._heap:
+                    self._wakeup.wait()
+                    continue
+                delay = self._heap[0][0] - datetime.now().timestamp()
+                if delay <= 0:
+                    _, _, session_id, generation = heapq.heappop(self._heap)
+                    return session_id, generation
+                self._wakeup.wait(delay)
+
+    def _run(self):
+        while True:
+            session_id, generation = self._next_due()
+            try:
+                self._fire(session_id, generation)
+            except Exception as e:
+                print(f"Timer update failed for session {session_id}: {e}")
+
+    def _fire(self, session_id, generation):
+        timer = self.db_manager.get_timer_state(session_id)
+        if not timer or not timer.get('is_running'):
+            # Paused, reset or deleted (possibly by another worker)
+            self._forget(session_id, generation)
+            return
+
+        now = datetime.now()
+        payload = self._payload(timer, now)
+        room = f'session_{session_id}'
+        if payload['remaining'] > 0:
+            self._emit('timer_update', payload, room=room)
+            self.ticks += 1
+            self._reschedule(session_id, generation, min(self.tick, payload['remaining']))
+            return
+
+        self._forget(session_id, generation)
+        # Only the worker whose update flips is_running announces the expiry
+        if not self.db_manager.expire_timer(session_id, timer['started_at']):
+            return
+        self.expired += 1
+        payload.update(remaining=0, is_running=False, started_at=None)
+        self._emit('timer_expired', payload, room=room)
+        if timer.get('auto_advance') and self.on_expire:
+            self.on_expire(session_id)
+
+    def _reschedule(self, session_id, generation, delay):
+        with self._wakeup:
+            if self._generations.get(session_id) != generation:
+                return
+            fire_at = datetime.now().timestamp() + delay
+            heapq.heappush(self._heap, (fire_at, next(self._counter), session_id, generation))
+
+    def _forget(self, session_id, generation):
+        with self._wakeup:
+            if self._generations.get(session_id) == generation:
+                del self._generations[session_id]
+
+    def stats(self):
+        """Scheduled timers and event counters"""
+        with self._wakeup:
+            return {
+                'tick_seconds': self.tick,
+                'scheduled': len(self._generations),
+                'heap_size': len(self._heap),
+                'ticks': self.ticks,
+                'expired': self.expired
+            }